@@ -3,18 +3,36 @@
 from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from routes import auth, save, stats, notifications, prompts, user, organizations, onboarding
+from contextlib import asynccontextmanager
 import time
 import json
-from supabase import create_client, Client
-import os
 import dotenv
 
 # ADD THIS IMPORT
 from utils.middleware import AccessControlMiddleware
+from utils.stats.analytics_pool import shutdown_analytics_pool
+from utils.supabase_client import init_supabase, close_supabase, get_supabase
+from utils.prompts.usage_counter import start_template_usage_flusher, stop_template_usage_flusher
+from utils.ingestion import ingestion_enabled, ingestion_queue
+from utils.stats.stats_cache import get_stats_cache_info
+from utils.stats.estimate_tokens import get_token_cache_info
 
 dotenv.load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled async Supabase client for the whole application
+    await init_supabase()
+    start_template_usage_flusher(get_supabase())
+    if ingestion_enabled():
+        ingestion_queue.start(get_supabase())
+    yield
+    await ingestion_queue.stop(get_supabase())
+    await stop_template_usage_flusher(get_supabase())
+    shutdown_analytics_pool()
+    await close_supabase()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware, 
@@ -56,18 +74,15 @@ async def health_check():
     
     # Check API
     health["components"]["api"] = {"status": "healthy"}
+    health["components"]["ingestion"] = ingestion_queue.get_info()
+    health["components"]["stats_cache"] = get_stats_cache_info()
+    health["components"]["token_cache"] = get_token_cache_info()
     
     # Check Supabase connection
     try:
-        # Create a fresh client for the health check
-        supabase_client = create_client(
-            os.getenv("SUPABASE_URL"), 
-            os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        )
-        
         # Try listing buckets - this is a lightweight operation
         # that doesn't depend on application-specific tables
-        supabase_client.storage.list_buckets()
+        await get_supabase().storage.list_buckets()
         
         health["components"]["database"] = {
             "status": "healthy",
@@ -1,12 +1,14 @@
-from fastapi import HTTPException
+from fastapi import HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from . import router, supabase
+from supabase_auth import AsyncGoTrueClient
+from utils.supabase_client import get_supabase_auth
+from . import router
 
 @router.get("/confirm")
-async def confirm_email(token: str, type: str = "signup"):
+async def confirm_email(token: str, type: str = "signup", auth: AsyncGoTrueClient = Depends(get_supabase_auth)):
     """Confirm email address and redirect to ChatGPT or app UI."""
     try:
-        response = supabase.auth.verify_otp({"token": token, "type": type})
+        response = await auth.verify_otp({"token": token, "type": type})
         if response.user:
             return RedirectResponse("https://chat.openai.com")
         raise HTTPException(status_code=400, detail="Invalid or expired confirmation token")
@@ -1,9 +1,10 @@
 from fastapi import HTTPException, Depends
-from . import router, supabase
+from utils.supabase_helpers import get_user_from_session_token_remote
+from . import router
 
 @router.get("/me")
-async def get_current_user(user_id: str = Depends(supabase.auth.get_user)):
-    """Get the current authenticated user."""
+async def get_current_user(user_id: str = Depends(get_user_from_session_token_remote)):
+    """Get the current authenticated user (checked against the auth server, so revoked sessions fail here)."""
     try:
         return {"success": True, "user_id": user_id}
     except Exception as e:
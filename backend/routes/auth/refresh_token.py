@@ -1,12 +1,14 @@
-from fastapi import HTTPException
-from . import router, supabase
+from fastapi import HTTPException, Depends
+from supabase_auth import AsyncGoTrueClient
+from utils.supabase_client import get_supabase_auth
+from . import router
 from .schemas import RefreshTokenData
 
 @router.post("/refresh_token")
-async def refresh_token(refresh_data: RefreshTokenData):
+async def refresh_token(refresh_data: RefreshTokenData, auth: AsyncGoTrueClient = Depends(get_supabase_auth)):
     """Refresh an expired access token using the refresh token."""
     try:
-        response = supabase.auth.refresh_session(refresh_data.refresh_token)
+        response = await auth.refresh_session(refresh_data.refresh_token)
         return {
             "success": True,
             "session": {
@@ -1,16 +1,23 @@
-from fastapi import HTTPException
-from . import router, supabase
+from fastapi import HTTPException, Depends
+from supabase import AsyncClient
+from supabase_auth import AsyncGoTrueClient
+from utils.supabase_client import get_supabase, get_supabase_auth
+from . import router
 from .schemas import SignInData
 
 @router.post("/sign_in")
-async def sign_in(sign_in_data: SignInData):
+async def sign_in(
+    sign_in_data: SignInData,
+    supabase: AsyncClient = Depends(get_supabase),
+    auth: AsyncGoTrueClient = Depends(get_supabase_auth)
+):
     """Authenticate user via email & password."""
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await auth.sign_in_with_password({
             "email": sign_in_data.email,
             "password": sign_in_data.password,
         })
-        metadata_response = (
+        metadata_response = await (
             supabase.table("users_metadata")
             .select("*")
             .eq("user_id", response.user.id)
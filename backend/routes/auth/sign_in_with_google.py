@@ -1,6 +1,9 @@
 # routes/auth/sign_in_with_google.py - Updated
-from fastapi import HTTPException
-from . import router, supabase
+from fastapi import HTTPException, Depends
+from supabase import AsyncClient
+from supabase_auth import AsyncGoTrueClient
+from utils.supabase_client import get_supabase, get_supabase_auth
+from . import router
 from .schemas import GoogleAuthRequest
 from utils.notification_service import NotificationService
 import logging
@@ -11,10 +14,14 @@ logger = logging.getLogger(__name__)
 JAYDAI_ORG_ID = "19864b30-936d-4a8d-996a-27d17f11f00f"
 
 @router.post("/sign_in_with_google")
-async def sign_in_with_google(google_sign_in_data: GoogleAuthRequest):
+async def sign_in_with_google(
+    google_sign_in_data: GoogleAuthRequest,
+    supabase: AsyncClient = Depends(get_supabase),
+    auth: AsyncGoTrueClient = Depends(get_supabase_auth)
+):
     """Authenticate user via Google OAuth with automatic starter pack for new users."""
     try:
-        response = supabase.auth.sign_in_with_id_token({
+        response = await auth.sign_in_with_id_token({
             "provider": "google",
             "token": google_sign_in_data.id_token,
         })
@@ -26,7 +33,7 @@ async def sign_in_with_google(google_sign_in_data: GoogleAuthRequest):
         is_new_user = False
         
         # Check if user metadata exists
-        metadata_response = (
+        metadata_response = await (
             supabase.table("users_metadata")
             .select("*")
             .eq("user_id", user_id)
@@ -39,7 +46,7 @@ async def sign_in_with_google(google_sign_in_data: GoogleAuthRequest):
             user_email = response.user.email
             user_name = response.user.user_metadata.get("full_name", "")
 
-            metadata_response = supabase.table("users_metadata").insert({
+            metadata_response = await supabase.table("users_metadata").insert({
                 "user_id": user_id,
                 "name": user_name,
                 "email": user_email,
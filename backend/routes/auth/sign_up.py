@@ -1,6 +1,9 @@
 # routes/auth/sign_up.py - Updated
-from fastapi import HTTPException
-from . import router, supabase
+from fastapi import HTTPException, Depends
+from supabase import AsyncClient
+from supabase_auth import AsyncGoTrueClient
+from utils.supabase_client import get_supabase, get_supabase_auth
+from . import router
 from .schemas import SignUpData
 from utils.notification_service import NotificationService
 import logging
@@ -11,10 +14,14 @@ logger = logging.getLogger(__name__)
 JAYDAI_ORG_ID = "19864b30-936d-4a8d-996a-27d17f11f00f"
 
 @router.post("/sign_up")
-async def sign_up(sign_up_data: SignUpData):
+async def sign_up(
+    sign_up_data: SignUpData,
+    supabase: AsyncClient = Depends(get_supabase),
+    auth: AsyncGoTrueClient = Depends(get_supabase_auth)
+):
     """Sign up a new user with automatic starter pack assignment."""
     try:
-        response = supabase.auth.sign_up({
+        response = await auth.sign_up({
             "email": sign_up_data.email,
             "password": sign_up_data.password,
             "options": {"data": {"name": sign_up_data.name}}
@@ -23,7 +30,7 @@ async def sign_up(sign_up_data: SignUpData):
         user_with_metadata = None
         if response.user:
             # Create user metadata record
-            metadata_response = supabase.table("users_metadata").insert({
+            metadata_response = await supabase.table("users_metadata").insert({
                 "user_id": response.user.id,
                 "pinned_folder_ids": [FolderRecommendationEngine.STARTER_PACK_FOLDER_ID],
                 "name": sign_up_data.name,
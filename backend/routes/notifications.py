@@ -2,17 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timezone
-from supabase import create_client, Client
+from supabase import AsyncClient
 from utils import supabase_helpers
-import dotenv
-import os
+from utils.supabase_client import get_supabase
 import uuid
 
-dotenv.load_dotenv()
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
 class NotificationMetadata(BaseModel):
@@ -35,12 +29,12 @@ class NotificationResponse(NotificationBase):
     read_at: Optional[datetime] = None
 
 @router.get("/")
-async def get_notifications(user_id: str = Depends(supabase_helpers.get_user_from_session_token)) -> List[NotificationResponse]:
+async def get_notifications(user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)) -> List[NotificationResponse]:
     """Get all notifications for a user."""
     print("Getting notifications for user:", user_id)
     try:
         # Properly handle the query to avoid timestamp issues
-        response = supabase.table("notifications") \
+        response = await supabase.table("notifications") \
             .select("*") \
             .eq("user_id", user_id) \
             .order("created_at", desc=True) \
@@ -56,11 +50,11 @@ async def get_notifications(user_id: str = Depends(supabase_helpers.get_user_fro
         raise HTTPException(status_code=500, detail=f"Error retrieving notifications: {str(e)}")
 
 @router.get("/unread")
-async def get_unread_notifications(user_id: str = Depends(supabase_helpers.get_user_from_session_token)) -> List[NotificationResponse]:
+async def get_unread_notifications(user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)) -> List[NotificationResponse]:
     """Get unread notifications for a user."""
     try:
         # Use is_ for checking null values
-        response = supabase.table("notifications") \
+        response = await supabase.table("notifications") \
             .select("*") \
             .eq("user_id", user_id) \
             .is_("read_at", "null") \
@@ -71,17 +65,17 @@ async def get_unread_notifications(user_id: str = Depends(supabase_helpers.get_u
         raise HTTPException(status_code=500, detail=f"Error retrieving unread notifications: {str(e)}")
 
 @router.get("/count")
-async def get_notification_count(user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def get_notification_count(user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Get notification counts (total and unread)."""
     try:
         # Get total count
-        total_response = supabase.table("notifications") \
+        total_response = await supabase.table("notifications") \
             .select("id", count="exact") \
             .eq("user_id", user_id) \
             .execute()
         
         # Get unread count - using is_ for null check
-        unread_response = supabase.table("notifications") \
+        unread_response = await supabase.table("notifications") \
             .select("id", count="exact") \
             .eq("user_id", user_id) \
             .is_("read_at", "null") \
@@ -95,7 +89,7 @@ async def get_notification_count(user_id: str = Depends(supabase_helpers.get_use
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving notification counts: {str(e)}")
 @router.post("/create")
-async def create_notification(notification: NotificationCreate) -> NotificationResponse:
+async def create_notification(notification: NotificationCreate, supabase: AsyncClient = Depends(get_supabase)) -> NotificationResponse:
     """Create a notification (admin endpoint)."""
     try:
         # Create notification with properly formatted timestamp handling
@@ -108,7 +102,7 @@ async def create_notification(notification: NotificationCreate) -> NotificationR
             **({"metadata": notification.metadata} if notification.metadata else {})
         }
         
-        response = supabase.table("notifications").insert(data).execute()
+        response = await supabase.table("notifications").insert(data).execute()
         
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create notification")
@@ -118,11 +112,11 @@ async def create_notification(notification: NotificationCreate) -> NotificationR
         raise HTTPException(status_code=500, detail=f"Error creating notification: {str(e)}")
 
 @router.post("/{notification_id}/read")
-async def mark_notification_read(notification_id: str, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def mark_notification_read(notification_id: str, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Mark a notification as read."""
     try:
         # Verify the notification belongs to the user
-        verification = supabase.table("notifications") \
+        verification = await supabase.table("notifications") \
             .select("id") \
             .eq("id", notification_id) \
             .eq("user_id", user_id) \
@@ -133,7 +127,7 @@ async def mark_notification_read(notification_id: str, user_id: str = Depends(su
         
         # Use properly formatted ISO timestamp
         now = datetime.now(timezone.utc).isoformat()
-        response = supabase.table("notifications") \
+        response = await supabase.table("notifications") \
             .update({"read_at": now}) \
             .eq("id", notification_id) \
             .execute()
@@ -145,14 +139,14 @@ async def mark_notification_read(notification_id: str, user_id: str = Depends(su
         raise HTTPException(status_code=500, detail=f"Error marking notification as read: {str(e)}")
 
 @router.post("/read-all")
-async def mark_all_notifications_read(user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def mark_all_notifications_read(user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Mark all notifications as read for a user."""
     try:
         # Use properly formatted ISO timestamp
         now = datetime.now(timezone.utc).isoformat()
         
         # First, get all unread notifications to count them
-        unread = supabase.table("notifications") \
+        unread = await supabase.table("notifications") \
             .select("id") \
             .eq("user_id", user_id) \
             .is_("read_at", "null") \
@@ -160,7 +154,7 @@ async def mark_all_notifications_read(user_id: str = Depends(supabase_helpers.ge
             
         # Then mark them all as read
         if unread.data:
-            response = supabase.table("notifications") \
+            response = await supabase.table("notifications") \
                 .update({"read_at": now}) \
                 .eq("user_id", user_id) \
                 .is_("read_at", "null") \
@@ -174,11 +168,11 @@ async def mark_all_notifications_read(user_id: str = Depends(supabase_helpers.ge
 
 
 @router.delete("/{notification_id}")
-async def delete_notification(notification_id: str, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def delete_notification(notification_id: str, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Delete a notification."""
     try:
         # Verify the notification belongs to the user
-        verification = supabase.table("notifications") \
+        verification = await supabase.table("notifications") \
             .select("id") \
             .eq("id", notification_id) \
             .eq("user_id", user_id) \
@@ -188,7 +182,7 @@ async def delete_notification(notification_id: str, user_id: str = Depends(supab
             raise HTTPException(status_code=404, detail="Notification not found or doesn't belong to user")
         
         # Delete the notification
-        response = supabase.table("notifications") \
+        response = await supabase.table("notifications") \
             .delete() \
             .eq("id", notification_id) \
             .execute()
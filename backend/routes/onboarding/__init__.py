@@ -11,7 +11,6 @@ router.add_api_route("/preview-folder-recommendations", preview_folder_recommend
 
 __all__ = [
     "router",
-    "supabase",
     "complete_onboarding",
     "preview_folder_recommendations",
 ]
\ No newline at end of file
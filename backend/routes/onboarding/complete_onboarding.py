@@ -6,7 +6,10 @@ from utils.onboarding.folder_assignment_service import FolderAssignmentService
 import dotenv
 import logging
 from models.onboarding import OnboardingCompletionData
-from .helpers import router, supabase
+from supabase import AsyncClient
+from .helpers import router
+from utils.supabase_client import get_supabase
+from utils.user_context_cache import invalidate_user_context
 from utils.middleware.localization import extract_locale_from_request
 
 logger = logging.getLogger(__name__)
@@ -19,7 +22,8 @@ dotenv.load_dotenv()
 async def complete_onboarding(
     request: Request,
     onboarding_data: OnboardingCompletionData,
-    user_id: str = Depends(supabase_helpers.get_user_from_session_token)
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """
     Complete user onboarding and assign personalized folders.
@@ -59,10 +63,11 @@ async def complete_onboarding(
                 update_data["signup_source"] = onboarding_data.signup_source
         
         # Save onboarding data to database
-        update_response = supabase.table("users_metadata") \
+        update_response = await supabase.table("users_metadata") \
             .update(update_data) \
             .eq("user_id", user_id) \
             .execute()
+        await invalidate_user_context(user_id)
         
         if not update_response.data:
             raise HTTPException(status_code=500, detail="Failed to save onboarding data")
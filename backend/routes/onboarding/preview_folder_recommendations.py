@@ -6,7 +6,9 @@ from utils.onboarding.folder_assignment_service import FolderAssignmentService
 import dotenv
 import logging
 from models.onboarding import FolderRecommendationRequest
-from .helpers import router, supabase
+from supabase import AsyncClient
+from .helpers import router
+from utils.supabase_client import get_supabase
 from utils.middleware.localization import extract_locale_from_request
 
 logger = logging.getLogger(__name__)
@@ -18,7 +20,8 @@ dotenv.load_dotenv()
 async def preview_folder_recommendations(
     request: Request,
     recommendation_request: FolderRecommendationRequest,
-    user_id: str = Depends(supabase_helpers.get_user_from_session_token)
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """
     Preview folder recommendations based on partial onboarding data.
@@ -3,12 +3,9 @@ from typing import Optional
 from fastapi import Depends, HTTPException
 from pydantic import BaseModel
 from utils import supabase_helpers
-from utils.access_control import get_user_metadata
-from supabase import create_client, Client
-import os
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 class OrganizationResponse(BaseModel):
     id: str
@@ -26,18 +23,17 @@ class APIResponse(BaseModel):
 async def get_organization_by_id(
     organization_id: str,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse:
     """Get a specific organization by ID if user has access."""
     try:
         # Check if user has access to this organization
-        user_metadata = get_user_metadata(supabase, user_id)
-        organization_ids = user_metadata.get("organization_ids", [])
-        
-        if organization_id not in organization_ids:
+        if organization_id not in user.organization_ids:
             raise HTTPException(status_code=403, detail="Access denied to this organization")
         
         # Fetch organization data
-        response = supabase.table("organizations").select("id, name, image_url, banner_url, created_at, website_url").eq("id", organization_id).single().execute()
+        response = await supabase.table("organizations").select("id, name, image_url, banner_url, created_at, website_url").eq("id", organization_id).single().execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Organization not found")
         
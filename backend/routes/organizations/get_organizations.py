@@ -3,12 +3,9 @@ from typing import List, Optional
 from fastapi import Depends, HTTPException
 from pydantic import BaseModel
 from utils import supabase_helpers
-from utils.access_control import get_user_metadata
-from supabase import create_client, Client
-import os
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 class OrganizationResponse(BaseModel):
     id: str
@@ -24,18 +21,18 @@ class APIResponse(BaseModel):
 
 async def get_organizations(
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse:
     """Get organizations that the user has access to."""
     try:
-        # Get user's organization IDs from metadata
-        user_metadata = get_user_metadata(supabase, user_id)
-        organization_ids = user_metadata.get("organization_ids", [])
+        organization_ids = user.organization_ids
         
         if not organization_ids:
             return APIResponse(success=True, data=[])
         
         # Fetch organizations data
-        response = supabase.table("organizations").select("id, name, image_url, banner_url, website_url").in_("id", organization_ids).execute()
+        response = await supabase.table("organizations").select("id, name, image_url, banner_url, website_url").in_("id", organization_ids).execute()
         
         organizations = []
         for org_data in (response.data or []):
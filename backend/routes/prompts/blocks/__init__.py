@@ -1,4 +1,4 @@
-from .helpers import router, supabase
+from .helpers import router
 
 from . import get_blocks
 from . import get_blocks_by_type
@@ -10,6 +10,5 @@ from . import seed_sample_blocks
 from . import get_block
 
 __all__ = [
-    "router",
-    "supabase"
+    "router"
 ]
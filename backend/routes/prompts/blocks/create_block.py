@@ -5,31 +5,32 @@ from models.common import APIResponse
 from utils import supabase_helpers
 from utils.middleware.localization import extract_locale_from_request 
 from utils.prompts.locales import ensure_localized_field
-from utils.access_control import get_user_metadata
-from .helpers import router, supabase, process_block_for_response
+from .helpers import router, process_block_for_response
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.prompts import bump_library_version
 
 @router.post("", response_model=APIResponse[BlockResponse])
 async def create_block(
     block: BlockCreate,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Create a new block with access control validation."""
     try:
         locale = extract_locale_from_request(request)
         
         # Get user metadata for validation
-        user_metadata = get_user_metadata(supabase, user_id)
-        
         # Validate organization/company access if specified
         if block.organization_id:
-            user_org_ids = user_metadata.get("organization_ids", [])
-            if block.organization_id not in user_org_ids:
+            if block.organization_id not in user.organization_ids:
                 raise HTTPException(status_code=403, detail="Access denied to specified organization")
         
         if block.company_id:
-            user_company_id = user_metadata.get("company_id")
-            if block.company_id != user_company_id:
+            if block.company_id != user.company_id:
                 raise HTTPException(status_code=403, detail="Access denied to specified company")
         
         # Convert string fields to localized format for database storage
@@ -48,7 +49,8 @@ async def create_block(
             "published": block.published if block.published is not None else True
         }
         
-        response = supabase.table("prompt_blocks").insert(block_data).execute()
+        response = await supabase.table("prompt_blocks").insert(block_data).execute()
+        await bump_library_version(response.data)
         
         if response.data:
             created_block = response.data[0]
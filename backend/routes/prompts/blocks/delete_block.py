@@ -2,22 +2,28 @@
 from fastapi import Depends, HTTPException, Request
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase
+from .helpers import router
 from utils.middleware.localization import extract_locale_from_request
 from utils.access_control import user_has_access_to_block
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.prompts import bump_library_version
 
 @router.delete("/{block_id}")
 async def delete_block(
     block_id: int,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Delete a block with access control validation."""
     try:
         locale = extract_locale_from_request(request)
         
         # Validate block access
-        access = user_has_access_to_block(supabase, user_id, block_id)
+        access = await user_has_access_to_block(supabase, user, block_id)
         if access is None:
             raise HTTPException(status_code=404, detail="Block not found")
         if not access:
@@ -25,7 +31,7 @@ async def delete_block(
 
         # Check if block is being used in templates
         templates_using_block = (
-            supabase.table("prompt_templates")
+            await supabase.table("prompt_templates")
             .select("id")
             .filter("metadata", "cs", f'"{block_id}"')  # Check if block_id exists in metadata JSON
             .execute()
@@ -35,7 +41,8 @@ async def delete_block(
             raise HTTPException(status_code=400, detail="Cannot delete block that is being used in templates")
 
         # Delete the block
-        supabase.table("prompt_blocks").delete().eq("id", block_id).execute()
+        deleted = await supabase.table("prompt_blocks").delete().eq("id", block_id).execute()
+        await bump_library_version(deleted.data)
         return APIResponse(success=True, message="Block deleted")
 
     except Exception as e:
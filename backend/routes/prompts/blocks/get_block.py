@@ -1,15 +1,20 @@
 from fastapi import Depends, HTTPException, Request  # ADD Request import
-from .helpers import router, supabase, get_access_conditions, process_block_for_response  # ADD process_block_for_response import
+from .helpers import router, get_access_conditions, process_block_for_response  # ADD process_block_for_response import
 from models.prompts.blocks import BlockResponse
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.middleware.localization import extract_locale_from_request  # ADD this import
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.get("/{block_id}", response_model=APIResponse[BlockResponse])
 async def get_block(
     block_id: int,
     request: Request,  # ADD this parameter
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Retrieve a single block by ID if user has access."""
     try:
@@ -17,9 +22,9 @@ async def get_block(
         locale = extract_locale_from_request(request)
         print(f"🌍 GET_BLOCK - LOCALE DETECTED: {locale} for block_id: {block_id}")  # DEBUG PRINT
         
-        access_conditions = get_access_conditions(supabase, user_id)
+        access_conditions = get_access_conditions(user)
         response = (
-            supabase.table("prompt_blocks")
+            await supabase.table("prompt_blocks")
             .select("*")
             .eq("id", block_id)
             .or_(",".join(access_conditions))
@@ -1,16 +1,21 @@
 from typing import List, Optional
 from fastapi import Depends, HTTPException, Request
-from .helpers import router, supabase, get_access_conditions, process_block_for_response
+from .helpers import router, get_access_conditions, process_block_for_response
 from models.prompts.blocks import BlockResponse, BlockType
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.middleware.localization import extract_locale_from_request
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.get("", response_model=APIResponse[List[BlockResponse]])
 async def get_blocks(
     request: Request,
     type: Optional[BlockType] = None,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Get blocks accessible to the user"""
     #try:
@@ -21,11 +26,11 @@ async def get_blocks(
     print("query", query)
     if type:
         query = query.eq("type", type)
-    access_conditions = get_access_conditions(supabase, user_id)
+    access_conditions = get_access_conditions(user)
     print("access_conditions", access_conditions)
     query = query.or_(",".join(access_conditions))
     query = query.order("created_at", desc=True)
-    response = query.execute()
+    response = await query.execute()
 
     
     # Process blocks for localized response
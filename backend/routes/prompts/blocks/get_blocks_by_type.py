@@ -1,16 +1,21 @@
 from typing import List
 from fastapi import Depends, HTTPException, Request  # ADD Request import
-from .helpers import router, supabase, get_access_conditions, process_block_for_response  # ADD process_block_for_response import
+from .helpers import router, get_access_conditions, process_block_for_response  # ADD process_block_for_response import
 from models.prompts.blocks import BlockResponse
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.middleware.localization import extract_locale_from_request  # ADD this import
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.get("/by-type/{block_type}", response_model=APIResponse[List[BlockResponse]])
 async def get_blocks_by_type(
     block_type: str,
     request: Request,  # ADD this parameter
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Get all blocks of a specific type accessible to the user."""
     try:
@@ -19,10 +24,10 @@ async def get_blocks_by_type(
         print(f"🌍 GET_BLOCKS_BY_TYPE - LOCALE DETECTED: {locale} for type: {block_type}")  # DEBUG PRINT
         
         query = supabase.table("prompt_blocks").select("*").eq("type", block_type)
-        access_conditions = get_access_conditions(supabase, user_id)
+        access_conditions = get_access_conditions(user)
         query = query.or_(",".join(access_conditions))
         query = query.order("created_at", desc=True)
-        response = query.execute()
+        response = await query.execute()
         
         # Process blocks for localized response
         processed_blocks = []
@@ -1,6 +1,4 @@
 from fastapi import APIRouter
-from supabase import create_client, Client
-import os
 from utils.access_control import get_access_conditions
 from utils import supabase_helpers
 from models.prompts.blocks import BlockCreate, BlockUpdate, BlockResponse, BlockType
@@ -8,7 +6,6 @@ from models.common import APIResponse
 from utils.prompts.locales import extract_localized_field
 
 
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
 router = APIRouter(tags=["Blocks"])
 
 def process_block_for_response(block_data: dict, locale: str = "en") -> dict:
@@ -1,11 +1,15 @@
 from fastapi import Depends, HTTPException
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase
+from .helpers import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.prompts import bump_library_version
 
 @router.post("/seed-sample-blocks")
 async def seed_sample_blocks(
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
 ):
     """Seed some sample blocks for testing (development only)"""
     try:
@@ -39,7 +43,8 @@ async def seed_sample_blocks(
             }
         ]
 
-        response = supabase.table("prompt_blocks").insert(sample_blocks).execute()
+        response = await supabase.table("prompt_blocks").insert(sample_blocks).execute()
+        await bump_library_version(response.data)
 
         return APIResponse(success=True, data=response.data, message="Sample blocks created")
 
@@ -1,10 +1,13 @@
 from fastapi import Depends, HTTPException, Request  # ADD Request import
-from .helpers import router, supabase, process_block_for_response  # ADD process_block_for_response import
+from .helpers import router, process_block_for_response  # ADD process_block_for_response import
 from models.prompts.blocks import BlockUpdate, BlockResponse
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.middleware.localization import extract_locale_from_request  # ADD this import
 from utils.prompts.locales import ensure_localized_field  # ADD this import
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.prompts import bump_library_version
 
 @router.put("/{block_id}", response_model=APIResponse[BlockResponse])
 async def update_block(
@@ -12,6 +15,7 @@ async def update_block(
     block: BlockUpdate,
     request: Request,  # ADD this parameter
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
 ):
     """Update a block (only if user owns it)"""
     try:
@@ -20,7 +24,7 @@ async def update_block(
         print(f"🌍 UPDATE_BLOCK - LOCALE DETECTED: {locale} for block_id: {block_id}")  # DEBUG PRINT
         print(f"📝 UPDATE_BLOCK - DATA RECEIVED: title='{block.title}', content='{block.content}', description='{block.description}'")  # DEBUG PRINT
         
-        existing_block = supabase.table("prompt_blocks").select("*").eq("id", block_id).eq("user_id", user_id).single().execute()
+        existing_block = await supabase.table("prompt_blocks").select("*").eq("id", block_id).eq("user_id", user_id).single().execute()
         if not existing_block.data:
             raise HTTPException(status_code=404, detail="Block not found or access denied")
 
@@ -43,7 +47,8 @@ async def update_block(
         if not update_data:
             raise HTTPException(status_code=400, detail="No valid fields to update")
 
-        response = supabase.table("prompt_blocks").update(update_data).eq("id", block_id).execute()
+        response = await supabase.table("prompt_blocks").update(update_data).eq("id", block_id).execute()
+        await bump_library_version(response.data, existing_block.data)
         if response.data:
             # Process the response to return localized strings
             updated_block = response.data[0]
@@ -8,10 +8,7 @@ router = APIRouter(tags=["Folders"])
 
 from .helpers import (
     router,
-    supabase,
     PromptType,
-    get_user_organizations,
-    get_user_company,
     fetch_folders_by_type,
     fetch_templates_for_folders,
     organize_templates_by_folder,
@@ -43,7 +40,6 @@ from . import get_template_folders
 
 __all__ = [
     "router",
-    "supabase",
     "create_folder",
     "update_folder",
     "delete_folder",
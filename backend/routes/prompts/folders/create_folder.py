@@ -2,17 +2,23 @@
 from fastapi import Depends, HTTPException, Request
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase
+from .helpers import router
 from models.prompts.folders import FolderCreate
 from utils.middleware.localization import extract_locale_from_request 
 from utils.prompts.locales import ensure_localized_field
 from utils.access_control import user_has_access_to_folder
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.prompts import bump_library_version
 
 @router.post("")
 async def create_folder(
     folder: FolderCreate,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse[dict]:
     """Create a new user folder with access control validation."""
     try:
@@ -20,7 +26,7 @@ async def create_folder(
         
         # Validate parent folder access if specified
         if folder.parent_folder_id:
-            parent_access = user_has_access_to_folder(supabase, user_id, folder.parent_folder_id)
+            parent_access = await user_has_access_to_folder(supabase, user, folder.parent_folder_id)
             if parent_access is None:
                 raise HTTPException(status_code=404, detail="Parent folder not found")
             if not parent_access:
@@ -29,7 +35,7 @@ async def create_folder(
         localized_title = ensure_localized_field(folder.title, locale) if folder.title else {}
         localized_description = ensure_localized_field(folder.description, locale) if folder.description else {}
 
-        response = supabase.table("prompt_folders").insert({
+        response = await supabase.table("prompt_folders").insert({
             "user_id": user_id,
             "organization_id": None,
             "company_id": None,
@@ -38,6 +44,7 @@ async def create_folder(
             "title": localized_title,
             "description": localized_description,
         }).execute()
+        await bump_library_version(response.data)
 
         if response.data and len(response.data) > 0:
             return APIResponse(success=True, data=response.data[0])
@@ -2,8 +2,11 @@ from typing import Optional
 from fastapi import Depends, HTTPException
 from models.common import APIResponse
 from utils import supabase_helpers
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 from .helpers import (
-    router, supabase, PromptType, fetch_folders_by_type,
+    router, PromptType, fetch_folders_by_type,
     fetch_templates_for_folders, organize_templates_by_folder,
     add_templates_to_folders
 )
@@ -15,6 +18,8 @@ async def get_template_folders(
     empty: bool = False,
     locale: Optional[str] = None,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse[dict]:
     """Get template folders by type with proper error handling."""
     try:
@@ -29,7 +34,7 @@ async def get_template_folders(
         folder_resp = await fetch_folders_by_type(
             supabase,
             folder_type=type.value,
-            user_id=user_id if type == PromptType.user else None,
+            user=user,
             folder_ids=folder_id_list if folder_id_list else None,
             locale=locale
         )
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import AsyncClient
 from utils import supabase_helpers
 from utils.prompts import (
     fetch_templates_for_folders,
@@ -12,18 +12,13 @@ from utils.prompts import (
     create_localized_field,
     determine_folder_type
 )
-import dotenv
-import os
 from typing import List, Optional
 from enum import Enum
 from models.common import APIResponse
+from utils.user_context import UserContext
+from utils.access_control import apply_access_conditions
 
 
-dotenv.load_dotenv()
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 router = APIRouter(tags=["Folders"])
 
 
@@ -34,32 +29,10 @@ class PromptType(str, Enum):
 
 # ---------------------- HELPER FUNCTIONS ----------------------
 
-async def get_user_organizations(user_id: str) -> APIResponse[List[str]]:
-    """Get all organization IDs a user belongs to"""
-    try:
-        user_metadata = supabase.table("users_metadata").select("organization_ids").eq("user_id", user_id).single().execute()
-        if user_metadata.data and user_metadata.data.get("organization_ids"):
-            return APIResponse(success=True, data=user_metadata.data.get("organization_ids", []))
-        return APIResponse(success=True, data=[])
-    except Exception as e:
-        print(f"Error fetching user organizations: {str(e)}")
-        return APIResponse(success=False, message="Error fetching user organizations")
-
-async def get_user_company(user_id: str) -> APIResponse[Optional[str]]:
-    """Get company ID a user belongs to"""
-    try:
-        user_metadata = supabase.table("users_metadata").select("company_id").eq("user_id", user_id).single().execute()
-        if user_metadata.data:
-            return APIResponse(success=True, data=user_metadata.data.get("company_id"))
-        return APIResponse(success=True, data=None)
-    except Exception as e:
-        print(f"Error fetching user company: {str(e)}")
-        return APIResponse(success=False, message="Error fetching user company")
-
 async def fetch_folders_by_type(
-    supabase: Client,
+    supabase: AsyncClient,
     folder_type: str,
-    user_id: Optional[str] = None,
+    user: Optional[UserContext] = None,
     folder_ids: Optional[List[int]] = None,
     locale: str = "en"
 ) -> APIResponse[List[dict]]:
@@ -68,70 +41,25 @@ async def fetch_folders_by_type(
         # Start with base query
         query = supabase.table("prompt_folders").select("*").eq("type", folder_type)
         
-        if folder_type == "user" and user_id:
+        if folder_type == "user" and user:
             # User folders: owned by the user
-            query = query.eq("user_id", user_id)
-        elif folder_type == "company" and user_id:
+            query = query.eq("user_id", user.user_id)
+        elif folder_type == "company" and user:
             # Company folders: from user's company
-            company_resp = await get_user_company(user_id)
-            if not company_resp.success:
-                return company_resp
-            company_id = company_resp.data
-            if company_id:
-                query = query.eq("company_id", company_id)
+            if user.company_id:
+                query = query.eq("company_id", user.company_id)
             else:
-                return APIResponse(success=False, message="No company, no folders")
-        elif folder_type == "official" and user_id:
-            # We'll need multiple queries for official folders
-            folders = []
-            
-            # 1. Global official folders (no IDs)
-            global_query = supabase.table("prompt_folders").select("*") \
-                .eq("type", folder_type) \
-                .is_("user_id", "null") \
-                .is_("company_id", "null") \
-                .is_("organization_id", "null")
-                
-            if folder_ids:
-                global_query = global_query.in_("id", folder_ids)
-                
-            global_response = global_query.execute()
-            if global_response.data:
-                folders.extend(global_response.data)
-            
-            # 2. User's organization folders
-            org_resp = await get_user_organizations(user_id)
-            if not org_resp.success:
-                return org_resp
-            for org_id in org_resp.data:
-                org_query = supabase.table("prompt_folders").select("*") \
-                    .eq("type", folder_type) \
-                    .eq("organization_id", org_id)
-                    
-                if folder_ids:
-                    org_query = org_query.in_("id", folder_ids)
-                    
-                org_response = org_query.execute()
-                if org_response.data:
-                    folders.extend(org_response.data)
-            
-            # Process folders for response
-            processed_folders = []
-            for folder_data in folders:
-                from utils.prompts.folders import process_folder_for_response
-                processed_folder = process_folder_for_response(folder_data, locale)
-                processed_folders.append(processed_folder)
-            
-            return APIResponse(success=True, data=processed_folders)
-        
-        # For user and company folders, continue with the original query
+                return APIResponse(success=True, data=[])
+        elif user:
+            # Official folders: global ones plus those of the user's organizations
+            query = apply_access_conditions(query, user, include_global=True)
         
         # Filter by specific folder IDs if provided
         if folder_ids:
             query = query.in_("id", folder_ids)
         
         # Execute query
-        response = query.execute()
+        response = await query.execute()
         
         # Process folders for response
         folders = []
@@ -2,9 +2,13 @@
 from fastapi import Depends, HTTPException
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase
+from .helpers import router
 
 from utils.access_control import user_has_access_to_folder
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.pinned_items import PINNED_FOLDERS, update_pinned_ids
 
 
 # routes/prompts/folders/pin_folder.py - REPLACE THE pin_folder FUNCTION
@@ -12,33 +16,19 @@ from utils.access_control import user_has_access_to_folder
 async def pin_folder(
     folder_id: int,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse[dict]:
     """Pin a folder with access control validation."""
     try:
         # Validate folder access
-        access = user_has_access_to_folder(supabase, user_id, folder_id)
+        access = await user_has_access_to_folder(supabase, user, folder_id)
         if access is None:
             raise HTTPException(status_code=404, detail="Folder not found")
         if not access:
             raise HTTPException(status_code=403, detail="Access denied to this folder")
         
-        # Get current pinned folder ids
-        user_meta_resp = (
-            supabase.table("users_metadata")
-            .select("pinned_folder_ids")
-            .eq("user_id", user_id)
-            .single()
-            .execute()
-        )
-        current_ids = user_meta_resp.data.get("pinned_folder_ids", []) if user_meta_resp.data else []
-        current_ids = current_ids if isinstance(current_ids, list) else []
-
-        if folder_id not in current_ids:
-            new_ids = current_ids + [folder_id]
-            if user_meta_resp.data:
-                supabase.table("users_metadata").update({"pinned_folder_ids": new_ids}).eq("user_id", user_id).execute()
-            else:
-                supabase.table("users_metadata").insert({"user_id": user_id, "pinned_folder_ids": new_ids}).execute()
+        await update_pinned_ids(supabase, user_id, PINNED_FOLDERS, add=[folder_id])
         
         return APIResponse(success=True, data={
             "folder_id": folder_id,
@@ -2,11 +2,15 @@
 from fastapi import Depends, HTTPException, Request
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase
+from .helpers import router
 from models.prompts.folders import FolderUpdate
 from utils.middleware.localization import extract_locale_from_request 
 from utils.prompts.locales import ensure_localized_field
-from utils.access_control import user_has_access_to_folder
+from utils.access_control import fetch_owner_columns, record_access, user_has_access_to_folder
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.prompts import bump_library_version
 
 
 # routes/prompts/folders/update_folder.py - REPLACE ENTIRE FUNCTION
@@ -16,13 +20,17 @@ async def update_folder(
     folder: FolderUpdate,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse[dict]:
     """Update an existing folder with access control validation."""
     try:
         locale = extract_locale_from_request(request)
         
         # Validate folder access
-        access = user_has_access_to_folder(supabase, user_id, folder_id)
+        # Owner columns before the update, also needed to bump the old scope
+        previous = await fetch_owner_columns(supabase, "prompt_folders", folder_id)
+        access = record_access(previous, user)
         if access is None:
             raise HTTPException(status_code=404, detail="Folder not found")
         if not access:
@@ -30,7 +38,7 @@ async def update_folder(
         
         # Validate parent folder access if being changed
         if folder.parent_folder_id is not None and folder.parent_folder_id != 0:
-            parent_access = user_has_access_to_folder(supabase, user_id, folder.parent_folder_id)
+            parent_access = await user_has_access_to_folder(supabase, user, folder.parent_folder_id)
             if parent_access is None:
                 raise HTTPException(status_code=404, detail="Parent folder not found")
             if not parent_access:
@@ -49,7 +57,8 @@ async def update_folder(
         if not update_data:
             raise HTTPException(status_code=400, detail="No valid fields to update")
 
-        response = supabase.table("prompt_folders").update(update_data).eq("id", folder_id).execute()
+        response = await supabase.table("prompt_folders").update(update_data).eq("id", folder_id).execute()
+        await bump_library_version(response.data, previous)
 
         if response.data:
             from utils.prompts.folders import process_folder_for_response
@@ -2,13 +2,16 @@ from typing import List
 from fastapi import Depends, HTTPException
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase, update_user_pinned_folders
+from .helpers import router, update_user_pinned_folders
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
 
 @router.post("/update-pinned")
 async def update_pinned_folders_endpoint(
     official_folder_ids: List[int],
     company_folder_ids: List[int],
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
 ) -> APIResponse[dict]:
     """Update all pinned folders in one call."""
     try:
@@ -1,4 +1,4 @@
-from .helpers import router, supabase, get_user_organizations, get_user_company
+from .helpers import router
 
 # Import route modules to register them with the router
 from . import create_template
@@ -17,7 +17,6 @@ from . import unpin_template
 
 __all__ = [
     "router",
-    "supabase",
     "create_template",
     "delete_template",
     "duplicate_template",
@@ -3,16 +3,21 @@ from fastapi import Depends, HTTPException, Request
 from models.prompts.templates import TemplateCreate, TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
-from utils.prompts import process_template_for_response, validate_block_access, normalize_localized_field
-from utils.access_control import get_user_metadata, user_has_access_to_folder
+from utils.prompts import process_template_for_response, validate_block_access, normalize_localized_field, bump_library_version
+from utils.access_control import user_has_access_to_folder
 from utils.middleware.localization import extract_locale_from_request
-from . import router, supabase
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.post("", response_model=APIResponse[TemplateResponse])
 async def create_template(
     template: TemplateCreate,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Create a new template with access control validation."""
     try:
@@ -22,12 +27,9 @@ async def create_template(
         if template.type not in ["user", "company", "organization", "official"]:
             raise HTTPException(status_code=400, detail="Invalid template type")
         
-        # Get user metadata
-        user_metadata = get_user_metadata(supabase, user_id)
-        
         # Validate folder access if folder_id is provided
         if template.folder_id:
-            folder_access = user_has_access_to_folder(supabase, user_id, template.folder_id)
+            folder_access = await user_has_access_to_folder(supabase, user, template.folder_id)
             if folder_access is None:
                 raise HTTPException(status_code=404, detail="Folder not found")
             if not folder_access:
@@ -51,7 +53,7 @@ async def create_template(
                 
             all_block_ids.update(bid for bid in metadata_blocks if bid and bid != 0)
             
-            if all_block_ids and not await validate_block_access(list(all_block_ids), user_id):
+            if all_block_ids and not await validate_block_access(supabase, list(all_block_ids), user):
                 raise HTTPException(status_code=403, detail="Access denied to one or more referenced blocks")
         
         # Prepare template data based on type
@@ -72,17 +74,18 @@ async def create_template(
         if template.type == "user":
             template_data["user_id"] = user_id
         elif template.type == "company":
-            template_data["company_id"] = user_metadata.get("company_id")
+            template_data["company_id"] = user.company_id
             if not template_data["company_id"]:
                 raise HTTPException(status_code=400, detail="User has no company for company template")
         elif template.type == "organization":
-            organization_ids = user_metadata.get("organization_ids", [])
+            organization_ids = user.organization_ids
             if not organization_ids:
                 raise HTTPException(status_code=400, detail="User doesn't belong to any organization")
             template_data["organization_id"] = organization_ids[0]  # Default to first org
         
         # Insert template into database
-        response = supabase.table("prompt_templates").insert(template_data).execute()
+        response = await supabase.table("prompt_templates").insert(template_data).execute()
+        await bump_library_version(response.data)
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to create template")
@@ -4,7 +4,11 @@ from models.common import APIResponse
 from utils import supabase_helpers
 from utils.access_control import user_has_access_to_template
 
-from . import router, supabase
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.prompts import bump_library_version
 
 
 # routes/prompts/templates/delete_template.py - REPLACE ENTIRE FUNCTION
@@ -12,6 +16,8 @@ from . import router, supabase
 async def delete_template(
     template_id: str,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Delete a template with access control validation."""
     try:
@@ -21,14 +27,15 @@ async def delete_template(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid template ID format")
         
-        access = user_has_access_to_template(supabase, user_id, template_id_int)
+        access = await user_has_access_to_template(supabase, user, template_id_int)
         if access is None:
             raise HTTPException(status_code=404, detail="Template not found")
         if not access:
             raise HTTPException(status_code=403, detail="Access denied to this template")
 
         # Delete the template
-        supabase.table("prompt_templates").delete().eq("id", template_id).execute()
+        deleted = await supabase.table("prompt_templates").delete().eq("id", template_id).execute()
+        await bump_library_version(deleted.data)
         return APIResponse(success=True, message="Template deleted")
         
     except Exception as e:
@@ -2,18 +2,22 @@ from fastapi import Depends, HTTPException
 from models.prompts.templates import TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
-from utils.prompts import process_template_for_response, validate_block_access
-from utils.access_control import get_user_metadata
-from . import router, supabase
+from utils.prompts import process_template_for_response, validate_block_access, bump_library_version
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.post("/{template_id}/duplicate", response_model=APIResponse[TemplateResponse])
 async def duplicate_template(
     template_id: str,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Duplicate an existing template."""
     try:
-        original_response = supabase.table("prompt_templates").select("*").eq("id", template_id).single().execute()
+        original_response = await supabase.table("prompt_templates").select("*").eq("id", template_id).single().execute()
 
         if not original_response.data:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -23,12 +27,10 @@ async def duplicate_template(
         if original_template.get("type") == "user" and original_template.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         elif original_template.get("type") == "organization":
-            metadata = get_user_metadata(supabase, user_id)
-            if original_template.get("organization_id") not in (metadata.get("organization_ids") or []):
+            if original_template.get("organization_id") not in user.organization_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
         elif original_template.get("type") == "company":
-            metadata = get_user_metadata(supabase, user_id)
-            if original_template.get("company_id") != metadata.get("company_id"):
+            if original_template.get("company_id") != user.company_id:
                 raise HTTPException(status_code=403, detail="Access denied")
 
         duplicate_data = {
@@ -42,7 +44,8 @@ async def duplicate_template(
             "usage_count": 0
         }
 
-        response = supabase.table("prompt_templates").insert(duplicate_data).execute()
+        response = await supabase.table("prompt_templates").insert(duplicate_data).execute()
+        await bump_library_version(response.data)
 
         if response.data:
             processed_template = process_template_for_response(response.data[0], "en")
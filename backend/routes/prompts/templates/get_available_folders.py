@@ -4,16 +4,19 @@ from typing import List
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.prompts import process_folder_for_response
-from ..folders.helpers import router, supabase
+from ..folders.helpers import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
 
 @router.get("/available-folders")
 async def get_available_folders(
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
 ) -> APIResponse[List[dict]]:
     """Get all available folders where a template can be moved."""
     try:
         # Get all user folders
-        response = supabase.table("prompt_folders").select("*") \
+        response = await supabase.table("prompt_folders").select("*") \
             .eq("user_id", user_id) \
             .eq("type", "user") \
             .order("parent_folder_id", nulls_first=True) \
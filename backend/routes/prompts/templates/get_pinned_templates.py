@@ -2,28 +2,33 @@ from typing import List
 from fastapi import Depends, HTTPException, Request
 from models.common import APIResponse
 from utils import supabase_helpers
-from .helpers import router, supabase, process_template_for_response
+from .helpers import router, process_template_for_response
 from utils.middleware.localization import extract_locale_from_request
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.access_control import apply_access_conditions
 
 @router.get("/pinned", response_model=APIResponse[List[dict]])
 async def get_pinned_templates(
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ) -> APIResponse[List[dict]]:
     """Get user's pinned templates."""
     try:
         locale = extract_locale_from_request(request)
         print(f"🌍 GET_PINNED_TEMPLATES - LOCALE DETECTED: {locale}")
         
-        # Get user's pinned template IDs
-        user_metadata = supabase.table("users_metadata").select("pinned_templates").eq("user_id", user_id).single().execute()
-        pinned_template_ids = user_metadata.data.get("pinned_templates", []) if user_metadata.data else []
+        pinned_template_ids = user.pinned_template_ids
         
         if not pinned_template_ids:
             return APIResponse(success=True, data=[])
         
         # Get the actual templates
-        templates_response = supabase.table("prompt_templates").select("*").in_("id", pinned_template_ids).execute()
+        query = supabase.table("prompt_templates").select("*").in_("id", pinned_template_ids)
+        templates_response = await apply_access_conditions(query, user, include_global=True).execute()
         
         processed_templates = []
         for template_data in (templates_response.data or []):
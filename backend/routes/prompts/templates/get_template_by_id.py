@@ -4,18 +4,22 @@ from models.prompts.templates import TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
 from utils.prompts import process_template_for_response
-from utils.access_control import get_user_metadata
-from . import router, supabase
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.get("/{template_id}", response_model=APIResponse[TemplateResponse])
 async def get_template_by_id(
     template_id: str,
     locale: Optional[str] = "en",
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Get a specific template by ID."""
     try:
-        response = supabase.table("prompt_templates").select("*").eq("id", template_id).single().execute()
+        response = await supabase.table("prompt_templates").select("*").eq("id", template_id).single().execute()
 
         if not response.data:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -25,12 +29,10 @@ async def get_template_by_id(
         if template_data.get("type") == "user" and template_data.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         elif template_data.get("type") == "organization":
-            metadata = get_user_metadata(supabase, user_id)
-            if template_data.get("organization_id") not in (metadata.get("organization_ids") or []):
+            if template_data.get("organization_id") not in user.organization_ids:
                 raise HTTPException(status_code=403, detail="Access denied")
         elif template_data.get("type") == "company":
-            metadata = get_user_metadata(supabase, user_id)
-            if template_data.get("company_id") != metadata.get("company_id"):
+            if template_data.get("company_id") != user.company_id:
                 raise HTTPException(status_code=403, detail="Access denied")
 
         processed_template = process_template_for_response(template_data, locale)
@@ -1,21 +1,34 @@
 from typing import Optional, List
-from fastapi import Depends, HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Request, Response
 from models.prompts.templates import TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
-from utils.prompts import process_template_for_response
-from . import router, supabase
+from utils.prompts import process_template_for_response, check_not_modified
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
+from utils.access_control import apply_access_conditions
 
 @router.get("", response_model=APIResponse[List[TemplateResponse]])
 async def get_templates(
+    request: Request,
+    response: Response,
     type: Optional[str] = None,
     folder_ids: Optional[str] = None,
     locale: Optional[str] = "en",
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Get templates filtered by type or folder IDs."""
     try:
+        not_modified = await check_not_modified(request, response, user)
+        if not_modified:
+            return not_modified
+
         query = supabase.table("prompt_templates").select("*")
+        query = apply_access_conditions(query, user, include_global=True)
 
         if type:
             query = query.eq("type", type)
@@ -28,9 +41,9 @@ async def get_templates(
             if folder_id_list:
                 query = query.in_("folder_id", folder_id_list)
 
-        response = query.execute()
+        templates_response = await query.execute()
         templates = []
-        for template_data in (response.data or []):
+        for template_data in (templates_response.data or []):
             processed = process_template_for_response(template_data, locale)
             templates.append(processed)
             
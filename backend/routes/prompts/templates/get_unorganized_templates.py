@@ -6,16 +6,21 @@ from fastapi import Depends, HTTPException, Request
 from models.prompts.templates import TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
-from . import router, supabase
+from . import router
 from utils.prompts import process_template_for_response
 from utils.access_control import apply_access_conditions
 from utils.middleware.localization import extract_locale_from_request
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 @router.get("/unorganized", response_model=APIResponse[List[TemplateResponse]])
 async def get_unorganized_templates_endpoint(
     request: Request,
     locale: Optional[str] = None,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Get all templates that are not organized in any folder with access control."""
     try:
@@ -25,9 +30,9 @@ async def get_unorganized_templates_endpoint(
         
         # Get all accessible templates without folder (not just user templates)
         query = supabase.table("prompt_templates").select("*")
-        query = apply_access_conditions(query, supabase, user_id)  # This handles user/company/org access
+        query = apply_access_conditions(query, user)  # This handles user/company/org access
         query = query.is_("folder_id", "null")
-        response = query.execute()
+        response = await query.execute()
     
 
         templates = []
@@ -1,56 +1,26 @@
 # routes/prompts/templates.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional, List, Union, Dict
-from supabase import create_client, Client
-import os
+from supabase import AsyncClient
 from utils import supabase_helpers
 from utils.prompts import (
     process_template_for_response,
     validate_block_access,
     normalize_localized_field
 )
-from utils.access_control import get_user_metadata
-import dotenv
+from utils.user_context import UserContext
 from models.prompts.templates import TemplateCreate, TemplateUpdate, TemplateResponse, TemplateMetadata
 from models.common import APIResponse
-dotenv.load_dotenv()
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 
 router = APIRouter(tags=["Templates"])
 
 # ---------------------- HELPER FUNCTIONS ----------------------
 
-async def get_user_organizations(user_id: str) -> List[str]:
-    """Get all organization IDs a user belongs to"""
-    try:
-        user_metadata = supabase.table("users_metadata").select("organization_ids").eq("user_id", user_id).single().execute()
-        if user_metadata.data and user_metadata.data.get("organization_ids"):
-            return user_metadata.data.get("organization_ids", [])
-        return []
-    except Exception as e:
-        print(f"Error fetching user organizations: {str(e)}")
-        return []
-
-async def get_user_company(user_id: str) -> Optional[str]:
-    """Get company ID a user belongs to"""
-    try:
-        user_metadata = supabase.table("users_metadata").select("company_id").eq("user_id", user_id).single().execute()
-        if user_metadata.data:
-            return user_metadata.data.get("company_id")
-        return None
-    except Exception as e:
-        print(f"Error fetching user company: {str(e)}")
-        return None
-    
-
-async def get_user_templates(user_id: str, locale: str = "en"):
+async def get_user_templates(supabase: AsyncClient, user_id: str, locale: str = "en"):
     """Get user's personal templates."""
     try:
         # Get user templates
-        response = supabase.table("prompt_templates").select("*").eq("user_id", user_id).eq("type", "user").execute()
+        response = await supabase.table("prompt_templates").select("*").eq("user_id", user_id).eq("type", "user").execute()
         
         templates = []
         for template_data in (response.data or []):
@@ -64,7 +34,7 @@ async def get_user_templates(user_id: str, locale: str = "en"):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving user templates: {str(e)}")
 
-async def get_official_templates(user_id: Optional[str] = None, locale: str = "en"):
+async def get_official_templates(supabase: AsyncClient, user: Optional[UserContext] = None, locale: str = "en"):
     """
     Get official prompt templates.
     Official templates now include:
@@ -72,8 +42,7 @@ async def get_official_templates(user_id: Optional[str] = None, locale: str = "e
     2. Templates belonging to organizations the user is a member of
     """
     try:
-        # Get user's organizations
-        org_ids = await get_user_organizations(user_id) if user_id else []
+        org_ids = user.organization_ids if user else []
         
         # Start with a base query
         query = supabase.table("prompt_templates").select("*").eq("type", "official")
@@ -81,7 +50,7 @@ async def get_official_templates(user_id: Optional[str] = None, locale: str = "e
         # Use proper PostgREST filter syntax
         # First, get templates that have no IDs (truly official)
         no_ids_query = query.is_("user_id", "null").is_("company_id", "null").is_("organization_id", "null")
-        response = no_ids_query.execute()
+        response = await no_ids_query.execute()
         templates = response.data or []
         
         # Then, if user has organizations, get templates from those orgs
@@ -90,7 +59,7 @@ async def get_official_templates(user_id: Optional[str] = None, locale: str = "e
                 org_query = supabase.table("prompt_templates").select("*") \
                     .eq("type", "official") \
                     .eq("organization_id", org_id)
-                org_response = org_query.execute()
+                org_response = await org_query.execute()
                 if org_response.data:
                     templates.extend(org_response.data)
         
@@ -108,20 +77,16 @@ async def get_official_templates(user_id: Optional[str] = None, locale: str = "e
         raise HTTPException(status_code=500, detail=f"Error retrieving official templates: {str(e)}")
     
     
-async def get_company_templates(user_id: Optional[str] = None, locale: str = "en"):
+async def get_company_templates(supabase: AsyncClient, user: Optional[UserContext] = None, locale: str = "en"):
     """Get company templates for the user's company."""
     try:
-        company_id = None
-        
-        if user_id:
-            # Get user's company_id
-            company_id = await get_user_company(user_id)
+        company_id = user.company_id if user else None
         
         if not company_id:
             return []
         
         # Get company templates
-        response = supabase.table("prompt_templates").select("*").eq("type", "company").eq("company_id", company_id).execute()
+        response = await supabase.table("prompt_templates").select("*").eq("type", "company").eq("company_id", company_id).execute()
         
         templates = []
         for template_data in (response.data or []):
@@ -135,13 +100,13 @@ async def get_company_templates(user_id: Optional[str] = None, locale: str = "en
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving company templates: {str(e)}")
 
-async def get_all_templates(user_id: str, locale: str = "en"):
+async def get_all_templates(supabase: AsyncClient, user: UserContext, locale: str = "en"):
     """Get templates organized by type (official, company, and user)."""
     #try:
     # Get all template types
-    user_templates = await get_user_templates(user_id, locale)
-    official_templates = await get_official_templates(user_id, locale)
-    company_templates = await get_company_templates(user_id, locale)
+    user_templates = await get_user_templates(supabase, user.user_id, locale)
+    official_templates = await get_official_templates(supabase, user, locale)
+    company_templates = await get_company_templates(supabase, user, locale)
     
     # Combine all templates
     all_templates = user_templates + official_templates + company_templates
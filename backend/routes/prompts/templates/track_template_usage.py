@@ -1,31 +1,27 @@
 from fastapi import Depends, HTTPException
 from models.common import APIResponse
 from utils import supabase_helpers
-from . import router, supabase
+from . import router
+from utils.prompts.usage_counter import record_template_usage
 
 @router.post("/use/{template_id}")
 async def track_template_usage(
     template_id: str,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
 ):
-    """Track template usage."""
+    """Track template usage (buffered, written in batches by the usage counter)."""
     try:
-        template_response = supabase.table("prompt_templates").select("usage_count").eq("id", template_id).single().execute()
-
-        if not template_response.data:
-            raise HTTPException(status_code=404, detail="Template not found")
-
-        current_count = template_response.data.get("usage_count", 0)
-
-        update_data = {
-            "usage_count": current_count + 1,
-            "last_used_at": "now()"
-        }
-
-        supabase.table("prompt_templates").update(update_data).eq("id", template_id).execute()
+        try:
+            template_id_int = int(template_id)
+            pending_count = record_template_usage(template_id_int)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid template ID format")
+        if pending_count is None:
+            raise HTTPException(status_code=503, detail="Template usage buffer is full, retry later")
 
         return APIResponse(success=True, data={
-            "usage_count": current_count + 1
+            "template_id": template_id_int,
+            "pending_usage_count": pending_count
         })
 
     except Exception as e:
@@ -3,10 +3,13 @@ from fastapi import Depends, HTTPException, Request
 from models.prompts.templates import TemplateUpdate, TemplateResponse
 from models.common import APIResponse
 from utils import supabase_helpers
-from utils.prompts import process_template_for_response, normalize_localized_field
-from utils.access_control import user_has_access_to_template, user_has_access_to_folder
+from utils.prompts import process_template_for_response, normalize_localized_field, bump_library_version
+from utils.access_control import fetch_owner_columns, record_access, user_has_access_to_folder
 from utils.middleware.localization import extract_locale_from_request
-from . import router, supabase
+from . import router
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.user_context import UserContext, get_user_context
 
 
 # routes/prompts/templates/update_template.py - REPLACE ENTIRE FUNCTION
@@ -16,6 +19,8 @@ async def update_template(
     template: TemplateUpdate,
     request: Request,
     user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context),
 ):
     """Update an existing template with access control validation."""
     try:
@@ -27,7 +32,9 @@ async def update_template(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid template ID format")
         
-        access = user_has_access_to_template(supabase, user_id, template_id_int)
+        # Owner columns before the update, also needed to bump the old scope
+        previous = await fetch_owner_columns(supabase, "prompt_templates", template_id_int)
+        access = record_access(previous, user)
         if access is None:
             raise HTTPException(status_code=404, detail="Template not found")
         if not access:
@@ -35,7 +42,7 @@ async def update_template(
 
         # Validate folder access if folder_id is being updated
         if template.folder_id is not None and template.folder_id != 0:
-            folder_access = user_has_access_to_folder(supabase, user_id, template.folder_id)
+            folder_access = await user_has_access_to_folder(supabase, user, template.folder_id)
             if folder_access is None:
                 raise HTTPException(status_code=404, detail="Folder not found")
             if not folder_access:
@@ -58,7 +65,8 @@ async def update_template(
         if not update_data:
             raise HTTPException(status_code=400, detail="No valid fields to update")
 
-        response = supabase.table("prompt_templates").update(update_data).eq("id", template_id).execute()
+        response = await supabase.table("prompt_templates").update(update_data).eq("id", template_id).execute()
+        await bump_library_version(response.data, previous)
 
         if response.data:
             processed_template = process_template_for_response(response.data[0], locale)
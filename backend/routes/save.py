@@ -1,19 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field
-from supabase import create_client, Client
+from supabase import AsyncClient
 from utils import supabase_helpers
+from utils.supabase_client import get_supabase
+from utils.user_context_cache import invalidate_user_context
+from utils.stats.rollups import apply_message_rollups, apply_chat_rollups, apply_batch_rollups
+from utils.stats.message_fields import compute_message_fields
+from utils.stats.stats_cache import bump_user_data_version
+from utils.ingestion import (
+    SAVE_BATCH_CHUNK_SIZE, insert_message_rows, upsert_chat_rows, ingestion_enabled, ingestion_queue
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import dotenv
+import json
 import os
-from typing import List, Optional, Dict, Any
+import time
+import zlib
+from typing import AsyncIterator, Awaitable, List, Optional, Dict, Any
 
 dotenv.load_dotenv()
 
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 router = APIRouter(prefix="/save", tags=["Save"])
 
+# Longest accepted NDJSON line in /save/stream
+SAVE_STREAM_MAX_LINE_BYTES = int(os.getenv("SAVE_STREAM_MAX_LINE_BYTES", str(8 * 1024 * 1024)))
+
 class MessageData(BaseModel):
     message_provider_id: str
     content: str
@@ -60,10 +73,8 @@ class CombinedBatchRequest(BaseModel):
     messages: Optional[List[MessageData]] = []
     chats: Optional[List[ChatData]] = []
 
-@router.post("/message")
-async def save_message(message: MessageData, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
-    """Save a chat message with parent message ID support."""
-    #try:
+def build_message_row(user_id: str, message: MessageData) -> Dict[str, Any]:
+    """Turn a validated message payload into a ``messages`` row."""
     created_at = None
     if message.created_at:
         try:
@@ -90,29 +101,83 @@ async def save_message(message: MessageData, user_id: str = Depends(supabase_hel
         "created_at": created_at
     }
     
+    # Stats columns derived once at ingest instead of on every stats request
+    message_data.update(compute_message_fields(message.content, message.model, message.role))
+    
     # Add parent_message_provider_id if provided
     if message.parent_message_provider_id:
         message_data["parent_message_provider_id"] = message.parent_message_provider_id
+    
+    return message_data
+
+def build_chat_rows(user_id: str, chats: List[ChatData]) -> List[Dict[str, Any]]:
+    """One ``chats`` row per chat, last one wins (an upsert cannot touch a row twice)."""
+    rows_by_id = {}
+    for chat in chats:
+        rows_by_id[chat.chat_provider_id] = {
+            "user_id": user_id,
+            "chat_provider_id": chat.chat_provider_id,
+            "title": chat.title,
+            "provider_name": chat.provider_name
+        }
+    return list(rows_by_id.values())
+
+async def timed(timings: Dict[str, float], phase: str, awaitable: Awaitable):
+    """Await ``awaitable`` and record its duration in ``timings[phase]`` (ms)."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[phase] = round((time.perf_counter() - start) * 1000, 1)
+
+async def enqueue_message_rows(rows: List[Dict[str, Any]]):
+    """Hand rows to the write-behind queue; 503 if it is full or they could not be logged."""
+    try:
+        accepted = await ingestion_queue.enqueue(rows)
+    except OSError as e:
+        print(f"Ingestion log append error: {str(e)}")
+        raise HTTPException(status_code=503, detail="Could not persist messages, retry later")
+    if not accepted:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later")
+
+async def queue_message_rows(rows: List[Dict[str, Any]]) -> JSONResponse:
+    """Hand rows to the write-behind queue and answer 202 (503 if they were not accepted)."""
+    await enqueue_message_rows(rows)
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": f"Queued {len(rows)} messages",
+        "queued_count": len(rows)
+    })
+
+@router.post("/message")
+async def save_message(message: MessageData, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
+    """Save a chat message with parent message ID support."""
+    #try:
+    message_data = build_message_row(user_id, message)
+    if ingestion_enabled():
+        return await queue_message_rows([message_data])
         
     # Insert message with validated data
-    response = supabase.table("messages").insert(message_data).execute()
+    response = await supabase.table("messages").insert(message_data).execute()
+    await apply_message_rollups(supabase, user_id, response.data or [message_data])
+    bump_user_data_version(user_id)
     
     return {"success": True, "data": response.data}
     #except Exception as e:
     #    raise HTTPException(status_code=500, detail=f"Message save error: {str(e)}")
 @router.post("/chat")
-async def save_chat(chat: ChatData, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def save_chat(chat: ChatData, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Save a chat session."""
     try:
         # Check if chat already exists
-        existing = supabase.table("chats").select("id") \
+        existing = await supabase.table("chats").select("id") \
             .eq("user_id", user_id) \
             .eq("chat_provider_id", chat.chat_provider_id) \
             .execute()
             
         if existing.data:
             # Update existing chat
-            response = supabase.table("chats").update({
+            response = await supabase.table("chats").update({
                 "title": chat.title,
                 "provider_name": chat.provider_name,
             }).eq("user_id", user_id) \
@@ -120,23 +185,25 @@ async def save_chat(chat: ChatData, user_id: str = Depends(supabase_helpers.get_
               .execute()
         else:
             # Create new chat
-            response = supabase.table("chats").insert({
+            response = await supabase.table("chats").insert({
                 "user_id": user_id,
                 "chat_provider_id": chat.chat_provider_id,
                 "title": chat.title,
                 "provider_name": chat.provider_name,
             }).execute()
+            await apply_chat_rollups(supabase, user_id, response.data)
+        bump_user_data_version(user_id)
             
         return {"success": True, "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat save error: {str(e)}")
 
 @router.post("/user_metadata")
-async def save_user_metadata(metadata: UserMetadataData, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def save_user_metadata(metadata: UserMetadataData, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Save user metadata."""
     #try:
         # Check if metadata already exists
-    existing = supabase.table("users_metadata").select("id") \
+    existing = await supabase.table("users_metadata").select("id") \
         .eq("user_id", user_id) \
         .execute()
     
@@ -153,86 +220,37 @@ async def save_user_metadata(metadata: UserMetadataData, user_id: str = Depends(
         
     if existing.data:
         # Update existing metadata
-        response = supabase.table("users_metadata").update(update_data).eq("user_id", user_id).execute()
+        response = await supabase.table("users_metadata").update(update_data).eq("user_id", user_id).execute()
     else:
         # Create new metadata
         update_data["user_id"] = user_id
-        response = supabase.table("users_metadata").insert(update_data).execute()
+        response = await supabase.table("users_metadata").insert(update_data).execute()
+    await invalidate_user_context(user_id)
         
     return {"success": True, "data": response.data}
     #except Exception as e:
    #     raise HTTPException(status_code=500, detail=f"Metadata save error: {str(e)}")
 
 @router.post("/batch/message")
-async def save_batch_messages(batch_data: BatchMessagesRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def save_batch_messages(batch_data: BatchMessagesRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Save multiple messages in a single batch operation with parent message ID support."""
     #try:
     if not batch_data.messages:
         return {"success": True, "message": "No messages to save", "count": 0}
-        
-    # Check which message IDs already exist
-    message_ids = [msg.message_provider_id for msg in batch_data.messages]
-    existing_messages = {}
     
-    if message_ids:
-        existing_query = supabase.table("messages").select("message_provider_id") \
-            .eq("user_id", user_id) \
-            .in_("message_provider_id", message_ids) \
-            .execute()
-        
-        if existing_query.data:
-            for msg in existing_query.data:
-                existing_messages[msg['message_provider_id']] = True
+    messages_to_insert = [build_message_row(user_id, message) for message in batch_data.messages]
+    if ingestion_enabled():
+        return await queue_message_rows(messages_to_insert)
     
-    # Filter out messages that already exist
-    messages_to_insert = []
-    skipped_messages = 0
-    
-    for message in batch_data.messages:
-        if message.message_provider_id in existing_messages:
-            skipped_messages += 1
-            continue
-            
-        # Handle timestamp conversion
-        created_at = None
-        if message.created_at:
-            try:
-                # Convert timestamp to ISO format, handling both seconds and milliseconds
-                timestamp_in_seconds = message.created_at / 1000 if message.created_at > 1e10 else message.created_at
-                created_at = datetime.fromtimestamp(timestamp_in_seconds, tz=timezone.utc).isoformat()
-            except Exception as e:
-                # Use current time as fallback
-                created_at = datetime.now(tz=timezone.utc).isoformat()
-        else:
-            # If no timestamp provided, use current time
-            created_at = datetime.now(tz=timezone.utc).isoformat()
-            
-        # Prepare message data
-        message_data = {
-            "user_id": user_id,
-            "message_provider_id": message.message_provider_id,
-            "content": message.content,
-            "role": message.role,
-            "chat_provider_id": message.chat_provider_id,
-            "model": message.model,
-            "created_at": created_at
-        }
-        
-        # Add parent_message_provider_id if provided
-        if hasattr(message, 'parent_message_provider_id') and message.parent_message_provider_id:
-            message_data["parent_message_provider_id"] = message.parent_message_provider_id
-            
-        messages_to_insert.append(message_data)
-    
-    results = []
-    if messages_to_insert:
-        response = supabase.table("messages").insert(messages_to_insert).execute()
-        results = response.data
+    # Let the database drop messages it already has: ON CONFLICT DO NOTHING on
+    # (user_id, message_provider_id) returns only the rows actually inserted
+    results = await insert_message_rows(supabase, messages_to_insert)
+    skipped_messages = len(messages_to_insert) - len(results)
     
     return {
         "success": True,
-        "message": f"Saved {len(messages_to_insert)} messages, skipped {skipped_messages} existing messages",
-        "saved_count": len(messages_to_insert),
+        "message": f"Saved {len(results)} messages, skipped {skipped_messages} existing messages",
+        "saved_count": len(results),
         "skipped_count": skipped_messages,
         "total_count": len(batch_data.messages),
         "data": results
@@ -241,58 +259,19 @@ async def save_batch_messages(batch_data: BatchMessagesRequest, user_id: str = D
     #    raise HTTPException(status_code=500, detail=f"Message batch save error: {str(e)}")
 
 @router.post("/batch/chat")
-async def save_batch_chats(batch_data: BatchChatsRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def save_batch_chats(batch_data: BatchChatsRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
     """Save multiple chats in a single batch operation."""
     try:
         if not batch_data.chats:
             return {"success": True, "message": "No chats to save", "count": 0}
             
-        # Extract chat IDs to check for existing ones
-        chat_provider_ids = [chat.chat_provider_id for chat in batch_data.chats]
-        existing_chats = {}
-        
-        if chat_provider_ids:
-            existing_query = supabase.table("chats").select("chat_provider_id") \
-                .eq("user_id", user_id) \
-                .in_("chat_provider_id", chat_provider_ids) \
-                .execute()
-            
-            if existing_query.data:
-                for chat in existing_query.data:
-                    existing_chats[chat['chat_provider_id']] = True
-        
-        # Process updates and inserts
-        chats_to_insert = []
-        updated_chats = 0
-        
-        for chat in batch_data.chats:
-            if chat.chat_provider_id in existing_chats:
-                # Update existing chat
-                supabase.table("chats").update({
-                    "title": chat.title,
-                    "provider_name": chat.provider_name
-                }).eq("user_id", user_id) \
-                  .eq("chat_provider_id", chat.chat_provider_id) \
-                  .execute()
-                updated_chats += 1
-            else:
-                # Prepare for batch insert
-                chats_to_insert.append({
-                    "user_id": user_id,
-                    "chat_provider_id": chat.chat_provider_id,
-                    "title": chat.title,
-                    "provider_name": chat.provider_name
-                })
-        
-        results = []
-        if chats_to_insert:
-            response = supabase.table("chats").insert(chats_to_insert).execute()
-            results = response.data
+        rows = build_chat_rows(user_id, batch_data.chats)
+        results, updated_chats = await upsert_chat_rows(supabase, user_id, rows)
         
         return {
             "success": True,
-            "message": f"Saved {len(chats_to_insert)} new chats, updated {updated_chats} existing chats",
-            "inserted_count": len(chats_to_insert),
+            "message": f"Saved {len(results)} new chats, updated {updated_chats} existing chats",
+            "inserted_count": len(results),
             "updated_count": updated_chats,
             "total_count": len(batch_data.chats),
             "data": results
@@ -301,38 +280,179 @@ async def save_batch_chats(batch_data: BatchChatsRequest, user_id: str = Depends
         raise HTTPException(status_code=500, detail=f"Chat batch save error: {str(e)}")
 
 @router.post("/batch")
-async def save_batch(batch_data: CombinedBatchRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
-    """Save both chats and messages in a single batch operation."""
+async def save_batch(batch_data: CombinedBatchRequest, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
+    """
+    Save both chats and messages in a single batch operation.
+
+    Chats and messages do not depend on each other, so both writes run
+    concurrently; the stats rollups of everything inserted are then applied
+    in one pass, after both writes. The duration of each phase is returned
+    in ``timings_ms``.
+    """
     try:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
         results = {
             "messages": {"saved_count": 0, "skipped_count": 0, "total_count": 0},
             "chats": {"inserted_count": 0, "updated_count": 0, "total_count": 0}
         }
+        message_rows = [build_message_row(user_id, message) for message in batch_data.messages or []]
+        chat_rows = build_chat_rows(user_id, batch_data.chats or [])
+        
+        # Queue the messages if the write-behind queue is on (the flusher
+        # applies their rollups); chats are still written directly so their
+        # titles are up to date immediately
+        queued = bool(message_rows) and ingestion_enabled()
+        if queued:
+            await enqueue_message_rows(message_rows)
+            results["messages"] = {"queued_count": len(message_rows), "total_count": len(message_rows)}
+        
+        # Phase 1: both writes at once, rollups deferred
+        writes = []
+        if message_rows and not queued:
+            writes.append(timed(timings, "messages", insert_message_rows(supabase, message_rows, rollups=False)))
+        if chat_rows:
+            writes.append(timed(timings, "chats", upsert_chat_rows(supabase, user_id, chat_rows, rollups=False)))
+        written = await timed(timings, "writes", asyncio.gather(*writes))
         
-        # Process messages batch if present
-        if batch_data.messages:
-            messages_request = BatchMessagesRequest(messages=batch_data.messages)
-            messages_result = await save_batch_messages(messages_request, user_id)
+        inserted_messages = []
+        inserted_chats = []
+        updated_chats = 0
+        if message_rows and not queued:
+            inserted_messages = written.pop(0)
             results["messages"] = {
-                "saved_count": messages_result.get("saved_count", 0),
-                "skipped_count": messages_result.get("skipped_count", 0),
-                "total_count": messages_result.get("total_count", 0)
+                "saved_count": len(inserted_messages),
+                "skipped_count": len(message_rows) - len(inserted_messages),
+                "total_count": len(batch_data.messages)
             }
-        
-        # Process chats batch if present
-        if batch_data.chats:
-            chats_request = BatchChatsRequest(chats=batch_data.chats)
-            chats_result = await save_batch_chats(chats_request, user_id)
+        if chat_rows:
+            inserted_chats, updated_chats = written.pop(0)
             results["chats"] = {
-                "inserted_count": chats_result.get("inserted_count", 0),
-                "updated_count": chats_result.get("updated_count", 0),
-                "total_count": chats_result.get("total_count", 0)
+                "inserted_count": len(inserted_chats),
+                "updated_count": updated_chats,
+                "total_count": len(batch_data.chats)
             }
         
-        return {
+        # Phase 2: the rollups of everything inserted, in one atomic update
+        await timed(timings, "rollups", apply_batch_rollups(supabase, user_id, inserted_messages, inserted_chats))
+        if inserted_messages or inserted_chats or updated_chats:
+            bump_user_data_version(user_id)
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        content = {
             "success": True,
             "message": f"Processed {len(batch_data.messages or [])} messages and {len(batch_data.chats or [])} chats",
-            "results": results
+            "results": results,
+            "timings_ms": timings
         }
+        if queued:
+            return JSONResponse(status_code=202, content=content)
+        return content
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Combined batch save error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Combined batch save error: {str(e)}")
+
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield the non-empty lines of an NDJSON request body as it arrives, gunzipping if needed."""
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    pending = b""
+
+    async for chunk in request.stream():
+        while chunk:
+            if decompressor:
+                # Inflate at most 1 MiB at a time so a small chunk cannot explode memory
+                data = decompressor.decompress(chunk, 1 << 20)
+                chunk = decompressor.unconsumed_tail
+            else:
+                data, chunk = chunk, b""
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > SAVE_STREAM_MAX_LINE_BYTES:
+                raise ValueError(f"Line longer than {SAVE_STREAM_MAX_LINE_BYTES} bytes")
+            for line in lines:
+                if line.strip():
+                    yield line
+
+    if decompressor:
+        pending += decompressor.flush()
+    for line in pending.split(b"\n"):
+        if line.strip():
+            yield line
+
+@router.post("/stream")
+async def save_stream(request: Request, user_id: str = Depends(supabase_helpers.get_user_from_session_token), supabase: AsyncClient = Depends(get_supabase)):
+    """
+    Bulk import chats and messages from newline-delimited JSON (optionally
+    with Content-Encoding: gzip). Each line is a chat or a message object
+    with an extra ``"type": "chat"`` or ``"type": "message"`` field.
+
+    The body is parsed as it arrives and written in chunks of
+    SAVE_BATCH_CHUNK_SIZE rows, so memory stays constant whatever the size
+    of the import. The response streams one NDJSON progress line per
+    written chunk, then a final line with ``"done": true``.
+    """
+    async def import_progress():
+        totals = {
+            "lines": 0,
+            "invalid_lines": 0,
+            "chats_inserted": 0,
+            "chats_updated": 0,
+            "messages_saved": 0,
+            "messages_skipped": 0
+        }
+        chat_rows: Dict[str, Dict[str, Any]] = {}
+        message_rows: List[Dict[str, Any]] = []
+
+        async def write_chats():
+            inserted, updated = await upsert_chat_rows(supabase, user_id, list(chat_rows.values()))
+            totals["chats_inserted"] += len(inserted)
+            totals["chats_updated"] += updated
+            chat_rows.clear()
+
+        async def write_messages():
+            inserted = await insert_message_rows(supabase, message_rows)
+            totals["messages_saved"] += len(inserted)
+            totals["messages_skipped"] += len(message_rows) - len(inserted)
+            message_rows.clear()
+
+        try:
+            async for line in iter_ndjson_lines(request):
+                totals["lines"] += 1
+                try:
+                    item = json.loads(line)
+                    if not isinstance(item, dict):
+                        raise ValueError("Line is not a JSON object")
+                    if item.get("type") == "chat":
+                        chat = ChatData(**item)
+                        chat_rows[chat.chat_provider_id] = {
+                            "user_id": user_id,
+                            "chat_provider_id": chat.chat_provider_id,
+                            "title": chat.title,
+                            "provider_name": chat.provider_name
+                        }
+                    elif item.get("type") == "message":
+                        message_rows.append(build_message_row(user_id, MessageData(**item)))
+                    else:
+                        raise ValueError("Unknown line type")
+                except ValueError:
+                    totals["invalid_lines"] += 1
+                    continue
+
+                if len(chat_rows) >= SAVE_BATCH_CHUNK_SIZE:
+                    await write_chats()
+                    yield json.dumps(totals) + "\n"
+                if len(message_rows) >= SAVE_BATCH_CHUNK_SIZE:
+                    await write_messages()
+                    yield json.dumps(totals) + "\n"
+
+            if chat_rows:
+                await write_chats()
+            if message_rows:
+                await write_messages()
+            yield json.dumps({**totals, "done": True}) + "\n"
+        except Exception as e:
+            yield json.dumps({**totals, "done": False, "error": f"Stream import error: {str(e)}"}) + "\n"
+
+    return StreamingResponse(import_progress(), media_type="application/x-ndjson")
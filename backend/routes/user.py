@@ -1,21 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import AsyncClient
 from utils import supabase_helpers
+from utils.supabase_client import get_supabase
+from utils.user_context_cache import invalidate_user_context
+from utils.user_context import UserContext, get_user_context
+from utils.access_control import get_access_conditions
 from utils.prompts import (
     get_all_folder_ids_by_type,
     process_folder_for_response,
-    process_template_for_response
+    process_template_for_response,
+    check_not_modified
 )
 import dotenv
-import os
 from typing import List
 
 dotenv.load_dotenv()
 
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 router = APIRouter(prefix="/user", tags=["User"])
 
 class UserMetadata(BaseModel):
@@ -27,10 +28,13 @@ class UserMetadata(BaseModel):
     pinned_folder_ids: list[int] | None = None
 
 @router.get("/metadata")
-async def get_user_metadata(user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def get_user_metadata(
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
+):
     """Get metadata for a specific user."""
     try:
-        response = supabase.table("users_metadata") \
+        response = await supabase.table("users_metadata") \
             .select("name, additional_email, phone_number, additional_organization, company_id, pinned_folder_ids, pinned_template_ids, organization_ids") \
             .eq("user_id", user_id) \
             .single() \
@@ -58,11 +62,15 @@ async def get_user_metadata(user_id: str = Depends(supabase_helpers.get_user_fro
         raise HTTPException(status_code=500, detail=f"Error fetching user metadata: {str(e)}")
 
 @router.put("/metadata")
-async def update_user_metadata(metadata: UserMetadata, user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def update_user_metadata(
+    metadata: UserMetadata,
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
+):
     """Update user metadata with organization folder auto-pinning."""
     try:
         # Check if user metadata exists
-        existing_metadata = supabase.table("users_metadata") \
+        existing_metadata = await supabase.table("users_metadata") \
             .select("user_id") \
             .eq("user_id", user_id) \
             .single() \
@@ -106,16 +114,17 @@ async def update_user_metadata(metadata: UserMetadata, user_id: str = Depends(su
         if update_data:
             if existing_metadata.data:
                 # Update existing record
-                response = supabase.table("users_metadata") \
+                response = await supabase.table("users_metadata") \
                     .update(update_data) \
                     .eq("user_id", user_id) \
                     .execute()
             else:
                 # Create new record
                 update_data["user_id"] = user_id
-                response = supabase.table("users_metadata") \
+                response = await supabase.table("users_metadata") \
                     .insert(update_data) \
                     .execute()
+            await invalidate_user_context(user_id)
             
             return {
                 "success": True,
@@ -132,52 +141,72 @@ async def update_user_metadata(metadata: UserMetadata, user_id: str = Depends(su
 
 @router.get("/folders-with-prompts")
 async def get_folders_with_prompts(
+    request: Request,
+    response: Response,
     locale: str = "en",
-    user_id: str = Depends(supabase_helpers.get_user_from_session_token)
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase),
+    user: UserContext = Depends(get_user_context)
 ):
     """Get all folders with their prompts, including pinned status."""
     try:
-        # Get user metadata for pinned folders
-        metadata = supabase.table("users_metadata") \
-            .select("pinned_folder_ids, company_id") \
-            .eq("user_id", user_id) \
-            .single() \
-            .execute()
-            
+        not_modified = await check_not_modified(request, response, user)
+        if not_modified:
+            return not_modified
+
         # Get the unified pinned folder IDs list
-        pinned_folder_ids = metadata.data.get('pinned_folder_ids', []) if metadata.data else []
-        user_company_id = metadata.data.get('company_id') if metadata.data else None
-        
-        print(f"Debug: Found pinned folder IDs for user {user_id}: {pinned_folder_ids}")
+        pinned_folder_ids = user.pinned_folder_ids
+        user_company_id = user.company_id
 
-        # Get all prompts
-        prompts = supabase.table("prompt_templates") \
+        # Get folders from unified table in one query: all official folders,
+        # the company's organization/company folders and the user's own folders
+        folder_conditions = ["type.eq.official", f"and(type.eq.user,user_id.eq.{user_id})"]
+        if user_company_id:
+            folder_conditions.append(f"and(type.in.(organization,company),company_id.eq.{user_company_id})")
+        folders_response = await supabase.table("prompt_folders") \
             .select("*") \
+            .or_(",".join(folder_conditions)) \
             .execute()
 
-        # Get folders from unified table
-        # Official folders (type = 'official')
-        official_folders_response = supabase.table("prompt_folders") \
-            .select("*") \
-            .eq("type", "official") \
-            .execute()
-        
-        # Organization/Company folders (type = 'organization' or 'company')
-        company_folders_response = None
-        if user_company_id:
-            company_folders_response = supabase.table("prompt_folders") \
-                .select("*") \
-                .eq("company_id", user_company_id) \
-                .in_("type", ["organization", "company"]) \
-                .execute()
-        
-        # User folders (type = 'user')
-        user_folders_response = supabase.table("prompt_folders") \
+        # Template types listed in each folder category
+        category_template_types = {
+            "official": ("official",),
+            "organization": ("organization", "company"),
+            "user": ("user",),
+        }
+        folder_categories = {}
+        for folder in folders_response.data or []:
+            if folder.get("type") == "official":
+                folder_categories[folder["id"]] = "official"
+            elif folder.get("type") == "user":
+                folder_categories[folder["id"]] = "user"
+            else:
+                folder_categories[folder["id"]] = "organization"
+
+        # Get the accessible prompts of those folders plus the user's root prompts
+        access_filter = "or(" + ",".join(get_access_conditions(user, include_global=True)) + ")"
+        template_conditions = [f"and(folder_id.is.null,type.eq.user,user_id.eq.{user_id})"]
+        if folder_categories:
+            folder_ids = ",".join(str(folder_id) for folder_id in folder_categories)
+            template_conditions.append(f"and(folder_id.in.({folder_ids}),{access_filter})")
+        prompts = await supabase.table("prompt_templates") \
             .select("*") \
-            .eq("user_id", user_id) \
-            .eq("type", "user") \
+            .or_(",".join(template_conditions)) \
             .execute()
 
+        # Group prompts by folder in one pass
+        prompts_by_folder = {}
+        root_prompts = []
+        for p in prompts.data or []:
+            folder_id = p.get("folder_id")
+            if folder_id is None:
+                if p.get("type") == "user" and p.get("user_id") == user_id:
+                    root_prompts.append(process_template_for_response(p, locale))
+                continue
+            category = folder_categories.get(folder_id)
+            if category and p.get("type") in category_template_types[category]:
+                prompts_by_folder.setdefault(folder_id, []).append(process_template_for_response(p, locale))
+
         # Organize prompts by folder and type
         organized_folders = {
             "official": [],
@@ -185,67 +214,14 @@ async def get_folders_with_prompts(
             "user": []
         }
 
-        # Process official folders
-        for folder in official_folders_response.data or []:
+        for folder in folders_response.data or []:
+            category = folder_categories[folder["id"]]
             processed_folder = process_folder_for_response(folder, locale)
-            
-            # Process prompts for this folder
-            folder_prompts = []
-            for p in prompts.data or []:
-                if p.get("folder_id") == folder["id"] and p.get("type") == "official":
-                    processed_prompt = process_template_for_response(p, locale)
-                    folder_prompts.append(processed_prompt)
-                    
-            processed_folder["prompts"] = folder_prompts
-            # Check if this folder is pinned using the unified list
-            processed_folder["is_pinned"] = folder["id"] in pinned_folder_ids
-            organized_folders["official"].append(processed_folder)
-
-        # Process organization/company folders
-        if company_folders_response:
-            for folder in company_folders_response.data or []:
-                processed_folder = process_folder_for_response(folder, locale)
-                
-                # Process prompts for this folder
-                folder_prompts = []
-                for p in prompts.data or []:
-                    # Check for both 'organization' and 'company' type templates
-                    if (p.get("folder_id") == folder["id"] and 
-                        p.get("type") in ["organization", "company"]):
-                        processed_prompt = process_template_for_response(p, locale)
-                        folder_prompts.append(processed_prompt)
-                        
-                processed_folder["prompts"] = folder_prompts
-                # Check if this folder is pinned using the unified list
-                processed_folder["is_pinned"] = folder["id"] in pinned_folder_ids
-                organized_folders["organization"].append(processed_folder)
+            processed_folder["prompts"] = prompts_by_folder.get(folder["id"], [])
+            # Pinning only applies to official/org folders, using the unified list
+            processed_folder["is_pinned"] = category != "user" and folder["id"] in pinned_folder_ids
+            organized_folders[category].append(processed_folder)
 
-        # Process user folders + root templates
-        # First, handle folders with IDs
-        for folder in user_folders_response.data or []:
-            processed_folder = process_folder_for_response(folder, locale)
-            
-            # Get prompts for this folder
-            folder_prompts = []
-            for p in prompts.data or []:
-                if p.get("folder_id") == folder["id"] and p.get("type") == "user":
-                    processed_prompt = process_template_for_response(p, locale)
-                    folder_prompts.append(processed_prompt)
-            
-            processed_folder["prompts"] = folder_prompts
-            # User folders are never pinned (pinning only applies to official/org folders)
-            processed_folder["is_pinned"] = False
-            organized_folders["user"].append(processed_folder)
-
-        # Handle root templates (user templates with no folder_id)
-        root_prompts = []
-        for p in prompts.data or []:
-            if (p.get("folder_id") is None and 
-                p.get("type") == "user" and 
-                p.get("user_id") == user_id):
-                processed_prompt = process_template_for_response(p, locale)
-                root_prompts.append(processed_prompt)
-        
         # If there are root prompts, create a virtual root folder
         if root_prompts:
             virtual_root_folder = {
@@ -278,10 +254,13 @@ async def get_folders_with_prompts(
         raise HTTPException(status_code=500, detail=f"Error fetching folders with prompts: {str(e)}")
     
 @router.get("/onboarding/status")
-async def get_onboarding_status(user_id: str = Depends(supabase_helpers.get_user_from_session_token)):
+async def get_onboarding_status(
+    user_id: str = Depends(supabase_helpers.get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
+):
     try:
         # Get user metadata for pinned folders
-        metadata = supabase.table("users_metadata") \
+        metadata = await supabase.table("users_metadata") \
             .select("job_type, job_industry, job_seniority, interests, signup_source") \
             .eq("user_id", user_id) \
             .single() \
@@ -0,0 +1,63 @@
+"""
+Signing a user in must not change the credentials of the shared client: the
+/auth routes use a per-request auth client, so data queries keep running with
+the service role after any login or token refresh.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from supabase import AsyncClient
+
+from utils import supabase_client
+
+SERVICE_KEY = "service-role-key"
+USER_TOKEN = "user-access-token"
+
+
+def _auth_server(request):
+    return httpx.Response(200, json={
+        "access_token": USER_TOKEN,
+        "refresh_token": "user-refresh-token",
+        "expires_in": 3600,
+        "expires_at": int(time.time()) + 3600,
+        "token_type": "bearer",
+        "user": {
+            "id": "11111111-1111-1111-1111-111111111111",
+            "aud": "authenticated",
+            "created_at": "2024-01-01T00:00:00Z",
+            "app_metadata": {},
+            "user_metadata": {},
+        },
+    })
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.test")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", SERVICE_KEY)
+    shared = AsyncClient("http://supabase.test", SERVICE_KEY)
+    monkeypatch.setattr(supabase_client, "_client", shared)
+    monkeypatch.setattr(supabase_client, "_auth_http_client",
+                        httpx.AsyncClient(transport=httpx.MockTransport(_auth_server)))
+    return shared
+
+
+def test_sign_in_keeps_the_shared_client_on_the_service_role(clients):
+    shared = clients
+    postgrest = shared.postgrest
+
+    async def sign_in_twice():
+        for _ in range(2):
+            auth = supabase_client.get_supabase_auth()
+            response = await auth.sign_in_with_password({"email": "a@b.c", "password": "secret"})
+            assert response.session.access_token == USER_TOKEN
+            assert await auth.get_session() is not None
+        # Each request starts without a session
+        assert await supabase_client.get_supabase_auth().get_session() is None
+
+    asyncio.run(sign_in_twice())
+
+    assert shared.options.headers["Authorization"] == f"Bearer {SERVICE_KEY}"
+    assert shared.postgrest is postgrest
@@ -0,0 +1,120 @@
+"""
+/user/folders-with-prompts must load the whole library in a fixed number of
+queries (one for folders, one for templates), however many folders there are.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from routes.user import get_folders_with_prompts
+from utils.access_control import GLOBAL_ACCESS_CONDITION
+from utils.user_context import UserContext
+
+USER_ID = "user-1"
+COMPANY_ID = "company-1"
+FOLDER_TYPES = ["official", "company", "user"]
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def or_(self, condition):
+        self.filters.append(condition)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(f"{column}.eq.{value}")
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(f"{column}.in.{values}")
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    async def execute(self):
+        self.client.queries.append(self)
+        return SimpleNamespace(data=self.client.rows.get(self.table, []))
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def _library(folder_count):
+    folders, templates = [], []
+    for folder_id in range(1, folder_count + 1):
+        folder_type = FOLDER_TYPES[folder_id % len(FOLDER_TYPES)]
+        folders.append({
+            "id": folder_id,
+            "type": folder_type,
+            "title": {"en": f"Folder {folder_id}"},
+            "user_id": USER_ID if folder_type == "user" else None,
+            "company_id": COMPANY_ID if folder_type == "company" else None,
+        })
+        templates.append({
+            "id": folder_id,
+            "folder_id": folder_id,
+            "type": folder_type,
+            "title": {"en": f"Template {folder_id}"},
+            "content": {"en": "Hello"},
+            "user_id": USER_ID if folder_type == "user" else None,
+            "company_id": COMPANY_ID if folder_type == "company" else None,
+        })
+    templates.append({"id": 0, "folder_id": None, "type": "user", "user_id": USER_ID,
+                      "title": {"en": "Root"}, "content": {"en": "Hi"}})
+    return {"prompt_folders": folders, "prompt_templates": templates}
+
+
+def _request():
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/user/folders-with-prompts",
+        "headers": [],
+        "query_string": b"",
+    })
+
+
+@pytest.mark.parametrize("folder_count", [10, 1000])
+def test_query_count_is_constant(folder_count):
+    supabase = FakeSupabase(_library(folder_count))
+    user = UserContext(user_id=USER_ID, company_id=COMPANY_ID, pinned_folder_ids=[1])
+
+    result = asyncio.run(get_folders_with_prompts(
+        _request(), Response(), locale="en", user_id=USER_ID, supabase=supabase, user=user
+    ))
+
+    assert [query.table for query in supabase.queries] == ["prompt_folders", "prompt_templates"]
+    folders = result["data"]
+    assert sum(len(folders[category]) for category in folders) == folder_count + 1  # + virtual root
+    assert all(len(folder["prompts"]) == 1 for category in folders for folder in folders[category])
+
+
+def test_template_query_is_access_scoped():
+    supabase = FakeSupabase(_library(3))
+    user = UserContext(user_id=USER_ID, company_id=COMPANY_ID, organization_ids=["org-1"])
+
+    asyncio.run(get_folders_with_prompts(
+        _request(), Response(), locale="en", user_id=USER_ID, supabase=supabase, user=user
+    ))
+
+    template_filter = supabase.queries[1].filters[0]
+    for condition in (f"user_id.eq.{USER_ID}", f"company_id.eq.{COMPANY_ID}",
+                      "organization_id.eq.org-1", GLOBAL_ACCESS_CONDITION):
+        assert condition in template_filter
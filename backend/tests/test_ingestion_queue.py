@@ -0,0 +1,65 @@
+"""
+The write-behind queue must only accept rows once they are in the durable log:
+a failed append queues nothing, so the client's retry cannot insert them twice.
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from routes import save
+from utils.ingestion import IngestionQueue
+
+ROWS = [{"user_id": "user-1", "message_provider_id": "m1", "content": "hello"}]
+
+
+def test_rows_are_logged_then_queued(tmp_path):
+    log_path = tmp_path / "ingestion.log"
+    queue = IngestionQueue(log_path=str(log_path))
+
+    assert asyncio.run(queue.enqueue(ROWS))
+
+    assert list(queue._rows) == ROWS
+    replayed = IngestionQueue(log_path=str(log_path))
+    replayed._replay_log()
+    assert list(replayed._rows) == ROWS
+
+
+def test_failed_append_queues_nothing(tmp_path):
+    # A directory cannot be opened for appending
+    queue = IngestionQueue(log_path=str(tmp_path))
+
+    with pytest.raises(OSError):
+        asyncio.run(queue.enqueue(ROWS))
+
+    assert not queue._rows
+    assert queue.get_info()["enqueued_rows"] == 0
+    assert queue.get_info()["failed_log_appends"] == 1
+
+
+def test_failed_fsync_leaves_no_partial_line(tmp_path, monkeypatch):
+    log_path = tmp_path / "ingestion.log"
+    queue = IngestionQueue(log_path=str(log_path))
+    asyncio.run(queue.enqueue(ROWS))
+    logged = log_path.read_bytes()
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        asyncio.run(queue.enqueue([{**ROWS[0], "message_provider_id": "m2"}]))
+
+    assert log_path.read_bytes() == logged
+    assert list(queue._rows) == ROWS
+
+
+def test_save_answers_503_when_the_log_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(save, "ingestion_queue", IngestionQueue(log_path=str(tmp_path)))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(save.queue_message_rows(ROWS))
+
+    assert error.value.status_code == 503
+    assert not save.ingestion_queue._rows
@@ -0,0 +1,156 @@
+"""
+The one-time rollup backfill and concurrent saves must count every message
+exactly once, whichever of them reaches the database first.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from utils.stats.rollups import get_user_rollups, merge_rollups, update_message_rollups
+
+USER_ID = "user-1"
+DAY = "2024-01-01"
+
+
+def _message(message_id):
+    return {
+        "id": message_id,
+        "user_id": USER_ID,
+        "role": "user",
+        "content": "hello",
+        "estimated_tokens": 1,
+        "created_at": f"{DAY}T10:00:{message_id:02d}+00:00",
+        "message_provider_id": f"m{message_id}",
+        "model": "gpt-4",
+    }
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.order_desc = False
+        self.row_limit = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_column = column
+        self.order_desc = desc
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    async def execute(self):
+        rows = [dict(row) for row in self.db.tables[self.table] if all(f(row) for f in self.filters)]
+        if hasattr(self, "order_column"):
+            rows.sort(key=lambda row: row[self.order_column], reverse=self.order_desc)
+        return SimpleNamespace(data=rows[:self.row_limit] if self.row_limit else rows)
+
+
+class FakeRpc:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        if self.name == "apply_stats_deltas":
+            self.db.apply_deltas(self.params["p_rows"])
+            return SimpleNamespace(data=[])
+        assert self.name == "backfill_stats_rollups"
+        if self.db.before_backfill_commit:
+            hook, self.db.before_backfill_commit = self.db.before_backfill_commit, None
+            await hook()
+        backfills = self.db.tables["user_stats_backfills"]
+        if any(row["user_id"] == self.params["p_user_id"] for row in backfills):
+            return SimpleNamespace(data=False)
+        backfills.append({
+            "user_id": self.params["p_user_id"],
+            "message_id_cutoff": self.params["p_message_id_cutoff"],
+            "chat_id_cutoff": self.params["p_chat_id_cutoff"],
+        })
+        self.db.apply_deltas(self.params["p_rows"])
+        return SimpleNamespace(data=True)
+
+
+class FakeSupabase:
+    def __init__(self, messages):
+        self.tables = {"messages": list(messages), "chats": [], "user_stats_daily": [], "user_stats_backfills": []}
+        self.before_backfill_commit = None
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeRpc(self, name, params)
+
+    def apply_deltas(self, rows):
+        stored = self.tables["user_stats_daily"]
+        for row in rows:
+            existing = next((r for r in stored if r["user_id"] == row["user_id"] and r["day"] == row["day"]), None)
+            if existing is None:
+                stored.append(merge_rollups({}, row))
+            else:
+                stored[stored.index(existing)] = merge_rollups(existing, row)
+
+    async def save(self, message):
+        self.tables["messages"].append(message)
+        await update_message_rollups(self, USER_ID, [message])
+
+
+def _message_count(db):
+    return sum(row["message_count"] for row in db.tables["user_stats_daily"])
+
+
+def test_save_committing_during_the_backfill_is_counted_once():
+    db = FakeSupabase([_message(1), _message(2), _message(3)])
+    # A first save runs its own backfill while the stats read's backfill is in flight
+    db.before_backfill_commit = lambda: db.save(_message(4))
+
+    rollups = asyncio.run(get_user_rollups(db, USER_ID))
+
+    assert db.tables["user_stats_backfills"][0]["message_id_cutoff"] == 4
+    assert [row["message_count"] for row in rollups] == [4]
+
+
+def test_save_inserted_before_the_backfill_is_not_added_twice():
+    db = FakeSupabase([_message(1), _message(2)])
+    message = _message(3)
+    db.tables["messages"].append(message)
+
+    asyncio.run(get_user_rollups(db, USER_ID))
+    # The insert's rollup update arrives after the backfill already counted it
+    asyncio.run(update_message_rollups(db, USER_ID, [message]))
+
+    assert _message_count(db) == 3
+
+
+def test_saves_after_the_backfill_are_added():
+    db = FakeSupabase([_message(1)])
+
+    asyncio.run(get_user_rollups(db, USER_ID))
+    asyncio.run(db.save(_message(2)))
+    asyncio.run(db.save(_message(3)))
+
+    assert _message_count(db) == 3
+    assert len(db.tables["user_stats_backfills"]) == 1
@@ -0,0 +1,99 @@
+"""
+Regression benchmark: the stats aggregations must stay linear in the size of
+the history (the recent/all-time accounting used to be quadratic).
+
+Each test times the same work on a history and on one 4x larger; a linear
+path takes ~4x longer, a quadratic one ~16x. The bound leaves room for
+timing noise while still catching the quadratic case.
+"""
+import time
+from datetime import date, datetime, timedelta
+
+from utils.stats.analyze_response_quality import analyze_response_quality
+from utils.stats.calculate_efficiency_score import calculate_efficiency_score
+from utils.stats.compute_usage_patterns import compute_usage_patterns
+from utils.stats.message_fields import compute_message_fields
+from utils.stats.message_frame import MessageFrame
+from utils.stats.rollups import summarize_rollups
+
+GROWTH = 4
+MAX_RATIO = 8
+FIRST_DAY = date(2000, 1, 1)
+
+
+def _best_time(fn, arg, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _assert_linear(fn, make_input, size):
+    small = _best_time(fn, make_input(size))
+    large = _best_time(fn, make_input(size * GROWTH))
+    assert large / small < MAX_RATIO, f"{fn.__name__}: {large / small:.1f}x slower on {GROWTH}x the history"
+
+
+def _rollups(days):
+    rows = []
+    for i in range(days):
+        day = (FIRST_DAY + timedelta(days=i)).isoformat()
+        rows.append({
+            "user_id": "user",
+            "day": day,
+            "message_count": 10,
+            "user_message_count": 5,
+            "assistant_message_count": 5,
+            "input_tokens": 100,
+            "output_tokens": 300,
+            "chat_count": 2,
+            "thinking_time_total": 12.5,
+            "thinking_time_count": 5,
+            "model_usage": {
+                "gpt-4": {"count": 6, "input_tokens": 60, "output_tokens": 180},
+                f"model-{i % 5}": {"count": 4, "input_tokens": 40, "output_tokens": 120},
+            },
+            "hourly_messages": {f"{i % 24:02d}": 10},
+            "hourly_chats": {f"{i % 24:02d}": 2},
+        })
+    return rows
+
+
+def _messages(count):
+    rows = []
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = "How do I sort a list?" if role == "user" else "Use sorted(). See https://docs.python.org [1]. Anything else?"
+        row = {
+            "chat_provider_id": f"chat-{i // 20}",
+            "role": role,
+            "created_at": (start + timedelta(minutes=7 * i)).isoformat() + "+00:00",
+            "model": "gpt-4",
+        }
+        fields = compute_message_fields(content, "gpt-4", role)
+        row["content_length"] = fields["content_length"]
+        row["response_features"] = fields["response_features"]
+        rows.append(row)
+    return rows
+
+
+def _summarize(rollups):
+    return summarize_rollups(rollups, current_date=datetime.combine(FIRST_DAY, datetime.min.time()) + timedelta(days=len(rollups)))
+
+
+def _analyze(messages):
+    frame = MessageFrame(messages)
+    usage_patterns = compute_usage_patterns(frame)
+    response_quality = analyze_response_quality(frame)
+    return calculate_efficiency_score(frame, [], response_quality, usage_patterns)
+
+
+def test_summarize_rollups_is_linear():
+    _assert_linear(_summarize, _rollups, 2000)
+
+
+def test_message_frame_analytics_are_linear():
+    _assert_linear(_analyze, _messages, 5000)
@@ -1,189 +1,122 @@
-from supabase import Client
+from supabase import AsyncClient
 from typing import Optional, List, Dict, Any
+from utils.user_context import UserContext
 
+# Rows without any owner (official folders/templates, global blocks)
+GLOBAL_ACCESS_CONDITION = "and(user_id.is.null,company_id.is.null,organization_id.is.null)"
 
-def get_user_metadata(supabase: Client, user_id: str) -> dict:
-    """Fetch organization_ids and company_id for a user."""
-    response = (
-        supabase.table("users_metadata")
-        .select("organization_ids, company_id")
-        .eq("user_id", user_id)
-        .single()
-        .execute()
-    )
-    return response.data or {}
 
-
-def get_access_conditions(supabase: Client, user_id: str) -> list[str]:
+def get_access_conditions(user: UserContext, include_global: bool = False) -> list[str]:
     """Build OR conditions to filter records accessible by the user."""
-    metadata = get_user_metadata(supabase, user_id)
-    conditions = [f"user_id.eq.{user_id}"]
-    company_id = metadata.get("company_id")
-    if company_id:
-        conditions.append(f"company_id.eq.{company_id}")
+    conditions = [f"user_id.eq.{user.user_id}"]
+    if user.company_id:
+        conditions.append(f"company_id.eq.{user.company_id}")
 
-    for org_id in metadata.get("organization_ids", []) or []:
+    for org_id in user.organization_ids:
         conditions.append(f"organization_id.eq.{org_id}")
 
+    if include_global:
+        conditions.append(GLOBAL_ACCESS_CONDITION)
+
     return conditions
 
 
-def apply_access_conditions(query, supabase: Client, user_id: str):
-    """Apply user access filters to a Supabase query."""
-    conditions = get_access_conditions(supabase, user_id)
+def apply_access_conditions(query, user: UserContext, include_global: bool = False):
+    """
+    Apply user access filters to a Supabase query.
+
+    With include_global the query matches exactly what filter_accessible_items
+    would keep, so list endpoints need no post-filtering.
+    """
+    conditions = get_access_conditions(user, include_global)
     if conditions:
         query = query.or_(",".join(conditions))
     return query
 
 
-def user_has_access_to_folder(supabase: Client, user_id: str, folder_id: int) -> Optional[bool]:
-    """Return True if user has access to the folder, False if not, None if folder doesn't exist."""
-    resp = (
-        supabase.table("prompt_folders")
-        .select("user_id, company_id, organization_id")
-        .eq("id", folder_id)
-        .single()
-        .execute()
-    )
-
-    folder = resp.data
-    if not folder:
-        return None
-
-    metadata = get_user_metadata(supabase, user_id)
-
-    if folder.get("user_id"):
-        return folder.get("user_id") == user_id
+def _owner_has_access(record: Dict[str, Any], user: UserContext) -> Optional[bool]:
+    """Access decided by the record's owner columns, or None if it has no owner."""
+    if record.get("user_id"):
+        return record.get("user_id") == user.user_id
 
-    if folder.get("company_id"):
-        return folder.get("company_id") == metadata.get("company_id")
+    if record.get("company_id"):
+        return record.get("company_id") == user.company_id
 
-    if folder.get("organization_id"):
-        return folder.get("organization_id") in (metadata.get("organization_ids") or [])
+    if record.get("organization_id"):
+        return record.get("organization_id") in user.organization_ids
 
-    return True
+    return None
 
 
-def user_has_access_to_template(supabase: Client, user_id: str, template_id: int) -> Optional[bool]:
-    """Return True if user has access to the template, False if not, None if template doesn't exist."""
+async def fetch_owner_columns(supabase: AsyncClient, table: str, record_id: int) -> Optional[Dict[str, Any]]:
+    """Read the user_id/company_id/organization_id of one record (None if it doesn't exist)."""
     resp = (
-        supabase.table("prompt_templates")
+        await supabase.table(table)
         .select("user_id, company_id, organization_id")
-        .eq("id", template_id)
+        .eq("id", record_id)
         .single()
         .execute()
     )
+    return resp.data
+
 
-    template = resp.data
-    if not template:
+def record_access(record: Optional[Dict[str, Any]], user: UserContext) -> Optional[bool]:
+    """Access to a record read by fetch_owner_columns: True/False, or None if it doesn't exist."""
+    if not record:
         return None
 
-    metadata = get_user_metadata(supabase, user_id)
+    access = _owner_has_access(record, user)
+    return True if access is None else access
 
-    if template.get("user_id"):
-        return template.get("user_id") == user_id
 
-    if template.get("company_id"):
-        return template.get("company_id") == metadata.get("company_id")
+async def user_has_access_to_folder(supabase: AsyncClient, user: UserContext, folder_id: int) -> Optional[bool]:
+    """Return True if user has access to the folder, False if not, None if folder doesn't exist."""
+    return record_access(await fetch_owner_columns(supabase, "prompt_folders", folder_id), user)
+
+
+async def user_has_access_to_template(supabase: AsyncClient, user: UserContext, template_id: int) -> Optional[bool]:
+    """Return True if user has access to the template, False if not, None if template doesn't exist."""
+    return record_access(await fetch_owner_columns(supabase, "prompt_templates", template_id), user)
+
+
+async def user_has_access_to_block(supabase: AsyncClient, user: UserContext, block_id: int) -> Optional[bool]:
+    """Return True if user has access to the block, False if not, None if block doesn't exist."""
+    block = await fetch_owner_columns(supabase, "prompt_blocks", block_id)
+    if not block:
+        return None
 
-    if template.get("organization_id"):
-        return template.get("organization_id") in (metadata.get("organization_ids") or [])
+    access = _owner_has_access(block, user)
+    # Global blocks (no ownership) are accessible to everyone
+    return True if access is None else access
 
-    return True
 
-def filter_accessible_items(supabase: Client, user_id: str, items: List[Dict[str, Any]], 
-                          item_type: str = "template") -> List[Dict[str, Any]]:
+def filter_accessible_items(user: UserContext, items: List[Dict[str, Any]],
+                            item_type: str = "template") -> List[Dict[str, Any]]:
     """Filter a list of items to only include those the user has access to."""
     if not items:
         return []
-    
+
     accessible_items = []
-    metadata = get_user_metadata(supabase, user_id)
-    
     for item in items:
         has_access = False
-        
+
         # Check user ownership
-        if item.get("user_id") == user_id:
+        if item.get("user_id") == user.user_id:
             has_access = True
-        
+
         # Check company access
-        elif item.get("company_id") and item.get("company_id") == metadata.get("company_id"):
+        elif item.get("company_id") and item.get("company_id") == user.company_id:
             has_access = True
-        
+
         # Check organization access
-        elif item.get("organization_id") and item.get("organization_id") in (metadata.get("organization_ids") or []):
+        elif item.get("organization_id") and item.get("organization_id") in user.organization_ids:
             has_access = True
-        
+
         # Global items (no ownership) - for blocks
         elif not item.get("user_id") and not item.get("company_id") and not item.get("organization_id"):
             has_access = True
-        
+
         if has_access:
             accessible_items.append(item)
-    
-    return accessible_items
-
 
-def user_has_access_to_template(supabase: Client, user_id: str, template_id: int) -> Optional[bool]:
-    """Return True if user has access to the template, False if not, None if template doesn't exist."""
-    resp = (
-        supabase.table("prompt_templates")
-        .select("user_id, company_id, organization_id")
-        .eq("id", template_id)
-        .single()
-        .execute()
-    )
-
-    template = resp.data
-    if not template:
-        return None
-
-    metadata = get_user_metadata(supabase, user_id)
-
-    if template.get("user_id"):
-        return template.get("user_id") == user_id
-
-    if template.get("company_id"):
-        return template.get("company_id") == metadata.get("company_id")
-
-    if template.get("organization_id"):
-        return template.get("organization_id") in (metadata.get("organization_ids") or [])
-
-    return True
-
-
-def user_has_access_to_block(supabase: Client, user_id: str, block_id: int) -> Optional[bool]:
-    """Return True if user has access to the block, False if not, None if block doesn't exist."""
-    resp = (
-        supabase.table("prompt_blocks")
-        .select("user_id, company_id, organization_id")
-        .eq("id", block_id)
-        .single()
-        .execute()
-    )
-
-    block = resp.data
-    if not block:
-        return None
-
-    metadata = get_user_metadata(supabase, user_id)
-
-    if block.get("user_id"):
-        return block.get("user_id") == user_id
-
-    if block.get("company_id"):
-        return block.get("company_id") == metadata.get("company_id")
-
-    if block.get("organization_id"):
-        return block.get("organization_id") in (metadata.get("organization_ids") or [])
-
-    # Global blocks (no ownership) are accessible to everyone
-    if not block.get("user_id") and not block.get("company_id") and not block.get("organization_id"):
-        return True
-
-    return False
-
-
-# ADD these imports at the top of the file if not already present:
-from typing import Optional, List, Dict, Any
+    return accessible_items
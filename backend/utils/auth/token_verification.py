@@ -0,0 +1,174 @@
+"""
+Local verification of Supabase access tokens.
+
+``supabase.auth.get_user(token)`` is an HTTP round-trip to the auth server on
+every authenticated request. Access tokens are JWTs signed by the project, so
+they can be checked locally instead:
+
+- asymmetric tokens (RS256/ES256) against the project's JWKS, fetched from
+  ``{SUPABASE_URL}/auth/v1/.well-known/jwks.json`` and cached for
+  JWKS_CACHE_TTL seconds (refetched early when a token names an unknown kid);
+  after a failed fetch no new attempt is made for JWKS_FAILURE_BACKOFF
+  seconds, during which asymmetric tokens go straight to the auth server;
+- legacy HS256 tokens against SUPABASE_JWT_SECRET.
+
+Verified claims are cached per token for at most AUTH_CLAIMS_CACHE_TTL
+seconds (and never past the token's expiry), so repeated requests with the
+same token cost a dict lookup.
+
+A locally valid token may still belong to a session that was revoked since it
+was issued. Revocation-sensitive routes should depend on
+``get_user_from_session_token_remote`` (utils/supabase_helpers.py), which
+always asks the auth server; setting AUTH_LOCAL_VERIFICATION=false does the
+same for every route.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import dotenv
+import httpx
+import jwt
+
+dotenv.load_dotenv()
+
+AUTH_LOCAL_VERIFICATION = os.getenv("AUTH_LOCAL_VERIFICATION", "true").lower() not in ("0", "false", "no")
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000"))
+AUTH_CLAIMS_CACHE_TTL = float(os.getenv("AUTH_CLAIMS_CACHE_TTL", "60"))
+JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "600"))
+# Unknown kids trigger a refetch at most this often
+JWKS_MIN_REFRESH_INTERVAL = 30.0
+JWKS_FAILURE_BACKOFF = float(os.getenv("JWKS_FAILURE_BACKOFF", "30"))
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWT_LEEWAY = 10
+
+_SUPABASE_URL = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+_JWKS_URL = f"{_SUPABASE_URL}/auth/v1/.well-known/jwks.json" if _SUPABASE_URL else None
+_ISSUER = f"{_SUPABASE_URL}/auth/v1" if _SUPABASE_URL else None
+
+_jwks: Dict[str, jwt.PyJWK] = {}
+_jwks_fetched_at: Optional[float] = None
+_jwks_failed_at: Optional[float] = None
+_jwks_lock: Optional[asyncio.Lock] = None
+
+_claims_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_claims_cache_lock = threading.Lock()
+
+
+class LocalVerificationUnavailable(Exception):
+    """The token cannot be checked locally (no matching key configured)."""
+
+
+def _get_jwks_lock() -> asyncio.Lock:
+    global _jwks_lock
+    if _jwks_lock is None:
+        _jwks_lock = asyncio.Lock()
+    return _jwks_lock
+
+
+def _jwks_backing_off() -> bool:
+    return _jwks_failed_at is not None and time.monotonic() - _jwks_failed_at < JWKS_FAILURE_BACKOFF
+
+
+async def _refresh_jwks(force: bool = False):
+    """Fetch the project's signing keys unless the cached set is still fresh."""
+    global _jwks, _jwks_fetched_at, _jwks_failed_at
+    # Checked before the lock too, so requests don't queue behind a dead endpoint
+    if not _JWKS_URL or _jwks_backing_off():
+        return
+    async with _get_jwks_lock():
+        if _jwks_backing_off():
+            return
+        if _jwks_fetched_at is not None:
+            age = time.monotonic() - _jwks_fetched_at
+            if age < JWKS_MIN_REFRESH_INTERVAL or (not force and age < JWKS_CACHE_TTL):
+                return
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.get(_JWKS_URL)
+                response.raise_for_status()
+        except Exception:
+            _jwks_failed_at = time.monotonic()
+            raise
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(jwk)
+            except jwt.PyJWTError:
+                continue
+            keys[jwk.get("kid")] = key
+        _jwks, _jwks_fetched_at, _jwks_failed_at = keys, time.monotonic(), None
+
+
+async def _signing_key(header: Dict[str, Any]) -> Tuple[Any, str]:
+    alg = header.get("alg")
+    if alg == "HS256":
+        if not _JWT_SECRET:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+        return _JWT_SECRET, alg
+
+    kid = header.get("kid")
+    await _refresh_jwks()
+    if kid not in _jwks:
+        await _refresh_jwks(force=True)
+    key = _jwks.get(kid)
+    if key is None:
+        raise LocalVerificationUnavailable(f"No signing key for kid {kid}")
+    return key.key, key.algorithm_name
+
+
+def _cached_claims(token: str) -> Optional[Dict[str, Any]]:
+    with _claims_cache_lock:
+        entry = _claims_cache.get(token)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _claims_cache[token]
+            return None
+        _claims_cache.move_to_end(token)
+        return entry[1]
+
+
+def _cache_claims(token: str, claims: Dict[str, Any]):
+    expires_at = min(time.time() + AUTH_CLAIMS_CACHE_TTL, float(claims.get("exp", 0)))
+    with _claims_cache_lock:
+        _claims_cache[token] = (expires_at, claims)
+        _claims_cache.move_to_end(token)
+        while len(_claims_cache) > AUTH_CLAIMS_CACHE_SIZE:
+            _claims_cache.popitem(last=False)
+
+
+async def verify_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a Supabase access token locally and return its claims.
+
+    Raises:
+        jwt.PyJWTError: The token is malformed, expired or badly signed
+        LocalVerificationUnavailable: No key to check it with; callers fall
+            back to the auth server
+    """
+    claims = _cached_claims(token)
+    if claims is not None:
+        return claims
+
+    key, alg = await _signing_key(jwt.get_unverified_header(token))
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=JWT_AUDIENCE,
+        issuer=_ISSUER,
+        leeway=JWT_LEEWAY,
+        options={"require": ["exp", "sub"]}
+    )
+    _cache_claims(token, claims)
+    return claims
+
+
+def evict_access_token(token: str):
+    """Forget the cached claims of a token (e.g. after sign-out)."""
+    with _claims_cache_lock:
+        _claims_cache.pop(token, None)
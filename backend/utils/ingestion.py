@@ -0,0 +1,299 @@
+"""
+Message ingestion for the /save endpoints.
+
+``insert_message_rows`` and ``upsert_chat_rows`` are the bulk write paths:
+rows are written in chunks of SAVE_BATCH_CHUNK_SIZE with ON CONFLICT on the
+provider ids, and only the rows actually inserted are folded into the stats
+rollups.
+
+With SAVE_INGESTION_MODE=queue the endpoints do not wait for that write:
+they validate the payload, append the rows to an in-process bounded queue
+and answer 202. A background flusher drains the queue into bulk inserts
+(rows of all users together) as soon as INGESTION_FLUSH_ROWS rows are
+waiting, or every INGESTION_FLUSH_INTERVAL seconds. When the queue already
+holds INGESTION_QUEUE_MAX_ROWS rows new rows are rejected and counted as
+dropped.
+
+If INGESTION_LOG_PATH is set, every accepted batch is first appended (and
+fsynced, off the event loop) to that file and only queued once it is on
+disk, so a batch whose append fails is neither queued nor acknowledged and
+the client's retry cannot write it twice. The file is replayed on startup
+and truncated whenever the queue has been fully flushed. Inserts are
+idempotent, so replaying rows that were already written is harmless.
+
+Rollups are applied separately from the inserts: rows that were inserted
+wait in a second queue until their rollups succeed, because a retried insert
+of the same rows would return nothing to aggregate.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from supabase import AsyncClient
+from utils.stats.rollups import apply_chat_rollups, apply_message_rollups, update_message_rollups
+from utils.stats.stats_cache import bump_user_data_version
+
+SAVE_BATCH_CHUNK_SIZE = int(os.getenv("SAVE_BATCH_CHUNK_SIZE", "500"))
+SAVE_INGESTION_MODE = os.getenv("SAVE_INGESTION_MODE", "sync").lower()
+INGESTION_QUEUE_MAX_ROWS = int(os.getenv("INGESTION_QUEUE_MAX_ROWS", "100000"))
+INGESTION_FLUSH_ROWS = int(os.getenv("INGESTION_FLUSH_ROWS", str(SAVE_BATCH_CHUNK_SIZE)))
+INGESTION_FLUSH_INTERVAL = float(os.getenv("INGESTION_FLUSH_INTERVAL", "1"))
+INGESTION_LOG_PATH = os.getenv("INGESTION_LOG_PATH")
+
+
+def chunked(rows: List[Dict[str, Any]], size: int = SAVE_BATCH_CHUNK_SIZE):
+    """Split rows into statements of at most ``size`` rows."""
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+async def insert_message_rows(supabase: AsyncClient, rows: List[Dict[str, Any]],
+                              rollups: bool = True) -> List[Dict[str, Any]]:
+    """
+    Insert message rows, skipping those already stored, and update the
+    rollups of every user concerned (unless ``rollups`` is False, for callers
+    that apply them together with other rows).
+
+    Returns:
+        The rows actually inserted
+    """
+    inserted = []
+    for chunk in chunked(rows):
+        response = await supabase.table("messages") \
+            .upsert(chunk, on_conflict="user_id,message_provider_id", ignore_duplicates=True) \
+            .execute()
+        inserted.extend(response.data or [])
+    if not rollups:
+        return inserted
+
+    rows_by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for row in inserted:
+        rows_by_user.setdefault(row["user_id"], []).append(row)
+    for user_id, user_rows in rows_by_user.items():
+        await apply_message_rollups(supabase, user_id, user_rows)
+        bump_user_data_version(user_id)
+    return inserted
+
+
+async def upsert_chat_rows(supabase: AsyncClient, user_id: str, rows: List[Dict[str, Any]],
+                           rollups: bool = True) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Insert new chats of a user and update the title/provider of existing ones.
+
+    Each chunk is inserted ignoring conflicts on (user_id, chat_provider_id):
+    only inserted rows come back, and the rest of the chunk are existing chats
+    updated by one upsert. ``rows`` must hold each chat_provider_id once.
+
+    Returns:
+        The inserted rows and the number of updated chats
+    """
+    inserted = []
+    updated = 0
+    for chunk in chunked(rows):
+        response = await supabase.table("chats") \
+            .upsert(chunk, on_conflict="user_id,chat_provider_id", ignore_duplicates=True) \
+            .execute()
+        chunk_inserted = response.data or []
+        inserted.extend(chunk_inserted)
+
+        inserted_ids = {chat["chat_provider_id"] for chat in chunk_inserted}
+        existing = [row for row in chunk if row["chat_provider_id"] not in inserted_ids]
+        if existing:
+            await supabase.table("chats") \
+                .upsert(existing, on_conflict="user_id,chat_provider_id") \
+                .execute()
+            updated += len(existing)
+
+    if not rollups:
+        return inserted, updated
+
+    if inserted:
+        await apply_chat_rollups(supabase, user_id, inserted)
+    if inserted or updated:
+        bump_user_data_version(user_id)
+    return inserted, updated
+
+
+class IngestionQueue:
+    """Bounded write-behind queue of message rows."""
+
+    def __init__(self, max_rows: int = INGESTION_QUEUE_MAX_ROWS, flush_rows: int = INGESTION_FLUSH_ROWS,
+                 flush_interval: float = INGESTION_FLUSH_INTERVAL, log_path: Optional[str] = INGESTION_LOG_PATH):
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.log_path = log_path
+        self._rows: deque = deque()
+        # Inserted rows whose rollups have not been applied yet
+        self._rollup_rows: deque = deque()
+        # Created in start(), inside the running loop
+        self._wakeup: Optional[asyncio.Event] = None
+        self._log_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued_rows = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.failed_flushes = 0
+        self.failed_rollups = 0
+        self.failed_log_appends = 0
+        self.last_flush_ms: Optional[float] = None
+        self.total_flush_ms = 0.0
+        self.flush_count = 0
+
+    def _get_log_lock(self) -> asyncio.Lock:
+        if self._log_lock is None:
+            self._log_lock = asyncio.Lock()
+        return self._log_lock
+
+    def _append_log(self, line: str):
+        # Unbuffered, so a failed append can be cut off without a partial line left for the replay
+        with open(self.log_path, "ab", buffering=0) as log:
+            size = log.tell()
+            try:
+                log.write(line.encode())
+                os.fsync(log.fileno())
+            except BaseException:
+                log.truncate(size)
+                raise
+
+    def _truncate_log(self):
+        if os.path.exists(self.log_path):
+            open(self.log_path, "w").close()
+
+    async def enqueue(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Queue rows for the next flush; returns False (dropping them) if the
+        queue is full. With a log, the rows are queued once they are on disk.
+
+        Raises:
+            OSError: If the rows could not be appended to the log (nothing is queued)
+        """
+        # Held from the append to the push: the log is only truncated under
+        # this lock while the queue is empty, so a logged batch cannot be
+        # truncated before it is queued
+        async with self._get_log_lock():
+            if len(self._rows) + len(rows) > self.max_rows:
+                self.dropped_rows += len(rows)
+                return False
+            if self.log_path:
+                try:
+                    await asyncio.to_thread(self._append_log, json.dumps(rows) + "\n")
+                except OSError:
+                    self.failed_log_appends += 1
+                    raise
+            self._rows.extend(rows)
+            self.enqueued_rows += len(rows)
+        if self._wakeup is not None and len(self._rows) >= self.flush_rows:
+            self._wakeup.set()
+        return True
+
+    def _replay_log(self):
+        if not self.log_path or not os.path.exists(self.log_path):
+            return
+        with open(self.log_path) as log:
+            for line in log:
+                if line.strip():
+                    self._rows.extend(json.loads(line))
+        print(f"Ingestion queue: replayed {len(self._rows)} rows from {self.log_path}")
+
+    async def _apply_rollups(self, supabase: AsyncClient):
+        """Apply the rollups of inserted rows; a user's rows stay queued if theirs fail."""
+        rows_by_user: Dict[str, List[Dict[str, Any]]] = {}
+        while self._rollup_rows:
+            row = self._rollup_rows.popleft()
+            rows_by_user.setdefault(row["user_id"], []).append(row)
+        for user_id, user_rows in rows_by_user.items():
+            try:
+                await update_message_rollups(supabase, user_id, user_rows)
+            except BaseException as e:
+                self._rollup_rows.extend(user_rows)
+                self.failed_rollups += 1
+                if not isinstance(e, Exception):
+                    raise
+                print(f"Ingestion queue rollup error for user {user_id}: {str(e)}")
+                continue
+            bump_user_data_version(user_id)
+
+    async def flush(self, supabase: AsyncClient):
+        """Write everything queued so far, one bulk insert per chunk, then the rollups."""
+        while self._rows:
+            count = min(len(self._rows), SAVE_BATCH_CHUNK_SIZE)
+            batch = [self._rows.popleft() for _ in range(count)]
+            start = time.perf_counter()
+            try:
+                inserted = await insert_message_rows(supabase, batch, rollups=False)
+            except BaseException as e:
+                # Keep the rows, in order, for the next attempt
+                self._rows.extendleft(reversed(batch))
+                self.failed_flushes += 1
+                if not isinstance(e, Exception):
+                    raise
+                print(f"Ingestion queue flush error: {str(e)}")
+                break
+            self._rollup_rows.extend(inserted)
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.total_flush_ms += self.last_flush_ms
+            self.flush_count += 1
+            self.flushed_rows += count
+
+        await self._apply_rollups(supabase)
+
+        if self.log_path and not self._rows and not self._rollup_rows:
+            async with self._get_log_lock():
+                if not self._rows:
+                    await asyncio.to_thread(self._truncate_log)
+
+    async def _run(self, supabase: AsyncClient):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush(supabase)
+
+    def start(self, supabase: AsyncClient):
+        """Replay the durable log and start the background flusher."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._log_lock = asyncio.Lock()
+            self._replay_log()
+            self._task = asyncio.create_task(self._run(supabase))
+
+    async def stop(self, supabase: AsyncClient):
+        """Stop the flusher and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(supabase)
+
+    def get_info(self) -> Dict[str, Any]:
+        """Return queue depth, flush latency and row counters."""
+        return {
+            "mode": SAVE_INGESTION_MODE,
+            "depth": len(self._rows),
+            "rollup_depth": len(self._rollup_rows),
+            "max_rows": self.max_rows,
+            "enqueued_rows": self.enqueued_rows,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "failed_flushes": self.failed_flushes,
+            "failed_rollups": self.failed_rollups,
+            "failed_log_appends": self.failed_log_appends,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.flush_count if self.flush_count else None
+        }
+
+
+ingestion_queue = IngestionQueue()
+
+
+def ingestion_enabled() -> bool:
+    """True when the /save endpoints should queue messages instead of writing them."""
+    return SAVE_INGESTION_MODE == "queue"
@@ -1,28 +1,40 @@
 # utils/middleware/access_control_middleware.py (FIXED VERSION)
 """
 Fixed Access Control Middleware - Properly handles response modification
+
+Access filtering now happens inside the route queries (see
+utils.access_control.apply_access_conditions), so by default this middleware
+is a passthrough. ACCESS_CONTROL_MODE=verify re-checks the responses of the
+protected endpoints in memory against the request's UserContext, drops
+anything the user cannot access and logs it as a leak in the route. Only
+bodies up to ACCESS_CONTROL_MAX_VERIFY_BYTES are buffered for that check.
 """
+import os
 
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
-from utils.access_control import get_user_metadata, filter_accessible_items
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from utils.access_control import filter_accessible_items
+from utils.user_context import UserContext, load_user_context
 import json
-import os
-from supabase import create_client
+import jwt
+from utils.supabase_client import get_supabase
+from utils.auth.token_verification import AUTH_LOCAL_VERIFICATION, verify_access_token
+
+ACCESS_CONTROL_MODE = os.getenv("ACCESS_CONTROL_MODE", "off").lower()
+ACCESS_CONTROL_MAX_VERIFY_BYTES = int(os.getenv("ACCESS_CONTROL_MAX_VERIFY_BYTES", str(4 * 1024 * 1024)))
 
 class AccessControlMiddleware(BaseHTTPMiddleware):
     """
-    Middleware that automatically filters API responses to only include
-    items the user has access to.
+    Middleware that can verify API responses only include items the user
+    has access to.
     """
     
-    def __init__(self, app, supabase_client=None):
+    def __init__(self, app, supabase_client=None, mode: str = ACCESS_CONTROL_MODE):
         super().__init__(app)
-        self.supabase = supabase_client or create_client(
-            os.getenv("SUPABASE_URL"), 
-            os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        )
+        self.mode = mode
+        # The shared client only exists once the app lifespan has started
+        self._supabase = supabase_client
         
         # Define which endpoints need automatic access control
         self.protected_endpoints = {
@@ -31,7 +43,14 @@ class AccessControlMiddleware(BaseHTTPMiddleware):
             "/prompts/blocks": "block"
         }
     
+    @property
+    def supabase(self):
+        return self._supabase or get_supabase()
+
     async def dispatch(self, request: Request, call_next):
+        if self.mode != "verify":
+            return await call_next(request)
+
         response = await call_next(request)
         
         # Only process successful JSON responses from GET requests
@@ -55,7 +74,7 @@ class AccessControlMiddleware(BaseHTTPMiddleware):
                     if user_id:
                         # Filter response data
                         filtered_response = await self._filter_response_data(
-                            response, user_id, endpoint_type
+                            response, await self._get_user_context(request, user_id), endpoint_type, path
                         )
                         return filtered_response
                 except Exception as e:
@@ -70,76 +89,113 @@ class AccessControlMiddleware(BaseHTTPMiddleware):
         if not auth_header or not auth_header.startswith("Bearer "):
             return None
         
+        token = auth_header.split(" ")[1]
+        if AUTH_LOCAL_VERIFICATION:
+            try:
+                # The route's auth dependency already verified this token, so
+                # this is a claims cache hit rather than a second auth request
+                claims = await verify_access_token(token)
+                return claims["sub"]
+            except jwt.PyJWTError:
+                return None
+            except Exception:
+                pass
+
         try:
-            token = auth_header.split(" ")[1]
-            user_info = self.supabase.auth.get_user(token)
+            user_info = await self.supabase.auth.get_user(token)
             return user_info.user.id if user_info and user_info.user else None
         except Exception:
             return None
     
-    async def _filter_response_data(self, response, user_id: str, item_type: str):
-        """Filter response data to only include accessible items."""
-        try:
-            # Read the entire response body
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
-            
-            # Parse JSON
-            try:
-                data = json.loads(body.decode())
-            except json.JSONDecodeError:
-                # If it's not valid JSON, return original response
-                return JSONResponse(
-                    content=body.decode(),
+    async def _get_user_context(self, request: Request, user_id: str) -> UserContext:
+        """Reuse the context the route already loaded, if any."""
+        context = getattr(request.state, "user_context", None)
+        if context is not None and context.user_id == user_id:
+            return context
+        return await load_user_context(self.supabase, user_id)
+
+    def _filter_items(self, user: UserContext, items: list, item_type: str, path: str) -> bool:
+        """
+        Drop inaccessible items from ``items`` in place, logging anything the
+        route should not have returned. Returns True if the list changed.
+        """
+        accessible = filter_accessible_items(user, items, item_type)
+        if len(accessible) == len(items):
+            return False
+        print(f"Access control: {path} returned {len(items) - len(accessible)} inaccessible {item_type}(s) "
+              f"for user {user.user_id}")
+        items[:] = accessible
+        return True
+
+    def _filter_payload(self, data, user: UserContext, item_type: str, path: str) -> bool:
+        """Filter a decoded APIResponse payload in place. Returns True if anything was dropped."""
+        if not isinstance(data, dict) or "data" not in data:
+            return False
+
+        if isinstance(data["data"], list):
+            return self._filter_items(user, data["data"], item_type, path)
+
+        changed = False
+        # Handle nested structure (like folders with templates)
+        if isinstance(data["data"], dict) and isinstance(data["data"].get("folders"), dict):
+            for folders in data["data"]["folders"].values():
+                if isinstance(folders, list):
+                    changed |= self._filter_items(user, folders, "folder", path)
+                    for folder in folders:
+                        if isinstance(folder.get("templates"), list):
+                            changed |= self._filter_items(user, folder["templates"], "template", path)
+        return changed
+
+    async def _replay(self, chunks: list, body_iterator):
+        for chunk in chunks:
+            yield chunk
+        async for chunk in body_iterator:
+            yield chunk
+
+    async def _filter_response_data(self, response, user: UserContext, item_type: str, path: str):
+        """
+        Filter response data to only include accessible items.
+
+        Bodies larger than ACCESS_CONTROL_MAX_VERIFY_BYTES are streamed through
+        unchecked, and a body with nothing to drop is returned byte for byte,
+        so only the (rare) leaking response is decoded and re-encoded.
+        """
+        headers = dict(response.headers)
+        declared_length = int(headers.get("content-length") or 0)
+        if declared_length > ACCESS_CONTROL_MAX_VERIFY_BYTES:
+            print(f"Access control: skipping verification of {path} ({declared_length} bytes)")
+            return response
+
+        chunks = []
+        size = 0
+        body_iterator = response.body_iterator
+        async for chunk in body_iterator:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > ACCESS_CONTROL_MAX_VERIFY_BYTES:
+                print(f"Access control: skipping verification of {path} (over {ACCESS_CONTROL_MAX_VERIFY_BYTES} bytes)")
+                return StreamingResponse(
+                    self._replay(chunks, body_iterator),
                     status_code=response.status_code,
-                    headers={k: v for k, v in response.headers.items() if k.lower() != 'content-length'}
+                    headers=headers
                 )
-            
-            # Filter data if it contains items
-            if isinstance(data, dict):
-                if "data" in data:
-                    if isinstance(data["data"], list):
-                        # Filter list of items
-                        filtered_items = filter_accessible_items(
-                            self.supabase, user_id, data["data"], item_type
-                        )
-                        data["data"] = filtered_items
-                        
-                    elif isinstance(data["data"], dict):
-                        # Handle nested structure (like folders with templates)
-                        if "folders" in data["data"]:
-                            for folder_type, folders in data["data"]["folders"].items():
-                                if isinstance(folders, list):
-                                    # Filter folders
-                                    filtered_folders = filter_accessible_items(
-                                        self.supabase, user_id, folders, "folder"
-                                    )
-                                    
-                                    # Filter templates within folders
-                                    for folder in filtered_folders:
-                                        if "templates" in folder and isinstance(folder["templates"], list):
-                                            folder["templates"] = filter_accessible_items(
-                                                self.supabase, user_id, folder["templates"], "template"
-                                            )
-                                    
-                                    data["data"]["folders"][folder_type] = filtered_folders
-            
-            # Create new response with filtered data
-            # Remove content-length header to let FastAPI recalculate it
-            headers = {k: v for k, v in response.headers.items() if k.lower() != 'content-length'}
-            
-            return JSONResponse(
-                content=data,
-                status_code=response.status_code,
-                headers=headers
-            )
-            
+
+        body = b"".join(chunks)
+        del chunks
+        try:
+            data = json.loads(body)
+            if not self._filter_payload(data, user, item_type, path):
+                return Response(content=body, status_code=response.status_code, headers=headers)
+            del body
         except Exception as e:
             print(f"Error filtering response data: {str(e)}")
             # Return original response on error
-            return JSONResponse(
-                content=json.loads(body.decode()) if body else {},
-                status_code=response.status_code,
-                headers={k: v for k, v in response.headers.items() if k.lower() != 'content-length'}
-            )
\ No newline at end of file
+            return Response(content=body, status_code=response.status_code, headers=headers)
+
+        # Remove content-length header to let the response recalculate it
+        headers.pop("content-length", None)
+        return JSONResponse(
+            content=data,
+            status_code=response.status_code,
+            headers=headers
+        )
@@ -1,13 +1,6 @@
-from supabase import create_client, Client
-import dotenv
-import os
 from datetime import datetime, timezone
 import uuid
-
-dotenv.load_dotenv()
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+from utils.supabase_client import get_supabase
 
 class NotificationService:
     """Service for creating and managing system notifications."""
@@ -19,8 +12,9 @@ class NotificationService:
         Should be called when a user first signs up.
         """
         try:
+            supabase = get_supabase()
             # Check if user already has this notification
-            existing_notification = supabase.table("notifications") \
+            existing_notification = await supabase.table("notifications") \
                 .select("id") \
                 .eq("user_id", user_id) \
                 .eq("type", "welcome_new_user") \
@@ -43,7 +37,7 @@ class NotificationService:
                 
                 print("notification", notification)
                 # Insert notification
-                supabase.table("notifications").insert(notification).execute()
+                await supabase.table("notifications").insert(notification).execute()
                 return True
                 
             return False
@@ -64,7 +58,7 @@ class NotificationService:
                 "metadata": metadata
             }
             
-            response = supabase.table("notifications").insert(notification).execute()
+            response = await get_supabase().table("notifications").insert(notification).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error creating notification: {str(e)}")
@@ -1,6 +1,7 @@
 # utils/folder_assignment_service.py
 from typing import List, Dict, Optional
-from supabase import Client
+from supabase import AsyncClient
+from utils.pinned_items import PINNED_FOLDERS, update_pinned_ids
 from utils.onboarding.folder_mapping import FolderRecommendationEngine
 from utils.prompts.locales import extract_localized_field
 import logging
@@ -12,7 +13,7 @@ class FolderAssignmentService:
     Service for assigning and managing user folder pins based on onboarding data.
     """
     
-    def __init__(self, supabase_client: Client):
+    def __init__(self, supabase_client: AsyncClient):
         self.supabase = supabase_client
         self.recommendation_engine = FolderRecommendationEngine()
     
@@ -41,8 +42,8 @@ class FolderAssignmentService:
                 interests=clean_interests
             )
             
-            # Get current pinned folders
-            metadata_response = self.supabase.table("users_metadata") \
+            # Current pinned folders, to report which recommendations are new
+            metadata_response = await self.supabase.table("users_metadata") \
                 .select("pinned_folder_ids") \
                 .eq("user_id", user_id) \
                 .single() \
@@ -52,19 +53,14 @@ class FolderAssignmentService:
             if metadata_response.data and metadata_response.data.get("pinned_folder_ids"):
                 current_pinned = metadata_response.data["pinned_folder_ids"]
             
-            # Merge recommendations with existing pinned folders
-            updated_pinned = list(set(current_pinned + recommended_folders))
-            
-            # Update user metadata with new pinned folders
-            update_response = self.supabase.table("users_metadata") \
-                .update({"pinned_folder_ids": updated_pinned}) \
-                .eq("user_id", user_id) \
-                .execute()
+            # Merge recommendations with existing pinned folders (in one
+            # database step, so a concurrent pin is not overwritten)
+            updated_pinned = await update_pinned_ids(self.supabase, user_id, PINNED_FOLDERS, add=recommended_folders)
             
             # Get folder details for the frontend with proper localization
             folder_details = []
             if updated_pinned:
-                folders_response = self.supabase.table("prompt_folders") \
+                folders_response = await self.supabase.table("prompt_folders") \
                     .select("id, title, description, type") \
                     .in_("id", updated_pinned) \
                     .execute()
@@ -169,7 +165,7 @@ class FolderAssignmentService:
             # Get folder details for the recommendations with localization
             folder_details = []
             if recommended_folders:
-                folders_response = self.supabase.table("prompt_folders") \
+                folders_response = await self.supabase.table("prompt_folders") \
                     .select("id, title, description, type") \
                     .in_("id", recommended_folders) \
                     .execute()
@@ -0,0 +1,76 @@
+"""
+Atomic pin/unpin of folders and templates.
+
+The pinned ids live in array columns of ``users_metadata``. Building the new
+list from the (cached) UserContext and writing it back would overwrite a pin
+made concurrently through another worker, so every pin/unpin is applied in
+one statement by the ``update_pinned_ids`` database function, which also
+creates the metadata row on first use:
+
+    create or replace function update_pinned_ids(p_user_id uuid, p_column text,
+                                                 p_add bigint[], p_remove bigint[])
+    returns bigint[]
+    language plpgsql as $$
+    declare
+        current_ids bigint[];
+        result bigint[];
+        existing int;
+    begin
+        if p_column not in ('pinned_folder_ids', 'pinned_template_ids') then
+            raise exception 'unknown pinned column %', p_column;
+        end if;
+        -- The row lock serializes concurrent pins of the same user
+        execute format('select %I::bigint[] from users_metadata where user_id = $1 for update', p_column)
+            into current_ids using p_user_id;
+        get diagnostics existing = row_count;
+
+        select coalesce(array_agg(id order by ord), '{}') into result
+        from (
+            select id, min(ord) as ord
+            from unnest(coalesce(current_ids, '{}') || coalesce(p_add, '{}')) with ordinality as u(id, ord)
+            where id <> all(coalesce(p_remove, '{}'))
+            group by id
+        ) ids;
+
+        if existing > 0 then
+            execute format('update users_metadata set %I = $2 where user_id = $1', p_column)
+                using p_user_id, result;
+        else
+            execute format('insert into users_metadata (user_id, %I) values ($1, $2)', p_column)
+                using p_user_id, result;
+        end if;
+        return result;
+    end;
+    $$;
+"""
+from typing import List, Sequence
+from supabase import AsyncClient
+from utils.user_context_cache import invalidate_user_context
+
+PINNED_FOLDERS = "pinned_folder_ids"
+PINNED_TEMPLATES = "pinned_template_ids"
+
+
+async def update_pinned_ids(supabase: AsyncClient, user_id: str, column: str,
+                            add: Sequence[int] = (), remove: Sequence[int] = ()) -> List[int]:
+    """
+    Add and/or remove ids from one of the user's pinned lists, atomically.
+
+    Args:
+        supabase: Supabase client
+        user_id: User ID
+        column: PINNED_FOLDERS or PINNED_TEMPLATES
+        add: Ids to append (ids already pinned keep their position)
+        remove: Ids to drop
+
+    Returns:
+        The pinned ids after the update
+    """
+    response = await supabase.rpc("update_pinned_ids", {
+        "p_user_id": user_id,
+        "p_column": column,
+        "p_add": list(add),
+        "p_remove": list(remove)
+    }).execute()
+    await invalidate_user_context(user_id)
+    return response.data or []
@@ -29,6 +29,11 @@ from .templates import (
     normalize_localized_field
 )
 
+from .library_version import (
+    bump_library_version,
+    check_not_modified
+)
+
 __all__ = [
     # Locale utilities
     'extract_localized_field',
@@ -52,5 +57,9 @@ __all__ = [
     'organize_templates_by_folder',
     'add_templates_to_folders',
     'validate_block_access',
-    'normalize_localized_field'
+    'normalize_localized_field',
+
+    # Library versioning
+    'bump_library_version',
+    'check_not_modified'
 ]
\ No newline at end of file
@@ -4,9 +4,11 @@
 Updated utility functions for folder operations with new pinned folder structure.
 """
 from typing import Dict, List, Optional, Any
-from supabase import Client
+from supabase import AsyncClient
 from utils.prompts.locales import extract_localized_field
-from utils.access_control import apply_access_conditions
+from utils.user_context import UserContext
+from utils.user_context_cache import invalidate_user_context
+from utils.pinned_items import PINNED_FOLDERS, update_pinned_ids
 
 def determine_folder_type(folder: Dict) -> str:
     """
@@ -39,7 +41,7 @@ def process_folder_for_response(folder_data: dict, locale: str = "en") -> dict:
         "parent_folder_id": folder_data.get("parent_folder_id"),
     }
 
-async def get_user_pinned_folders(supabase: Client, user_id: str) -> List[int]:
+async def get_user_pinned_folders(supabase: AsyncClient, user_id: str) -> List[int]:
     """
     Get user's pinned folder IDs from the updated schema.
     
@@ -51,7 +53,7 @@ async def get_user_pinned_folders(supabase: Client, user_id: str) -> List[int]:
         List of pinned folder IDs
     """
     try:
-        user_metadata = supabase.table("users_metadata").select("pinned_folder_ids").eq("user_id", user_id).single().execute()
+        user_metadata = await supabase.table("users_metadata").select("pinned_folder_ids").eq("user_id", user_id).single().execute()
         
         if not user_metadata.data:
             return []
@@ -61,7 +63,7 @@ async def get_user_pinned_folders(supabase: Client, user_id: str) -> List[int]:
         print(f"Error fetching pinned folders: {str(e)}")
         return []
 
-async def update_user_pinned_folders(supabase: Client, user_id: str, folder_ids: List[int]) -> Dict:
+async def update_user_pinned_folders(supabase: AsyncClient, user_id: str, folder_ids: List[int]) -> Dict:
     """
     Update user's pinned folder IDs in the new unified structure.
     
@@ -74,7 +76,7 @@ async def update_user_pinned_folders(supabase: Client, user_id: str, folder_ids:
         Success response with updated folder IDs
     """
     try:
-        user_metadata = supabase.table("users_metadata").select("id").eq("user_id", user_id).single().execute()
+        user_metadata = await supabase.table("users_metadata").select("id").eq("user_id", user_id).single().execute()
         
         if not user_metadata.data:
             # Create new user metadata
@@ -82,67 +84,59 @@ async def update_user_pinned_folders(supabase: Client, user_id: str, folder_ids:
                 "user_id": user_id,
                 "pinned_folder_ids": folder_ids
             }
-            response = supabase.table("users_metadata").insert(metadata).execute()
+            response = await supabase.table("users_metadata").insert(metadata).execute()
         else:
             # Update existing metadata
-            response = supabase.table("users_metadata").update({
+            response = await supabase.table("users_metadata").update({
                 "pinned_folder_ids": folder_ids
             }).eq("user_id", user_id).execute()
+        await invalidate_user_context(user_id)
         
         return {"success": True, "updated_folder_ids": folder_ids}
     except Exception as e:
         print(f"Error updating pinned folders: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def add_folder_to_pinned(supabase: Client, user_id: str, folder_id: int) -> Dict:
+async def add_folder_to_pinned(supabase: AsyncClient, user: UserContext, folder_id: int) -> Dict:
     """
     Add a single folder to user's pinned folders.
     
     Args:
         supabase: Supabase client
-        user_id: User ID
+        user: Request user context
         folder_id: Folder ID to pin
         
     Returns:
         Success response
     """
     try:
-        current_pinned = await get_user_pinned_folders(supabase, user_id)
-        
-        if folder_id not in current_pinned:
-            current_pinned.append(folder_id)
-            return await update_user_pinned_folders(supabase, user_id, current_pinned)
-        
-        return {"success": True, "message": "Folder already pinned"}
+        # Applied in the database: the cached context may miss other workers' pins
+        folder_ids = await update_pinned_ids(supabase, user.user_id, PINNED_FOLDERS, add=[folder_id])
+        return {"success": True, "updated_folder_ids": folder_ids}
     except Exception as e:
         print(f"Error adding folder to pinned: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def remove_folder_from_pinned(supabase: Client, user_id: str, folder_id: int) -> Dict:
+async def remove_folder_from_pinned(supabase: AsyncClient, user: UserContext, folder_id: int) -> Dict:
     """
     Remove a single folder from user's pinned folders.
     
     Args:
         supabase: Supabase client
-        user_id: User ID
+        user: Request user context
         folder_id: Folder ID to unpin
         
     Returns:
         Success response
     """
     try:
-        current_pinned = await get_user_pinned_folders(supabase, user_id)
-        
-        if folder_id in current_pinned:
-            current_pinned.remove(folder_id)
-            return await update_user_pinned_folders(supabase, user_id, current_pinned)
-        
-        return {"success": True, "message": "Folder was not pinned"}
+        folder_ids = await update_pinned_ids(supabase, user.user_id, PINNED_FOLDERS, remove=[folder_id])
+        return {"success": True, "updated_folder_ids": folder_ids}
     except Exception as e:
         print(f"Error removing folder from pinned: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def get_all_folder_ids_by_type(supabase: Client, folder_type: str, company_id: Optional[str] = None, organization_ids: Optional[List[str]] = None) -> List[int]:
+async def get_all_folder_ids_by_type(supabase: AsyncClient, folder_type: str, company_id: Optional[str] = None, organization_ids: Optional[List[str]] = None) -> List[int]:
     """
     Get all folder IDs of a specific type with updated access logic.
     
@@ -158,7 +152,7 @@ async def get_all_folder_ids_by_type(supabase: Client, folder_type: str, company
     try:
         if folder_type == "official":
             # Global official folders
-            response = supabase.table("prompt_folders").select("id") \
+            response = await supabase.table("prompt_folders").select("id") \
                 .eq("type", "official") \
                 .is_("user_id", "null") \
                 .is_("company_id", "null") \
@@ -169,7 +163,7 @@ async def get_all_folder_ids_by_type(supabase: Client, folder_type: str, company
             # Add organization official folders
             if organization_ids:
                 for org_id in organization_ids:
-                    org_response = supabase.table("prompt_folders").select("id") \
+                    org_response = await supabase.table("prompt_folders").select("id") \
                         .eq("type", "official") \
                         .eq("organization_id", org_id) \
                         .execute()
@@ -178,7 +172,7 @@ async def get_all_folder_ids_by_type(supabase: Client, folder_type: str, company
             return folder_ids
             
         elif folder_type == "company" and company_id:
-            response = supabase.table("prompt_folders").select("id") \
+            response = await supabase.table("prompt_folders").select("id") \
                 .eq("type", "company") \
                 .eq("company_id", company_id) \
                 .execute()
@@ -206,9 +200,9 @@ def add_pinned_status_to_folders(folders: List[Dict], pinned_folder_ids: List[in
     return folders
 
 async def fetch_folders_with_hierarchy(
-    supabase: Client,
+    supabase: AsyncClient,
     folder_type: str,
-    user_id: Optional[str] = None,
+    user: Optional[UserContext] = None,
     folder_ids: Optional[List[int]] = None,
     locale: str = "en"
 ) -> List[Dict]:
@@ -218,7 +212,7 @@ async def fetch_folders_with_hierarchy(
     Args:
         supabase: Supabase client
         folder_type: Type of folders to fetch
-        user_id: User ID for access control
+        user: Request user context for access control
         folder_ids: Specific folder IDs to filter by
         locale: Locale for response processing
         
@@ -231,17 +225,15 @@ async def fetch_folders_with_hierarchy(
         if folder_ids:
             query = query.in_("id", folder_ids)
         
-        if folder_type == "user" and user_id:
-            query = query.eq("user_id", user_id)
-        elif folder_type == "company" and user_id:
-            # Get user's company
-            user_metadata = supabase.table("users_metadata").select("company_id").eq("user_id", user_id).single().execute()
-            if user_metadata.data and user_metadata.data.get("company_id"):
-                query = query.eq("company_id", user_metadata.data["company_id"])
+        if folder_type == "user" and user:
+            query = query.eq("user_id", user.user_id)
+        elif folder_type == "company" and user:
+            if user.company_id:
+                query = query.eq("company_id", user.company_id)
             else:
                 return []
         
-        response = query.execute()
+        response = await query.execute()
         folders = response.data or []
         
         # Process folders for response
@@ -0,0 +1,175 @@
+"""
+Version stamps and ETags for the prompt library.
+
+The extension re-fetches the folder/template library every time the sidebar
+opens. Every row of the library belongs to one scope - its owning user,
+company or organization, or "global" when it has no owner - and each scope
+has a version that the template, folder and block writers bump. A user's
+library ETag hashes the versions of the scopes they can see together with
+their UserContext and the request's path, query and locale, so it can be
+checked without fetching anything.
+
+When USER_CONTEXT_CACHE_URL points to Redis the versions are kept there,
+shared by all workers, and the ETag depends on nothing else: a write handled
+by any worker changes it everywhere, and a client gets 304 from any worker.
+Otherwise versions live in process memory and the ETag also embeds a process
+token and a PROMPT_LIBRARY_ETAG_TTL time bucket, which bounds how long
+another worker can answer 304 after a write it did not see.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from fastapi import Request, Response
+from utils.middleware.localization import extract_locale_from_request
+from utils.user_context import UserContext
+from utils.user_context_cache import USER_CONTEXT_CACHE_URL
+
+PROMPT_LIBRARY_ETAG_TTL = float(os.getenv("PROMPT_LIBRARY_ETAG_TTL", "60"))
+
+_process_token = uuid.uuid4().hex
+
+
+class MemoryLibraryVersions:
+    """Per-process scope versions."""
+
+    shared = False
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def bump(self, scopes: Iterable[str]):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    async def get(self, scopes: List[str]) -> List[int]:
+        return [self._versions.get(scope, 0) for scope in scopes]
+
+
+class RedisLibraryVersions:
+    """Scope versions shared by all workers through Redis (requires the ``redis`` package)."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "library_version:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("USER_CONTEXT_CACHE_URL is set but the redis package is not installed") from e
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def bump(self, scopes: Iterable[str]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                pipe.incr(self.prefix + scope)
+            await pipe.execute()
+
+    async def get(self, scopes: List[str]) -> List[int]:
+        values = await self._redis.mget([self.prefix + scope for scope in scopes])
+        return [int(value) if value else 0 for value in values]
+
+
+_versions = None
+
+
+def get_library_versions():
+    """Return the configured version store, creating it on first use."""
+    global _versions
+    if _versions is None:
+        _versions = RedisLibraryVersions(USER_CONTEXT_CACHE_URL) if USER_CONTEXT_CACHE_URL else MemoryLibraryVersions()
+    return _versions
+
+
+def set_library_versions(backend):
+    """Install a version store (any object with async bump/get and a ``shared`` flag)."""
+    global _versions
+    _versions = backend
+
+
+def _record_scope(record: Dict[str, Any]) -> str:
+    if record.get("user_id"):
+        return f"user:{record['user_id']}"
+    if record.get("company_id"):
+        return f"company:{record['company_id']}"
+    if record.get("organization_id"):
+        return f"org:{record['organization_id']}"
+    return "global"
+
+
+def _user_scopes(user: UserContext) -> List[str]:
+    scopes = [f"user:{user.user_id}", "global"]
+    if user.company_id:
+        scopes.append(f"company:{user.company_id}")
+    scopes.extend(f"org:{org_id}" for org_id in sorted(user.organization_ids))
+    return scopes
+
+
+Records = Union[Dict[str, Any], Iterable[Dict[str, Any]], None]
+
+
+def _as_list(records: Records) -> List[Dict[str, Any]]:
+    if not records:
+        return []
+    return [records] if isinstance(records, dict) else list(records)
+
+
+async def bump_library_version(records: Records, previous: Records = None):
+    """
+    Mark the library scopes owning ``records`` as changed.
+
+    Args:
+        records: Row(s) written, as returned by the insert/update/delete
+            (only the user_id, company_id and organization_id columns are used)
+        previous: For updates, the owner columns of the rows before the
+            write, so a row moving to another scope changes both
+    """
+    scopes = {_record_scope(record) for record in _as_list(records) + _as_list(previous)}
+    if not scopes:
+        return
+    try:
+        await get_library_versions().bump(scopes)
+    except Exception as e:
+        print(f"Error bumping prompt library version: {str(e)}")
+
+
+async def library_etag(request: Request, user: UserContext) -> Optional[str]:
+    """Compute the ETag of a library response for this user and request (None if unavailable)."""
+    store = get_library_versions()
+    scopes = _user_scopes(user)
+    try:
+        versions = list(zip(scopes, await store.get(scopes)))
+    except Exception as e:
+        print(f"Error reading prompt library versions: {str(e)}")
+        return None
+    parts = [
+        request.url.path,
+        str(sorted(request.query_params.multi_items())),
+        extract_locale_from_request(request),
+        user.model_dump_json(),
+        str(versions),
+    ]
+    if not store.shared:
+        parts[:0] = [_process_token, str(int(time.time() // PROMPT_LIBRARY_ETAG_TTL))]
+    return '"' + hashlib.sha1("|".join(parts).encode()).hexdigest() + '"'
+
+
+async def check_not_modified(request: Request, response: Response, user: UserContext) -> Optional[Response]:
+    """
+    Set the library ETag on ``response``; return a 304 response if the client
+    already has this version, else None.
+    """
+    etag = await library_etag(request, user)
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -2,13 +2,9 @@
 Utility functions for template operations in the prompts system.
 """
 from typing import Dict, List , Union
-from supabase import Client
+from supabase import AsyncClient
 from .locales import extract_localized_field, create_localized_field
-import os
-from supabase import create_client, Client
-
-# Initialize Supabase client
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+from utils.user_context import UserContext
 
 
 def process_template_for_response(template_data: dict, locale: str = "en") -> dict:
@@ -38,7 +34,7 @@ def process_template_for_response(template_data: dict, locale: str = "en") -> di
     return processed
 
 async def fetch_templates_for_folders(
-    supabase: Client,
+    supabase: AsyncClient,
     folder_ids: List[int],
     folder_type: str,
     locale: str = "en"
@@ -58,7 +54,7 @@ async def fetch_templates_for_folders(
     if not folder_ids:
         return []
     
-    response = supabase.table("prompt_templates") \
+    response = await supabase.table("prompt_templates") \
         .select("*") \
         .eq("type", folder_type) \
         .in_("folder_id", folder_ids) \
@@ -124,42 +120,38 @@ def normalize_content_to_dict(content, locale: str = "en"):
     # For any other type, convert to string and wrap in dict
     return {locale: str(content)}
 
-async def validate_block_access(block_ids: List[int], user_id: str) -> bool:
+async def validate_block_access(supabase: AsyncClient, block_ids: List[int], user: UserContext) -> bool:
     """Validate that user has access to all referenced blocks"""
     if not block_ids:
         return True
     
-    # Get user's metadata
-    user_metadata_response = supabase.table("users_metadata").select("organization_ids, company_id").eq("user_id", user_id).single().execute()
-    user_metadata = user_metadata_response.data or {}
-    
-    # Get user's organization IDs and company ID
-    org_ids = user_metadata.get("organization_ids", [])
-    company_id = user_metadata.get("company_id")
+    user_id = user.user_id
+    org_ids = user.organization_ids
+    company_id = user.company_id
     
     # Need to use separate queries for each access type and combine results
     accessible_block_ids = set()
     
     # 1. User's own blocks
-    user_blocks = supabase.table("prompt_blocks").select("id").eq("user_id", user_id).in_("id", block_ids).execute()
+    user_blocks = await supabase.table("prompt_blocks").select("id").eq("user_id", user_id).in_("id", block_ids).execute()
     if user_blocks.data:
         accessible_block_ids.update(block["id"] for block in user_blocks.data)
     
     # 2. Global blocks (no IDs)
-    global_blocks = supabase.table("prompt_blocks").select("id").is_("user_id", "null").is_("company_id", "null").is_("organization_id", "null").in_("id", block_ids).execute()
+    global_blocks = await supabase.table("prompt_blocks").select("id").is_("user_id", "null").is_("company_id", "null").is_("organization_id", "null").in_("id", block_ids).execute()
     if global_blocks.data:
         accessible_block_ids.update(block["id"] for block in global_blocks.data)
     
     # 3. Company blocks if user has company
     if company_id:
-        company_blocks = supabase.table("prompt_blocks").select("id").eq("company_id", company_id).in_("id", block_ids).execute()
+        company_blocks = await supabase.table("prompt_blocks").select("id").eq("company_id", company_id).in_("id", block_ids).execute()
         if company_blocks.data:
             accessible_block_ids.update(block["id"] for block in company_blocks.data)
     
     # 4. Organization blocks
     if org_ids and len(org_ids) > 0:
         for org_id in org_ids:
-            org_blocks = supabase.table("prompt_blocks").select("id").eq("organization_id", org_id).in_("id", block_ids).execute()
+            org_blocks = await supabase.table("prompt_blocks").select("id").eq("organization_id", org_id).in_("id", block_ids).execute()
             if org_blocks.data:
                 accessible_block_ids.update(block["id"] for block in org_blocks.data)
         
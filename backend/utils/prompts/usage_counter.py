@@ -0,0 +1,130 @@
+"""
+Buffered template usage counter.
+
+``POST /prompts/templates/use/{id}`` is called on every template insertion,
+and popular official templates receive many pings at once. Instead of a
+read-modify-write per click, usages are counted in process memory and
+flushed every TEMPLATE_USAGE_FLUSH_INTERVAL seconds through one call to the
+``increment_template_usage`` database function, which applies all pending
+increments atomically (so concurrent workers never lose counts):
+
+    create or replace function increment_template_usage(template_ids bigint[], amounts int[])
+    returns setof prompt_templates
+    language sql as $$
+        update prompt_templates t
+        set usage_count = coalesce(t.usage_count, 0) + u.amount,
+            last_used_at = now()
+        from unnest(template_ids, amounts) as u(id, amount)
+        where t.id = u.id
+        returning t.*;
+    $$;
+
+Pending counts are flushed on shutdown; a failed flush keeps them for the
+next attempt. At most TEMPLATE_USAGE_MAX_PENDING distinct templates are
+buffered: usages of further templates are dropped until the next flush.
+
+Usage counts are not part of the library structure, so flushes do not bump
+the library version (a popular official template would otherwise change
+every user's library ETag every few seconds).
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Optional
+from supabase import AsyncClient
+
+TEMPLATE_USAGE_FLUSH_INTERVAL = float(os.getenv("TEMPLATE_USAGE_FLUSH_INTERVAL", "5"))
+TEMPLATE_USAGE_MAX_PENDING = int(os.getenv("TEMPLATE_USAGE_MAX_PENDING", "10000"))
+# prompt_templates.id is a bigint
+MAX_TEMPLATE_ID = 2 ** 63 - 1
+
+_pending: Dict[int, int] = {}
+_pending_lock = threading.Lock()
+_flush_task: Optional[asyncio.Task] = None
+
+
+def record_template_usage(template_id: int) -> Optional[int]:
+    """
+    Count one usage of a template.
+
+    Returns:
+        Usages of the template waiting for the next flush, or None if the
+        buffer is full and the usage was dropped
+
+    Raises:
+        ValueError: If template_id is not a valid template id
+    """
+    if not 0 < template_id <= MAX_TEMPLATE_ID:
+        raise ValueError(f"Invalid template id {template_id}")
+    with _pending_lock:
+        if template_id not in _pending and len(_pending) >= TEMPLATE_USAGE_MAX_PENDING:
+            return None
+        _pending[template_id] = _pending.get(template_id, 0) + 1
+        return _pending[template_id]
+
+
+def _requeue(counts: Dict[int, int]):
+    dropped = 0
+    with _pending_lock:
+        for template_id, amount in counts.items():
+            if template_id not in _pending and len(_pending) >= TEMPLATE_USAGE_MAX_PENDING:
+                dropped += 1
+                continue
+            _pending[template_id] = _pending.get(template_id, 0) + amount
+    if dropped:
+        print(f"Template usage buffer full, dropped the counts of {dropped} templates")
+
+
+async def flush_template_usage(supabase: AsyncClient) -> int:
+    """
+    Write all pending usages in one atomic increment.
+
+    Returns:
+        Number of templates updated
+    """
+    global _pending
+    with _pending_lock:
+        counts, _pending = _pending, {}
+    if not counts:
+        return 0
+
+    try:
+        response = await supabase.rpc("increment_template_usage", {
+            "template_ids": list(counts.keys()),
+            "amounts": list(counts.values())
+        }).execute()
+    except asyncio.CancelledError:
+        _requeue(counts)
+        raise
+    except Exception as e:
+        print(f"Error flushing template usage: {str(e)}")
+        _requeue(counts)
+        return 0
+
+    return len(response.data or [])
+
+
+async def _flush_loop(supabase: AsyncClient):
+    while True:
+        await asyncio.sleep(TEMPLATE_USAGE_FLUSH_INTERVAL)
+        await flush_template_usage(supabase)
+
+
+def start_template_usage_flusher(supabase: AsyncClient):
+    """Start the periodic flush task (called from the app lifespan)."""
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop(supabase))
+
+
+async def stop_template_usage_flusher(supabase: AsyncClient):
+    """Stop the periodic flush task and write whatever is still pending."""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_template_usage(supabase)
@@ -0,0 +1,197 @@
+"""
+Process pool running the CPU-bound part of the enhanced stats.
+
+Fetching a user's messages, building the MessageFrame (regex feature
+extraction) and running the analyzers are synchronous and CPU-heavy; run on
+the event loop they stall every other request of the worker, /save included.
+``run_enhanced_analytics`` runs them in a bounded ProcessPoolExecutor
+instead. The worker fetches the rows itself, so only the small result dict
+crosses the process boundary.
+
+At most STATS_POOL_MAX_PENDING jobs are submitted at once; further requests
+wait for a slot. Waiting and computing share one STATS_ANALYTICS_TIMEOUT, and
+a request that runs out of time gets ``degraded_analytics`` instead; its job
+is cancelled if it has not started, and otherwise keeps its slot until it
+finishes, so slow jobs cannot pile up behind the limit.
+
+Each worker process creates its Supabase client once, in the pool
+initializer, and reuses it (and its connections) for every job.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+from supabase import Client, create_client
+from utils.stats.message_frame import MessageFrame
+from utils.stats.message_pages import iter_frame_rows, iter_user_rows
+from utils.stats.compute_usage_patterns import compute_usage_patterns
+from utils.stats.analyze_response_quality import analyze_response_quality
+from utils.stats.calculate_efficiency_score import calculate_efficiency_score
+from utils.stats.generate_personalized_insights import generate_personalized_insights
+
+STATS_POOL_WORKERS = int(os.getenv("STATS_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+STATS_POOL_MAX_PENDING = int(os.getenv("STATS_POOL_MAX_PENDING", str(STATS_POOL_WORKERS * 2)))
+STATS_ANALYTICS_TIMEOUT = float(os.getenv("STATS_ANALYTICS_TIMEOUT", "20"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots: Optional[asyncio.Semaphore] = None
+# Per worker process, set by _init_worker
+_worker_supabase: Optional[Client] = None
+
+
+def _init_worker():
+    global _worker_supabase
+    _worker_supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+
+
+def _get_worker_supabase() -> Client:
+    if _worker_supabase is None:
+        _init_worker()
+    return _worker_supabase
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a process that is running the event loop and its threads
+            _pool = ProcessPoolExecutor(
+                max_workers=STATS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(STATS_POOL_MAX_PENDING)
+    return _slots
+
+
+def shutdown_analytics_pool():
+    """Stop the worker processes (call on application shutdown)."""
+    _reset_pool()
+
+
+def _analyze(frame: MessageFrame, chats, token_usage: Dict[str, Any], energy_usage: Dict[str, Any]) -> Dict[str, Any]:
+    usage_patterns = compute_usage_patterns(frame)
+    response_quality = analyze_response_quality(frame)
+    efficiency_score = calculate_efficiency_score(
+        messages=frame,
+        chats=chats,
+        response_quality=response_quality,
+        usage_patterns=usage_patterns
+    )
+    insights = generate_personalized_insights(
+        efficiency_score=efficiency_score,
+        response_quality=response_quality,
+        usage_patterns=usage_patterns,
+        token_usage=token_usage,
+        energy_usage=energy_usage,
+        sessions=frame.sessions
+    )
+    return {
+        "usage_patterns": usage_patterns,
+        "response_quality": response_quality,
+        "efficiency_details": efficiency_score,
+        "personalized_insights": insights
+    }
+
+
+def compute_enhanced_analytics(
+    user_id: str,
+    token_usage: Dict[str, Any],
+    energy_usage: Dict[str, Any],
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Fetch a user's messages and chats and run all analyzers on them.
+
+    This runs inside a pool worker, with the worker's Supabase client.
+
+    Returns:
+        Dictionary with usage_patterns, response_quality, efficiency_details
+        and personalized_insights
+    """
+    supabase = _get_worker_supabase()
+    chats = list(iter_user_rows(
+        supabase, "chats", user_id, ["created_at"],
+        created_from=created_from, created_before=created_before
+    ))
+    # Columnar view of the messages shared by all analyzers, built from
+    # paginated pages of the stored stats columns (no message bodies)
+    frame = MessageFrame(iter_frame_rows(
+        supabase, user_id, created_from=created_from, created_before=created_before
+    ))
+    return _analyze(frame, chats, token_usage, energy_usage)
+
+
+def degraded_analytics(token_usage: Dict[str, Any], energy_usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Analytics of an empty history, served when the real ones could not be computed in time."""
+    result = _analyze(MessageFrame([]), [], token_usage, energy_usage)
+    result["degraded"] = True
+    return result
+
+
+async def run_enhanced_analytics(
+    user_id: str,
+    token_usage: Dict[str, Any],
+    energy_usage: Dict[str, Any],
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None,
+    timeout: float = STATS_ANALYTICS_TIMEOUT
+) -> Dict[str, Any]:
+    """
+    Run compute_enhanced_analytics in the process pool.
+
+    Returns:
+        The analytics, or degraded_analytics() if no slot freed up and the
+        job did not finish within ``timeout`` seconds, or the pool failed
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    slots = _get_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout)
+    except asyncio.TimeoutError:
+        print(f"Stats analytics pool saturated, serving degraded analytics for user {user_id}")
+        return degraded_analytics(token_usage, energy_usage)
+
+    try:
+        job = _get_pool().submit(
+            compute_enhanced_analytics,
+            user_id, token_usage, energy_usage, created_from, created_before
+        )
+    except Exception:
+        slots.release()
+        raise
+    # The slot is held until the job really ends (or is cancelled before
+    # starting), even if we stop waiting for it
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(slots.release))
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job)), max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        # Only succeeds if the job is still queued; a running job cannot be stopped
+        job.cancel()
+        print(f"Stats analytics timed out after {timeout}s for user {user_id}")
+        return degraded_analytics(token_usage, energy_usage)
+    except BrokenProcessPool as e:
+        print(f"Stats analytics pool crashed: {str(e)}")
+        _reset_pool()
+        return degraded_analytics(token_usage, energy_usage)
@@ -1,19 +1,19 @@
-from typing import List, Dict, Any, Optional
-import re
-from collections import defaultdict
+from typing import List, Dict, Any, Union
 import numpy as np
+from utils.stats.message_frame import MessageFrame, as_message_frame, ROLE_ASSISTANT, RESPONSE_FEATURES
 
-def analyze_response_quality(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+def analyze_response_quality(messages: Union[MessageFrame, List[Dict[str, Any]]]) -> Dict[str, Any]:
     """
     Analyze AI responses to evaluate quality metrics.
     
     Args:
-        messages: List of message objects with role, content, etc.
+        messages: MessageFrame, or list of message objects with role, content, etc.
         
     Returns:
         Dictionary of response quality metrics
     """
-    if not messages:
+    frame = as_message_frame(messages)
+    if not len(frame):
         return {
             "response_length_stats": {},
             "follow_up_rate": 0,
@@ -22,84 +22,38 @@ def analyze_response_quality(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             "code_snippet_stats": {}
         }
     
-    # Prepare conversation threads
-    conversations = defaultdict(list)
-    for msg in messages:
-        if msg.get("chat_provider_id"):
-            conversations[msg["chat_provider_id"]].append(msg)
-    
-    # Sort each conversation by timestamp
-    for chat_id in conversations:
-        conversations[chat_id] = sorted(
-            conversations[chat_id], 
-            key=lambda m: m.get("created_at", "")
-        )
+    # Only messages that belong to a conversation are analyzed
+    in_chat = frame.chat_codes >= 0
+    ai_mask = in_chat & (frame.roles == ROLE_ASSISTANT)
+    total_ai_messages = int(ai_mask.sum())
     
     # Track AI response metrics
-    ai_response_lengths = []
-    follow_up_questions = 0
-    total_ai_messages = 0
-    code_snippets = 0
-    total_code_lines = 0
+    lengths = frame.content_lengths[ai_mask]
+    ai_response_lengths = lengths[lengths > 0]
     
-    # Informational metrics
-    links_shared = 0
-    citations_count = 0
-    definitions_count = 0
+    features = frame.response_features[ai_mask].sum(axis=0)
+    follow_up_questions = int(features[RESPONSE_FEATURES.index("follow_up_questions")])
+    code_snippets = int(features[RESPONSE_FEATURES.index("code_blocks")])
+    total_code_lines = int(features[RESPONSE_FEATURES.index("code_lines")])
     
-    # Iterate through conversations to analyze patterns
-    max_conversation_depth = 0
-    avg_conversation_depths = []
+    # Informational metrics
+    links_shared = int(features[RESPONSE_FEATURES.index("links")])
+    citations_count = int(features[RESPONSE_FEATURES.index("citations")])
+    definitions_count = int(features[RESPONSE_FEATURES.index("definitions")])
     
-    for chat_id, chat_messages in conversations.items():
-        # Calculate conversation depth (turns of back-and-forth)
-        current_depth = 0
-        for i, msg in enumerate(chat_messages):
-            if msg.get("role") == "assistant":
-                total_ai_messages += 1
-                
-                # Get content
-                content = msg.get("content", "")
-                
-                # Response length
-                if content:
-                    ai_response_lengths.append(len(content))
-                
-                # Detect follow-up questions in AI responses
-                if re.search(r'\?(\s|$)', content):
-                    question_matches = re.findall(r'[.!?]\s+[A-Z].*?\?', content)
-                    follow_up_questions += len(question_matches)
-                
-                # Code snippets
-                code_blocks = re.findall(r'```[\s\S]*?```', content)
-                code_snippets += len(code_blocks)
-                
-                # Count code lines
-                for block in code_blocks:
-                    total_code_lines += len(block.split('\n'))
-                
-                # Count links and citations
-                links_shared += len(re.findall(r'https?://\S+', content))
-                citations_count += len(re.findall(r'\[\d+\]|\[\w+, \d{4}\]', content))
-                
-                # Count definitions (explanatory patterns)
-                definitions_count += len(re.findall(r':\s+\S+.*?[.!?]', content))
-                
-                # Conversation depth
-                current_depth += 1
-                max_conversation_depth = max(max_conversation_depth, current_depth)
-        
-        avg_conversation_depths.append(current_depth)
+    # Conversation depth: AI turns per conversation
+    conversation_depths = np.bincount(frame.chat_codes[ai_mask], minlength=len(frame.chat_ids))
+    max_conversation_depth = int(conversation_depths.max()) if len(conversation_depths) else 0
     
     # Compute response length distribution
     length_stats = {}
-    if ai_response_lengths:
+    if len(ai_response_lengths):
         length_stats = {
-            "min": min(ai_response_lengths),
+            "min": int(ai_response_lengths.min()),
             "p25": np.percentile(ai_response_lengths, 25),
             "median": np.percentile(ai_response_lengths, 50),
             "p75": np.percentile(ai_response_lengths, 75),
-            "max": max(ai_response_lengths),
+            "max": int(ai_response_lengths.max()),
             "avg": round(np.mean(ai_response_lengths), 2)
         }
     
@@ -125,7 +79,7 @@ def analyze_response_quality(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
         "response_length_stats": length_stats,
         "follow_up_rate": round(follow_up_questions / max(1, total_ai_messages), 2),
-        "conversation_depth": round(np.mean(avg_conversation_depths), 1) if avg_conversation_depths else 0,
+        "conversation_depth": round(np.mean(conversation_depths), 1) if len(conversation_depths) else 0,
         "max_conversation_depth": max_conversation_depth,
         "information_density": info_density,
         "code_snippet_stats": code_stats
@@ -1,8 +1,9 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 import numpy as np
+from utils.stats.message_frame import MessageFrame, as_message_frame, ROLE_USER, ROLE_ASSISTANT
 
 def calculate_efficiency_score(
-    messages: List[Dict[str, Any]],
+    messages: Union[MessageFrame, List[Dict[str, Any]]],
     chats: List[Dict[str, Any]],
     response_quality: Dict[str, Any],
     usage_patterns: Dict[str, Any]
@@ -11,7 +12,7 @@ def calculate_efficiency_score(
     Calculate a comprehensive AI usage efficiency score based on multiple factors.
     
     Args:
-        messages: List of all user and AI messages
+        messages: MessageFrame, or list of all user and AI messages
         chats: List of chat objects
         response_quality: Response quality metrics from analyze_response_quality
         usage_patterns: Usage pattern metrics from compute_usage_patterns
@@ -20,10 +21,11 @@ def calculate_efficiency_score(
         Dictionary with overall and component scores
     """
     # Start with base metrics
-    user_messages = [m for m in messages if m.get("role") == "user"]
-    ai_messages = [m for m in messages if m.get("role") == "assistant"]
+    frame = as_message_frame(messages)
+    user_prompt_lengths = frame.content_lengths[frame.roles == ROLE_USER]
+    ai_response_lengths = frame.content_lengths[frame.roles == ROLE_ASSISTANT]
     
-    if not user_messages or not ai_messages or not chats:
+    if not len(user_prompt_lengths) or not len(ai_response_lengths) or not chats:
         return {
             "overall_score": 50,
             "components": {
@@ -38,8 +40,8 @@ def calculate_efficiency_score(
         }
     
     # 1. Prompt Efficiency - How effectively user prompts elicit good responses
-    avg_user_prompt_len = np.mean([len(m.get("content", "")) for m in user_messages])
-    avg_ai_response_len = np.mean([len(m.get("content", "")) for m in ai_messages])
+    avg_user_prompt_len = np.mean(user_prompt_lengths)
+    avg_ai_response_len = np.mean(ai_response_lengths)
     
     # Ideal ratio: not too short prompts, but not excessively long compared to responses
     response_to_prompt_ratio = avg_ai_response_len / max(1, avg_user_prompt_len)
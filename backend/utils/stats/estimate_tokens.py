@@ -1,5 +1,9 @@
 import re
-from typing import Dict, Optional
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
 # Token ratio constants for different models
 MODEL_TOKEN_RATIOS: Dict[str, float] = {
@@ -42,10 +46,33 @@ def detect_language(content: str) -> str:
     
     return "en"  # Default to English
 
+# Bounded LRU of token estimates keyed by (content hash, model)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "100000"))
+_token_cache: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_hits = 0
+_token_cache_misses = 0
+
+def content_hash(content: str) -> str:
+    """Stable digest of message content, used as cache key."""
+    return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+def get_token_cache_info() -> Dict[str, int]:
+    """Return hit/miss counters and current size of the token cache."""
+    return {
+        "hits": _token_cache_hits,
+        "misses": _token_cache_misses,
+        "size": len(_token_cache),
+        "max_size": TOKEN_CACHE_SIZE
+    }
+
 def estimate_tokens(content: str, model: str = "default") -> int:
     """
     Estimate token count based on content, model, and detected language.
     
+    Results are memoized by content hash and model, so the regex scans run
+    once per distinct message.
+    
     Args:
         content: The text content to estimate tokens for
         model: AI model name to use for estimation
@@ -53,18 +80,55 @@ def estimate_tokens(content: str, model: str = "default") -> int:
     Returns:
         Estimated token count as integer
     """
+    global _token_cache_hits, _token_cache_misses
     if not content:
         return 0
     
+    key = (content_hash(content), model)
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+        if cached is not None:
+            _token_cache.move_to_end(key)
+            _token_cache_hits += 1
+            return cached
+        _token_cache_misses += 1
+    
+    tokens = _estimate_tokens_uncached(content, model)
+    
+    with _token_cache_lock:
+        _token_cache[key] = tokens
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+def get_message_tokens(message: Dict) -> int:
+    """Token count of a message row, preferring the value stored at save time."""
+    stored = message.get("estimated_tokens")
+    if stored is not None:
+        return stored
+    return estimate_tokens(message.get("content", ""), message.get("model", "default"))
+
+def count_code_blocks(content: str) -> int:
+    """Number of fenced (```) code blocks in the content."""
+    return len(re.findall(r'```[\s\S]*?```', content))
+
+def _estimate_tokens_uncached(
+    content: str,
+    model: str,
+    lang: Optional[str] = None,
+    code_blocks: Optional[int] = None
+) -> int:
     # Get model-specific char-to-token ratio
     ratio = MODEL_TOKEN_RATIOS.get(model, MODEL_TOKEN_RATIOS["default"])
     
     # Apply language-specific modifier
-    lang = detect_language(content)
+    if lang is None:
+        lang = detect_language(content)
     modifier = LANGUAGE_MODIFIERS.get(lang, LANGUAGE_MODIFIERS["default"])
     
     # Additional factors
-    code_blocks = len(re.findall(r'```[\s\S]*?```', content))
+    if code_blocks is None:
+        code_blocks = count_code_blocks(content)
     code_modifier = 1.0 + (code_blocks * 0.05)  # Code is typically more token-efficient
     
     # Calculate final token estimate
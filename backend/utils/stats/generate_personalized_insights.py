@@ -1,13 +1,15 @@
 from typing import Dict, List, Any, Optional
 import random
 from datetime import datetime, timedelta
+from utils.stats.sessions import SessionIndex
 
 def generate_personalized_insights(
     efficiency_score: Dict[str, Any],
     response_quality: Dict[str, Any],
     usage_patterns: Dict[str, Any],
     token_usage: Dict[str, Any],
-    energy_usage: Dict[str, Any]
+    energy_usage: Dict[str, Any],
+    sessions: Optional[SessionIndex] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate personalized, actionable insights for the user based on their AI usage patterns.
@@ -18,6 +20,8 @@ def generate_personalized_insights(
         usage_patterns: Usage pattern metrics
         token_usage: Token usage statistics
         energy_usage: Energy consumption metrics
+        sessions: Session index of the user's messages, used instead of the
+            session_stats summary when available
         
     Returns:
         List of insight objects with title, description, and type
@@ -138,7 +142,7 @@ def generate_personalized_insights(
             })
     
     # 7. Session Pattern Insights
-    session_stats = usage_patterns.get("session_stats", {})
+    session_stats = sessions.stats() if sessions is not None else usage_patterns.get("session_stats", {})
     if session_stats:
         avg_duration = session_stats.get("avg_duration", 0)
         if avg_duration > 30:  # More than 30 minutes average
@@ -0,0 +1,87 @@
+"""
+Stats columns derived from a message's content at save time.
+
+The stats endpoints never need message bodies: every content-derived value
+they use is computed once when the message is saved and stored next to it,
+so the stats reads select these columns instead of ``content``. Migration:
+
+    alter table messages
+        add column if not exists estimated_tokens integer,
+        add column if not exists detected_language text,
+        add column if not exists code_block_count integer,
+        add column if not exists content_length integer,
+        -- counts in RESPONSE_FEATURES order, assistant messages only
+        add column if not exists response_features integer[];
+
+Rows saved before the migration have these columns null; the stats reads
+fetch the content of just those rows (see ``iter_frame_rows`` in
+message_pages.py), so no backfill is required.
+"""
+import re
+from typing import Any, Dict, List, Optional
+from utils.stats.estimate_tokens import detect_language, count_code_blocks, _estimate_tokens_uncached
+
+# Content features extracted from AI responses (see analyze_response_quality)
+FOLLOW_UP_HINT_PATTERN = re.compile(r'\?(\s|$)')
+FOLLOW_UP_QUESTION_PATTERN = re.compile(r'[.!?]\s+[A-Z].*?\?')
+CODE_BLOCK_PATTERN = re.compile(r'```[\s\S]*?```')
+LINK_PATTERN = re.compile(r'https?://\S+')
+CITATION_PATTERN = re.compile(r'\[\d+\]|\[\w+, \d{4}\]')
+DEFINITION_PATTERN = re.compile(r':\s+\S+.*?[.!?]')
+
+RESPONSE_FEATURES = ["follow_up_questions", "code_blocks", "code_lines", "links", "citations", "definitions"]
+
+
+def extract_response_features(content: str) -> List[int]:
+    """Count follow-up questions, code blocks/lines, links, citations and definitions."""
+    follow_ups = 0
+    if FOLLOW_UP_HINT_PATTERN.search(content):
+        follow_ups = len(FOLLOW_UP_QUESTION_PATTERN.findall(content))
+
+    code_blocks = CODE_BLOCK_PATTERN.findall(content)
+    code_lines = sum(len(block.split('\n')) for block in code_blocks)
+
+    return [
+        follow_ups,
+        len(code_blocks),
+        code_lines,
+        len(LINK_PATTERN.findall(content)),
+        len(CITATION_PATTERN.findall(content)),
+        len(DEFINITION_PATTERN.findall(content)),
+    ]
+
+
+def compute_message_fields(content: str, model: str = "default", role: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Derive the stats columns stored with a message at save time.
+
+    Language detection and the code-block scan run once and feed the token
+    estimate, so ingesting a message costs a single pass over its content
+    (plus the response feature scan for assistant messages).
+
+    Args:
+        content: Message text
+        model: AI model name to use for estimation
+        role: Message role; response features are only stored for "assistant"
+
+    Returns:
+        Dictionary with estimated_tokens, detected_language, code_block_count,
+        content_length and response_features
+    """
+    content = content or ""
+    lang = detect_language(content)
+    code_blocks = count_code_blocks(content)
+    return {
+        "estimated_tokens": _estimate_tokens_uncached(content, model, lang, code_blocks) if content else 0,
+        "detected_language": lang,
+        "code_block_count": code_blocks,
+        "content_length": len(content),
+        "response_features": extract_response_features(content) if role == "assistant" else None
+    }
+
+
+def has_message_fields(row: Dict[str, Any]) -> bool:
+    """False for rows saved before the stats columns existed (their content is still needed)."""
+    if row.get("content_length") is None:
+        return False
+    return row.get("role") != "assistant" or row.get("response_features") is not None
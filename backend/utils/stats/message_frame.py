@@ -0,0 +1,165 @@
+"""
+Columnar representation of a user's messages shared by the stats analyzers.
+
+The frame is built once per request: timestamps are parsed once, and content
+lengths and the regex-based content features of AI responses come from the
+columns stored at save time (they are only extracted here for older rows
+fetched with their content). The analyzers then work on NumPy arrays instead
+of walking the list of message dicts again.
+"""
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional, Union
+import numpy as np
+from utils.stats.message_fields import RESPONSE_FEATURES, extract_response_features
+from utils.stats.sessions import SessionIndex
+
+ROLE_USER = 0
+ROLE_ASSISTANT = 1
+ROLE_OTHER = 2
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_UTC_SUFFIXES = ("+00:00", "Z")
+
+
+def _role_code(role: Any) -> int:
+    if role == "user":
+        return ROLE_USER
+    if role == "assistant":
+        return ROLE_ASSISTANT
+    return ROLE_OTHER
+
+
+def _parse_timestamps(created_at: List[str]):
+    """
+    Parse ISO timestamps into (epoch seconds, local wall-clock seconds).
+
+    Local wall-clock time is what ``datetime.hour``/``strftime('%A')`` report
+    for the original string, which only differs from UTC for non-UTC offsets.
+    Unparseable or missing values become NaN.
+    """
+    n = len(created_at)
+    epochs = np.full(n, np.nan)
+    local = np.full(n, np.nan)
+    present = [i for i, value in enumerate(created_at) if value]
+    if not present:
+        return epochs, local
+
+    # Fast path: every value is UTC, so NumPy can parse the whole column at once
+    values = [created_at[i] for i in present]
+    if all(value.endswith(_UTC_SUFFIXES) for value in values):
+        try:
+            naive = [value[:-1] if value.endswith("Z") else value[:-6] for value in values]
+            parsed = np.array(naive, dtype="datetime64[us]").astype(np.int64) / 1e6
+            epochs[present] = parsed
+            local[present] = parsed
+            return epochs, local
+        except ValueError:
+            pass
+
+    for i in present:
+        try:
+            timestamp = datetime.fromisoformat(created_at[i].replace('Z', '+00:00'))
+        except Exception:
+            continue
+        offset = timestamp.utcoffset()
+        wall_clock = timestamp.replace(tzinfo=None)
+        local[i] = (wall_clock - datetime(1970, 1, 1)).total_seconds()
+        epochs[i] = local[i] - (offset.total_seconds() if offset else 0)
+    return epochs, local
+
+
+class MessageFrame:
+    """
+    Column arrays describing a list of messages.
+
+    Attributes:
+        created_at: Raw created_at strings ("" when missing)
+        timestamps: Epoch seconds (NaN when missing or unparseable)
+        local_timestamps: Wall-clock seconds in the timestamp's own offset
+        roles: ROLE_USER / ROLE_ASSISTANT / ROLE_OTHER codes
+        content_lengths: len(content) per message (stored content_length when content is not loaded)
+        model_codes: Index into ``models``
+        chat_codes: Index into ``chat_ids`` (-1 when the message has no chat)
+        response_features: (n, len(RESPONSE_FEATURES)) counts, zero for non-AI messages
+        order: Indices sorting the messages by created_at string (stable)
+        sessions: SessionIndex of the messages (lazy)
+    """
+
+    def __init__(self, messages: Iterable[Dict[str, Any]]):
+        created_at: List[str] = []
+        roles: List[int] = []
+        lengths: List[int] = []
+        model_codes: List[int] = []
+        chat_codes: List[int] = []
+        features: List[List[int]] = []
+        model_index: Dict[str, int] = {}
+        chat_index: Dict[str, int] = {}
+        empty_features = [0] * len(RESPONSE_FEATURES)
+
+        for msg in messages:
+            content = msg.get("content") or ""
+            role = _role_code(msg.get("role"))
+            chat_id = msg.get("chat_provider_id")
+
+            created_at.append(msg.get("created_at") or "")
+            roles.append(role)
+            stored_length = msg.get("content_length")
+            lengths.append(stored_length if stored_length is not None and not content else len(content))
+            model_codes.append(model_index.setdefault(msg.get("model", "unknown"), len(model_index)))
+            chat_codes.append(chat_index.setdefault(chat_id, len(chat_index)) if chat_id else -1)
+            if role == ROLE_ASSISTANT and chat_id:
+                stored_features = msg.get("response_features")
+                features.append(stored_features if stored_features is not None and not content else extract_response_features(content))
+            else:
+                features.append(empty_features)
+
+        self.created_at = created_at
+        self.roles = np.array(roles, dtype=np.int8)
+        self.content_lengths = np.array(lengths, dtype=np.int64)
+        self.model_codes = np.array(model_codes, dtype=np.int32)
+        self.chat_codes = np.array(chat_codes, dtype=np.int32)
+        self.response_features = np.array(features, dtype=np.int64).reshape(len(created_at), len(RESPONSE_FEATURES))
+        self.models = list(model_index)
+        self.chat_ids = list(chat_index)
+        self.timestamps, self.local_timestamps = _parse_timestamps(created_at)
+        self.order = np.argsort(np.array(created_at, dtype=str), kind="stable") if created_at else np.array([], dtype=np.int64)
+        self._sessions: Optional[SessionIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+    @property
+    def hours(self) -> np.ndarray:
+        """Local hour of day (0-23) per message; only meaningful where timestamps are set."""
+        return (np.nan_to_num(np.floor(self.local_timestamps / 3600)) % 24).astype(np.int64)
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """Local weekday per message (Monday = 0); 1970-01-01 was a Thursday."""
+        return ((np.nan_to_num(np.floor(self.local_timestamps / 86400)) + 3) % 7).astype(np.int64)
+
+    @property
+    def local_days(self) -> np.ndarray:
+        """Local calendar day per message as days since the epoch."""
+        return np.nan_to_num(np.floor(self.local_timestamps / 86400)).astype(np.int64)
+
+    @property
+    def sessions(self) -> SessionIndex:
+        """Session index over the parseable timestamps, built on first access."""
+        if self._sessions is None:
+            valid = np.flatnonzero(~np.isnan(self.timestamps))
+            by_time = valid[np.argsort(self.timestamps[valid], kind="stable")]
+            self._sessions = SessionIndex(self.timestamps[by_time], self.local_days[by_time])
+        return self._sessions
+
+    def feature(self, name: str) -> np.ndarray:
+        """Column of ``response_features`` by name."""
+        return self.response_features[:, RESPONSE_FEATURES.index(name)]
+
+
+def as_message_frame(messages: Union[MessageFrame, List[Dict[str, Any]]]) -> MessageFrame:
+    """Return ``messages`` as a MessageFrame, building one from dicts if needed."""
+    if isinstance(messages, MessageFrame):
+        return messages
+    return MessageFrame(messages or [])
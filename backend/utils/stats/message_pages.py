@@ -0,0 +1,156 @@
+"""
+Keyset-paginated, column-projected reads of a user's rows.
+
+PostgREST returns a whole result set in one response, so selecting a user's
+full message history loads every row (and every message body) at once. The
+iterators here page through the table ordered by ``id`` and fetch the next
+page with ``id > last_id``, which keeps each query on the primary key index
+and bounds peak memory by the page size instead of the history size.
+
+``aiter_user_rows`` is the same pager for the shared AsyncClient used by the
+request handlers; the sync versions serve the stats pool workers.
+``iter_frame_rows`` reads what MessageFrame needs without message bodies,
+except for rows saved before the stats columns existed.
+"""
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from supabase import AsyncClient, Client
+from utils.stats.message_fields import has_message_fields
+
+STATS_PAGE_SIZE = int(os.getenv("STATS_PAGE_SIZE", "1000"))
+
+# Columns MessageFrame needs; content-derived values come from the stored stats columns
+FRAME_COLUMNS = ["chat_provider_id", "role", "content_length", "response_features", "created_at", "model"]
+# Ids per content request for rows without stats columns (bounded by URL length)
+LEGACY_CONTENT_CHUNK = 200
+
+# Columns the rollup aggregation needs
+ROLLUP_COLUMNS = [
+    "role", "content", "estimated_tokens", "created_at",
+    "parent_message_provider_id", "message_provider_id", "model"
+]
+
+
+def _page_query(supabase, table, user_id, columns, page_size, created_from, created_before, last_id, max_id=None):
+    projection = ", ".join(["id"] + [column for column in columns if column != "id"])
+    query = supabase.table(table).select(projection).eq("user_id", user_id)
+    if created_from:
+        query = query.gte("created_at", created_from)
+    if created_before:
+        query = query.lt("created_at", created_before)
+    if last_id is not None:
+        query = query.gt("id", last_id)
+    if max_id is not None:
+        query = query.lte("id", max_id)
+    return query.order("id").limit(page_size)
+
+
+def iter_user_rows(
+    supabase: Client,
+    table: str,
+    user_id: str,
+    columns: List[str],
+    page_size: int = STATS_PAGE_SIZE,
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None,
+    max_id: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield a user's rows of ``table`` one page at a time.
+
+    Args:
+        supabase: Supabase client
+        table: Table name (must have an ordered ``id`` primary key)
+        user_id: Owner of the rows
+        columns: Columns to select; ``id`` is added for the keyset cursor
+        page_size: Rows fetched per request
+        created_from: Only rows with created_at >= this ISO timestamp
+        created_before: Only rows with created_at < this ISO timestamp
+        max_id: Only rows with id <= this
+
+    Yields:
+        Row dictionaries in ``id`` order
+    """
+    last_id = None
+    while True:
+        query = _page_query(supabase, table, user_id, columns, page_size, created_from, created_before, last_id, max_id)
+        page = query.execute().data or []
+        yield from page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def iter_user_messages(
+    supabase: Client,
+    user_id: str,
+    columns: List[str] = FRAME_COLUMNS,
+    page_size: int = STATS_PAGE_SIZE,
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield a user's messages page by page with only ``columns`` selected."""
+    return iter_user_rows(supabase, "messages", user_id, columns, page_size, created_from, created_before)
+
+
+def iter_frame_rows(
+    supabase: Client,
+    user_id: str,
+    page_size: int = STATS_PAGE_SIZE,
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield a user's messages with FRAME_COLUMNS selected.
+
+    Rows saved before the stats columns existed are yielded last, re-read
+    with their content so MessageFrame can measure it.
+    """
+    legacy_ids = []
+    for row in iter_user_messages(supabase, user_id, FRAME_COLUMNS, page_size, created_from, created_before):
+        if has_message_fields(row):
+            yield row
+        else:
+            legacy_ids.append(row["id"])
+
+    projection = ", ".join(["id", "content"] + FRAME_COLUMNS)
+    for i in range(0, len(legacy_ids), LEGACY_CONTENT_CHUNK):
+        rows = supabase.table("messages").select(projection) \
+            .in_("id", legacy_ids[i:i + LEGACY_CONTENT_CHUNK]) \
+            .execute().data or []
+        yield from rows
+
+
+async def aiter_user_rows(
+    supabase: AsyncClient,
+    table: str,
+    user_id: str,
+    columns: List[str],
+    page_size: int = STATS_PAGE_SIZE,
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None,
+    max_id: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async counterpart of iter_user_rows for the shared AsyncClient."""
+    last_id = None
+    while True:
+        query = _page_query(supabase, table, user_id, columns, page_size, created_from, created_before, last_id, max_id)
+        page = (await query.execute()).data or []
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def aiter_user_messages(
+    supabase: AsyncClient,
+    user_id: str,
+    columns: List[str] = FRAME_COLUMNS,
+    page_size: int = STATS_PAGE_SIZE,
+    created_from: Optional[str] = None,
+    created_before: Optional[str] = None,
+    max_id: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async counterpart of iter_user_messages."""
+    return aiter_user_rows(supabase, "messages", user_id, columns, page_size, created_from, created_before, max_id)
@@ -0,0 +1,661 @@
+"""
+Incremental per-user, per-day stats rollups.
+
+Each row of the ``user_stats_daily`` table aggregates one user's activity for
+one calendar day (UTC, taken from the ``created_at`` prefix like the rest of
+the stats code):
+
+    user_id, day, message_count, user_message_count, assistant_message_count,
+    input_tokens, output_tokens, chat_count, thinking_time_total,
+    thinking_time_count, model_usage (jsonb), hourly_messages (jsonb),
+    hourly_chats (jsonb), updated_at
+
+with a unique constraint on ``(user_id, day)``. The hourly columns map the
+UTC hour ("00".."23") to a count, so hour-level series can be served from
+the same rows. The ``/save`` handlers fold newly written rows into it, so
+the stats endpoints only read O(days) rows instead of the user's full
+message history, whatever time window they report on.
+
+Saves for the same user run concurrently (parallel /save calls, the
+/save/batch writes, the ingestion queue flusher), so deltas are never merged
+in Python: ``apply_stats_deltas`` adds them onto the stored rows in one
+statement, inserting the days that have no row yet:
+
+    create or replace function jsonb_add_counts(a jsonb, b jsonb)
+    returns jsonb
+    language plpgsql immutable as $$
+    begin
+        return (
+            select coalesce(jsonb_object_agg(k, case
+                when jsonb_typeof(coalesce(a -> k, b -> k)) = 'object'
+                    then jsonb_add_counts(a -> k, b -> k)
+                else to_jsonb(coalesce((a ->> k)::numeric, 0) + coalesce((b ->> k)::numeric, 0))
+            end), '{}'::jsonb)
+            from (
+                select jsonb_object_keys(coalesce(a, '{}'))
+                union
+                select jsonb_object_keys(coalesce(b, '{}'))
+            ) keys(k)
+        );
+    end;
+    $$;
+
+    create or replace function apply_stats_deltas(p_rows jsonb)
+    returns setof user_stats_daily
+    language sql as $$
+        insert into user_stats_daily as s (
+            user_id, day, message_count, user_message_count, assistant_message_count,
+            input_tokens, output_tokens, chat_count, thinking_time_total,
+            thinking_time_count, model_usage, hourly_messages, hourly_chats, updated_at
+        )
+        select user_id, day, message_count, user_message_count, assistant_message_count,
+               input_tokens, output_tokens, chat_count, thinking_time_total,
+               thinking_time_count, model_usage, hourly_messages, hourly_chats, now()
+        from jsonb_populate_recordset(null::user_stats_daily, p_rows)
+        on conflict (user_id, day) do update set
+            message_count = s.message_count + excluded.message_count,
+            user_message_count = s.user_message_count + excluded.user_message_count,
+            assistant_message_count = s.assistant_message_count + excluded.assistant_message_count,
+            input_tokens = s.input_tokens + excluded.input_tokens,
+            output_tokens = s.output_tokens + excluded.output_tokens,
+            chat_count = s.chat_count + excluded.chat_count,
+            thinking_time_total = round((s.thinking_time_total + excluded.thinking_time_total)::numeric, 3),
+            thinking_time_count = s.thinking_time_count + excluded.thinking_time_count,
+            model_usage = jsonb_add_counts(s.model_usage, excluded.model_usage),
+            hourly_messages = jsonb_add_counts(s.hourly_messages, excluded.hourly_messages),
+            hourly_chats = jsonb_add_counts(s.hourly_chats, excluded.hourly_chats),
+            updated_at = now()
+        returning s.*;
+    $$;
+
+Users whose history predates the rollups are backfilled once. The backfill
+folds the user's messages and chats up to an id cutoff, and
+``backfill_stats_rollups`` records that cutoff and adds the rows in the same
+transaction; a concurrent backfill of the same user loses on the primary key
+and writes nothing. Saves never overwrite rows: they fold only the messages
+and chats above the recorded cutoff, so every row is counted exactly once
+whichever of the backfill and a concurrent save commits first:
+
+    create table if not exists user_stats_backfills (
+        user_id uuid primary key,
+        message_id_cutoff bigint not null,
+        chat_id_cutoff bigint not null,
+        created_at timestamptz not null default now()
+    );
+
+    -- Users whose rollups were already maintained before the backfill table
+    insert into user_stats_backfills (user_id, message_id_cutoff, chat_id_cutoff)
+    select distinct user_id, 0, 0 from user_stats_daily
+    on conflict do nothing;
+
+    create or replace function backfill_stats_rollups(p_user_id uuid, p_message_id_cutoff bigint,
+                                                      p_chat_id_cutoff bigint, p_rows jsonb)
+    returns boolean
+    language plpgsql as $$
+    begin
+        insert into user_stats_backfills (user_id, message_id_cutoff, chat_id_cutoff)
+        values (p_user_id, p_message_id_cutoff, p_chat_id_cutoff)
+        on conflict (user_id) do nothing;
+        if not found then
+            return false;
+        end if;
+        perform apply_stats_deltas(p_rows);
+        return true;
+    end;
+    $$;
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from supabase import AsyncClient
+from utils.stats.estimate_tokens import get_message_tokens
+from utils.stats.message_pages import aiter_user_messages, aiter_user_rows, ROLLUP_COLUMNS
+
+ROLLUP_TABLE = "user_stats_daily"
+BACKFILL_TABLE = "user_stats_backfills"
+
+# Only parent -> response gaps in this range count as "thinking time"
+MIN_THINKING_TIME = 0.1
+MAX_THINKING_TIME = 60
+
+COUNTER_FIELDS = [
+    "message_count",
+    "user_message_count",
+    "assistant_message_count",
+    "input_tokens",
+    "output_tokens",
+    "chat_count",
+    "thinking_time_count",
+]
+
+HOURLY_FIELDS = ["hourly_messages", "hourly_chats"]
+
+GRANULARITIES = ("hour", "day", "week")
+
+# Hour buckets are zero-filled, so cap the window they may span
+MAX_HOURLY_WINDOW_DAYS = 31
+
+# Default window of the per-bucket series (today and the 6 days before)
+DEFAULT_WINDOW_DAYS = 7
+
+
+def _empty_rollup(user_id: str, day: str) -> Dict[str, Any]:
+    rollup = {"user_id": user_id, "day": day, "thinking_time_total": 0.0, "model_usage": {}}
+    for field in HOURLY_FIELDS:
+        rollup[field] = {}
+    for field in COUNTER_FIELDS:
+        rollup[field] = 0
+    return rollup
+
+
+def _day_of(created_at: Optional[str]) -> Optional[str]:
+    if not created_at:
+        return None
+    return created_at.split('T')[0]
+
+
+def _hour_of(created_at: str) -> Optional[str]:
+    hour = created_at[11:13]
+    return hour if hour.isdigit() else None
+
+
+def _count_hour(rollup: Dict[str, Any], field: str, created_at: str):
+    hour = _hour_of(created_at)
+    if hour:
+        rollup[field][hour] = rollup[field].get(hour, 0) + 1
+
+
+def _parse_timestamp(created_at: str) -> datetime:
+    return datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+
+
+def aggregate_messages_by_day(
+    user_id: str,
+    messages: Iterable[Dict[str, Any]],
+    parent_timestamps: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate message rows into per-day rollup deltas.
+
+    ``messages`` is consumed in a single pass, so it can be a paginated
+    generator; only message ids and timestamps are kept around to resolve
+    responses whose parent arrives later in the stream.
+
+    Args:
+        user_id: Owner of the messages
+        messages: Message rows (role, content, model, created_at, ...)
+        parent_timestamps: created_at of parent messages that are not part of
+            ``messages``, keyed by message_provider_id
+
+    Returns:
+        Dict mapping day (YYYY-MM-DD) to a rollup delta row
+    """
+    timestamps = dict(parent_timestamps or {})
+    pending_thinking: List[Tuple[str, str, str]] = []
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for msg in messages:
+        _fold_message(deltas, timestamps, pending_thinking, user_id, msg)
+    _resolve_thinking_time(deltas, timestamps, pending_thinking)
+    return deltas
+
+
+def _fold_message(
+    deltas: Dict[str, Dict[str, Any]],
+    timestamps: Dict[str, str],
+    pending_thinking: List[Tuple[str, str, str]],
+    user_id: str,
+    msg: Dict[str, Any]
+):
+    """Add one message row to ``deltas``; responses are queued for thinking time."""
+    if msg.get("message_provider_id") and msg.get("created_at"):
+        timestamps[msg["message_provider_id"]] = msg["created_at"]
+
+    day = _day_of(msg.get("created_at"))
+    if not day:
+        return
+    rollup = deltas.setdefault(day, _empty_rollup(user_id, day))
+
+    model = msg.get("model", "unknown")
+    tokens = get_message_tokens(msg)
+    model_stats = rollup["model_usage"].setdefault(
+        model, {"count": 0, "input_tokens": 0, "output_tokens": 0}
+    )
+    model_stats["count"] += 1
+    rollup["message_count"] += 1
+    _count_hour(rollup, "hourly_messages", msg["created_at"])
+
+    if msg.get("role") == "user":
+        rollup["user_message_count"] += 1
+        rollup["input_tokens"] += tokens
+        model_stats["input_tokens"] += tokens
+    else:
+        if msg.get("role") == "assistant":
+            rollup["assistant_message_count"] += 1
+        rollup["output_tokens"] += tokens
+        model_stats["output_tokens"] += tokens
+
+    parent_id = msg.get("parent_message_provider_id")
+    if msg.get("role") == "assistant" and parent_id:
+        pending_thinking.append((day, msg["created_at"], parent_id))
+
+
+def _resolve_thinking_time(
+    deltas: Dict[str, Dict[str, Any]],
+    timestamps: Dict[str, str],
+    pending_thinking: List[Tuple[str, str, str]]
+):
+    """Thinking time: delay between the parent prompt and each queued response."""
+    for day, created_at, parent_id in pending_thinking:
+        if not timestamps.get(parent_id):
+            continue
+        try:
+            diff = (_parse_timestamp(created_at) - _parse_timestamp(timestamps[parent_id])).total_seconds()
+            if MIN_THINKING_TIME <= diff <= MAX_THINKING_TIME:
+                deltas[day]["thinking_time_total"] += diff
+                deltas[day]["thinking_time_count"] += 1
+        except Exception:
+            pass
+
+
+def aggregate_chats_by_day(user_id: str, chats: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Aggregate chat rows into per-day rollup deltas (chat_count only)."""
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for chat in chats:
+        _fold_chat(deltas, user_id, chat)
+    return deltas
+
+
+def _fold_chat(deltas: Dict[str, Dict[str, Any]], user_id: str, chat: Dict[str, Any]):
+    day = _day_of(chat.get("created_at"))
+    if not day:
+        return
+    rollup = deltas.setdefault(day, _empty_rollup(user_id, day))
+    rollup["chat_count"] += 1
+    _count_hour(rollup, "hourly_chats", chat["created_at"])
+
+
+def _add_into(target: Dict[str, Any], delta: Dict[str, Any]):
+    """Add the counters and model usage of ``delta`` onto ``target`` in place."""
+    for field in COUNTER_FIELDS:
+        target[field] += delta.get(field) or 0
+    target["thinking_time_total"] += delta.get("thinking_time_total") or 0
+    for field in HOURLY_FIELDS:
+        for hour, count in (delta.get(field) or {}).items():
+            target[field][hour] = target[field].get(hour, 0) + count
+
+    model_usage = target["model_usage"]
+    for model, stats in (delta.get("model_usage") or {}).items():
+        current = model_usage.setdefault(model, {"count": 0, "input_tokens": 0, "output_tokens": 0})
+        for key in ("count", "input_tokens", "output_tokens"):
+            current[key] = current.get(key, 0) + stats.get(key, 0)
+
+
+def merge_rollups(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a new rollup row with ``delta`` added onto ``base``."""
+    merged = _empty_rollup(base.get("user_id") or delta.get("user_id"), base.get("day") or delta.get("day"))
+    _add_into(merged, base)
+    _add_into(merged, delta)
+    merged["thinking_time_total"] = round(merged["thinking_time_total"], 3)
+    return merged
+
+
+async def _apply_deltas(supabase: AsyncClient, deltas: Dict[str, Dict[str, Any]]):
+    """
+    Fold per-day deltas into the stored rollups.
+
+    The deltas are added in the database by ``apply_stats_deltas`` (one
+    atomic statement), so concurrent saves of the same user cannot lose each
+    other's increments.
+    """
+    if not deltas:
+        return
+    rows = [merge_rollups({}, delta) for delta in deltas.values()]
+    await supabase.rpc("apply_stats_deltas", {"p_rows": rows}).execute()
+
+
+async def _get_backfill_cutoffs(supabase: AsyncClient, user_id: str) -> Optional[Dict[str, int]]:
+    response = await supabase.table(BACKFILL_TABLE) \
+        .select("message_id_cutoff, chat_id_cutoff") \
+        .eq("user_id", user_id) \
+        .limit(1) \
+        .execute()
+    return response.data[0] if response.data else None
+
+
+async def _ensure_backfilled(supabase: AsyncClient, user_id: str) -> Dict[str, int]:
+    """Backfill the user's rollups if that never happened; return the recorded id cutoffs."""
+    cutoffs = await _get_backfill_cutoffs(supabase, user_id)
+    if cutoffs is None:
+        await backfill_user_rollups(supabase, user_id)
+        # Ours or the one of a concurrent backfill that committed first
+        cutoffs = await _get_backfill_cutoffs(supabase, user_id)
+        if cutoffs is None:
+            raise RuntimeError(f"Stats backfill of user {user_id} was not recorded")
+    return cutoffs
+
+
+def _after_cutoff(rows: List[Dict[str, Any]], cutoff: int) -> List[Dict[str, Any]]:
+    """Rows the backfill did not count (rows without an id were never read by it)."""
+    return [row for row in rows if row.get("id") is None or row["id"] > cutoff]
+
+
+async def _message_deltas(supabase: AsyncClient, user_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    # Parent prompts saved in an earlier request are needed for thinking time
+    batch_ids = {m.get("message_provider_id") for m in messages}
+    parent_ids = list({
+        m["parent_message_provider_id"] for m in messages
+        if m.get("role") == "assistant"
+        and m.get("parent_message_provider_id")
+        and m["parent_message_provider_id"] not in batch_ids
+    })
+    parent_timestamps = {}
+    if parent_ids:
+        parents = await supabase.table("messages").select("message_provider_id, created_at") \
+            .eq("user_id", user_id) \
+            .in_("message_provider_id", parent_ids) \
+            .execute()
+        parent_timestamps = {
+            p["message_provider_id"]: p["created_at"]
+            for p in parents.data or [] if p.get("created_at")
+        }
+    return aggregate_messages_by_day(user_id, messages, parent_timestamps)
+
+
+async def update_message_rollups(supabase: AsyncClient, user_id: str, messages: List[Dict[str, Any]]):
+    """Like apply_message_rollups, but raises on failure so the caller can retry."""
+    if not messages:
+        return
+    cutoffs = await _ensure_backfilled(supabase, user_id)
+    messages = _after_cutoff(messages, cutoffs["message_id_cutoff"])
+    if messages:
+        await _apply_deltas(supabase, await _message_deltas(supabase, user_id, messages))
+
+
+async def apply_message_rollups(supabase: AsyncClient, user_id: str, messages: List[Dict[str, Any]]):
+    """
+    Update the rollups with freshly inserted messages.
+
+    Args:
+        supabase: Supabase client
+        user_id: User ID
+        messages: Inserted message rows
+    """
+    try:
+        await update_message_rollups(supabase, user_id, messages)
+    except Exception as e:
+        # Rollups are derived data: never fail the write because of them
+        print(f"Error updating message rollups for user {user_id}: {str(e)}")
+
+
+async def apply_chat_rollups(supabase: AsyncClient, user_id: str, chats: List[Dict[str, Any]]):
+    """
+    Update the rollups with freshly inserted chats.
+
+    Args:
+        supabase: Supabase client
+        user_id: User ID
+        chats: Inserted chat rows
+    """
+    if not chats:
+        return
+    try:
+        cutoffs = await _ensure_backfilled(supabase, user_id)
+        chats = _after_cutoff(chats, cutoffs["chat_id_cutoff"])
+        await _apply_deltas(supabase, aggregate_chats_by_day(user_id, chats))
+    except Exception as e:
+        print(f"Error updating chat rollups for user {user_id}: {str(e)}")
+
+
+async def apply_batch_rollups(supabase: AsyncClient, user_id: str,
+                              messages: List[Dict[str, Any]], chats: List[Dict[str, Any]]):
+    """
+    Update the rollups with the messages and chats inserted by one batch.
+
+    Both are folded into the same deltas, so the batch costs a single
+    apply_stats_deltas call.
+
+    Args:
+        supabase: Supabase client
+        user_id: User ID
+        messages: Inserted message rows
+        chats: Inserted chat rows
+    """
+    if not messages and not chats:
+        return
+    try:
+        cutoffs = await _ensure_backfilled(supabase, user_id)
+        messages = _after_cutoff(messages, cutoffs["message_id_cutoff"])
+        deltas = await _message_deltas(supabase, user_id, messages) if messages else {}
+        for chat in _after_cutoff(chats, cutoffs["chat_id_cutoff"]):
+            _fold_chat(deltas, user_id, chat)
+        await _apply_deltas(supabase, deltas)
+    except Exception as e:
+        print(f"Error updating batch rollups for user {user_id}: {str(e)}")
+
+
+async def _max_id(supabase: AsyncClient, table: str, user_id: str) -> int:
+    response = await supabase.table(table).select("id") \
+        .eq("user_id", user_id) \
+        .order("id", desc=True) \
+        .limit(1) \
+        .execute()
+    return response.data[0]["id"] if response.data else 0
+
+
+async def backfill_user_rollups(supabase: AsyncClient, user_id: str) -> bool:
+    """
+    Compute the rollups of a user's existing history from the raw messages
+    and chats tables and add them, once, with ``backfill_stats_rollups``.
+
+    Only rows up to the current max ids are folded; later rows are counted by
+    the saves that insert them. Runs at the user's first save or stats read
+    after the rollups were introduced; afterwards the rows are maintained
+    incrementally.
+
+    Returns:
+        False if a concurrent backfill of the same user was recorded first
+        (nothing is written then)
+    """
+    message_id_cutoff = await _max_id(supabase, "messages", user_id)
+    chat_id_cutoff = await _max_id(supabase, "chats", user_id)
+
+    # Folded page by page, so only one page of message bodies is in memory
+    deltas: Dict[str, Dict[str, Any]] = {}
+    timestamps: Dict[str, str] = {}
+    pending_thinking: List[Tuple[str, str, str]] = []
+    async for msg in aiter_user_messages(supabase, user_id, ROLLUP_COLUMNS, max_id=message_id_cutoff):
+        _fold_message(deltas, timestamps, pending_thinking, user_id, msg)
+    _resolve_thinking_time(deltas, timestamps, pending_thinking)
+    async for chat in aiter_user_rows(supabase, "chats", user_id, ["created_at"], max_id=chat_id_cutoff):
+        _fold_chat(deltas, user_id, chat)
+
+    rows = [merge_rollups({}, deltas[day]) for day in sorted(deltas)]
+    response = await supabase.rpc("backfill_stats_rollups", {
+        "p_user_id": user_id,
+        "p_message_id_cutoff": message_id_cutoff,
+        "p_chat_id_cutoff": chat_id_cutoff,
+        "p_rows": rows
+    }).execute()
+    return bool(response.data)
+
+
+async def _fetch_rollups(supabase: AsyncClient, user_id: str) -> List[Dict[str, Any]]:
+    response = await supabase.table(ROLLUP_TABLE).select("*") \
+        .eq("user_id", user_id) \
+        .order("day") \
+        .execute()
+    return response.data or []
+
+
+async def get_user_rollups(supabase: AsyncClient, user_id: str) -> List[Dict[str, Any]]:
+    """Fetch a user's daily rollups, backfilling them on first access."""
+    rollups = await _fetch_rollups(supabase, user_id)
+    if rollups or await _get_backfill_cutoffs(supabase, user_id) is not None:
+        return rollups
+    await _ensure_backfilled(supabase, user_id)
+    return await _fetch_rollups(supabase, user_id)
+
+
+def resolve_window(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    current_date: Optional[datetime] = None
+) -> Tuple[date, date]:
+    """
+    Resolve the inclusive day range a stats request reports on.
+
+    Args:
+        start: First day (defaults to DEFAULT_WINDOW_DAYS - 1 days before ``end``)
+        end: Last day (defaults to today)
+        granularity: One of GRANULARITIES
+        current_date: Reference "now" (defaults to datetime.now())
+
+    Returns:
+        (start, end) dates
+
+    Raises:
+        ValueError: If the granularity is unknown or the range is invalid
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity '{granularity}', expected one of {', '.join(GRANULARITIES)}")
+    end = end or (current_date or datetime.now()).date()
+    start = start or end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    if granularity == "hour" and (end - start).days + 1 > MAX_HOURLY_WINDOW_DAYS:
+        raise ValueError(f"Hourly stats are limited to {MAX_HOURLY_WINDOW_DAYS} days")
+    return start, end
+
+
+def _bucket_keys(day: date, granularity: str) -> List[str]:
+    if granularity == "hour":
+        return [f"{day.isoformat()}T{hour:02d}:00" for hour in range(24)]
+    if granularity == "week":
+        return [(day - timedelta(days=day.weekday())).isoformat()]
+    return [day.isoformat()]
+
+
+def bucket_rollups(
+    rows_by_day: Dict[str, Dict[str, Any]],
+    start: date,
+    end: date,
+    granularity: str = "day"
+) -> Dict[str, Dict[str, int]]:
+    """
+    Message and chat counts per time bucket over ``[start, end]``.
+
+    Buckets are zero-filled and keyed by ``YYYY-MM-DDTHH:00`` (hour),
+    ``YYYY-MM-DD`` (day) or the Monday of the ISO week (week).
+    """
+    messages: Dict[str, int] = {}
+    chats: Dict[str, int] = {}
+    day = start
+    while day <= end:
+        row = rows_by_day.get(day.isoformat(), {})
+        for key in _bucket_keys(day, granularity):
+            messages.setdefault(key, 0)
+            chats.setdefault(key, 0)
+        if granularity == "hour":
+            for hour, count in (row.get("hourly_messages") or {}).items():
+                messages[f"{day.isoformat()}T{hour}:00"] += count
+            for hour, count in (row.get("hourly_chats") or {}).items():
+                chats[f"{day.isoformat()}T{hour}:00"] += count
+        else:
+            key = _bucket_keys(day, granularity)[0]
+            messages[key] += row.get("message_count") or 0
+            chats[key] += row.get("chat_count") or 0
+        day += timedelta(days=1)
+    return {"messages": messages, "chats": chats}
+
+
+def summarize_rollups(
+    rollups: List[Dict[str, Any]],
+    current_date: Optional[datetime] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day"
+) -> Dict[str, Any]:
+    """
+    Build the basic stats block from daily rollups.
+
+    Without ``start``/``end`` the "recent" figures cover the last 7 days and
+    the per-day series the last 7 calendar days, as before. With a window,
+    both cover exactly ``[start, end]``.
+
+    Args:
+        rollups: Daily rollup rows of a single user
+        current_date: Reference "now" (defaults to datetime.now())
+        start: First day of the reporting window
+        end: Last day of the reporting window
+        granularity: Bucket size of the ``activity`` series (hour, day, week)
+
+    Returns:
+        Dictionary with chat/message counts, per-day counts, bucketed
+        activity, token usage, thinking time and model usage
+    """
+    current_date = current_date or datetime.now()
+    custom_window = start is not None or end is not None
+    window_start, window_end = resolve_window(start, end, granularity, current_date)
+    start_str, end_str = window_start.isoformat(), window_end.isoformat()
+    if custom_window:
+        recent_from, recent_to = start_str, end_str
+    else:
+        recent_from, recent_to = (current_date - timedelta(days=7)).strftime('%Y-%m-%d'), None
+
+    # One pass over the days, accumulating in place; the recent window is a
+    # plain comparison against the precomputed boundary days
+    total = _empty_rollup(None, None)
+    recent = _empty_rollup(None, None)
+    rows_by_day: Dict[str, Dict[str, Any]] = {}
+    for row in rollups:
+        day = str(row.get("day"))[:10]
+        _add_into(total, row)
+        if day >= recent_from and (recent_to is None or day <= recent_to):
+            _add_into(recent, row)
+        if start_str <= day <= end_str:
+            rows_by_day[day] = row
+
+    daily = bucket_rollups(rows_by_day, window_start, window_end, "day")
+    # Newest day first, like the dashboard has always received it
+    messages_per_day = dict(sorted(daily["messages"].items(), reverse=True))
+    chats_per_day = daily["chats"]
+    activity = daily if granularity == "day" else bucket_rollups(rows_by_day, window_start, window_end, granularity)
+
+    total_messages = total["message_count"]
+    total_chats = total["chat_count"]
+
+    if total["thinking_time_count"]:
+        avg_thinking_time = round(total["thinking_time_total"] / total["thinking_time_count"], 2)
+        total_thinking_time = round(total["thinking_time_total"], 2)
+    else:
+        avg_thinking_time = 2.5
+        total_thinking_time = round(avg_thinking_time * total_messages, 2)
+
+    return {
+        "total_chats": total_chats,
+        "recent_chats": recent["chat_count"],
+        "total_messages": total_messages,
+        "avg_messages_per_chat": round(total_messages / total_chats, 2) if total_chats else 0,
+        "messages_per_day": messages_per_day,
+        "chats_per_day": chats_per_day,
+        "activity": {
+            "from": start_str,
+            "to": end_str,
+            "granularity": granularity,
+            "messages": activity["messages"],
+            "chats": activity["chats"]
+        },
+        "token_usage": {
+            "recent": recent["input_tokens"] + recent["output_tokens"],
+            "recent_input": recent["input_tokens"],
+            "recent_output": recent["output_tokens"],
+            "total": total["input_tokens"] + total["output_tokens"],
+            "total_input": total["input_tokens"],
+            "total_output": total["output_tokens"]
+        },
+        "thinking_time": {
+            "average": avg_thinking_time,
+            "total": total_thinking_time
+        },
+        "model_usage": total["model_usage"]
+    }
@@ -0,0 +1,92 @@
+"""
+Session index built in a single sweep over sorted message timestamps.
+
+A session is a run of messages where no two consecutive messages are more
+than SESSION_GAP_SECONDS apart. The index is computed once per frame and can
+be queried by any analytics (usage patterns, cadence, insights) without
+re-deriving the sessions from the raw messages.
+"""
+from typing import Dict, Optional
+import numpy as np
+
+# Gaps longer than 30 minutes start a new session
+SESSION_GAP_SECONDS = 1800
+
+
+class SessionIndex:
+    """
+    Sessions of a user's activity.
+
+    Attributes:
+        starts: Epoch seconds of each session's first message
+        ends: Epoch seconds of each session's last message
+        message_counts: Number of messages in each session
+        start_days: Local calendar day (days since epoch) each session started on
+    """
+
+    def __init__(self, timestamps: np.ndarray, local_days: Optional[np.ndarray] = None,
+                 gap_seconds: float = SESSION_GAP_SECONDS):
+        """
+        Args:
+            timestamps: Epoch seconds sorted ascending, without NaN
+            local_days: Local calendar day of each timestamp (defaults to UTC days)
+            gap_seconds: Inactivity gap that closes a session
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if local_days is None:
+            local_days = np.floor(timestamps / 86400).astype(np.int64)
+
+        # One sweep: every gap above the threshold closes a session
+        first_indices = np.concatenate(([0], np.flatnonzero(np.diff(timestamps) > gap_seconds) + 1)) \
+            if len(timestamps) else np.array([], dtype=np.int64)
+        last_indices = np.concatenate((first_indices[1:] - 1, [len(timestamps) - 1])) \
+            if len(timestamps) else np.array([], dtype=np.int64)
+
+        self.gap_seconds = gap_seconds
+        self.starts = timestamps[first_indices]
+        self.ends = timestamps[last_indices]
+        self.message_counts = last_indices - first_indices + 1
+        self.start_days = np.asarray(local_days)[first_indices]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def durations(self) -> np.ndarray:
+        """Duration of each session in minutes."""
+        return (self.ends - self.starts) / 60
+
+    @property
+    def span_days(self) -> int:
+        """Whole days between the first and the last message, inclusive."""
+        if not len(self):
+            return 0
+        return int((self.ends[-1] - self.starts[0]) // 86400) + 1
+
+    def active_days(self) -> int:
+        """Number of distinct days on which at least one session started."""
+        return len(np.unique(self.start_days))
+
+    def sessions_per_day(self) -> Dict[int, int]:
+        """Number of sessions started per local day (days since epoch)."""
+        days, counts = np.unique(self.start_days, return_counts=True)
+        return {int(day): int(count) for day, count in zip(days, counts)}
+
+    def between(self, start: float, end: float) -> "SessionIndex":
+        """Sessions that started within [start, end) (epoch seconds)."""
+        mask = (self.starts >= start) & (self.starts < end)
+        subset = SessionIndex.__new__(SessionIndex)
+        subset.gap_seconds = self.gap_seconds
+        subset.starts = self.starts[mask]
+        subset.ends = self.ends[mask]
+        subset.message_counts = self.message_counts[mask]
+        subset.start_days = self.start_days[mask]
+        return subset
+
+    def stats(self) -> Dict[str, float]:
+        """Average duration (minutes) and message count, plus number of sessions."""
+        return {
+            "avg_duration": round(np.mean(self.durations), 2) if len(self) else 0,
+            "avg_messages": round(np.mean(self.message_counts), 2) if len(self) else 0,
+            "count": len(self)
+        }
@@ -0,0 +1,141 @@
+"""
+Per-user cache of computed stats responses.
+
+The extension polls the stats endpoints far more often than the user's data
+changes. Results are cached per user and request parameters together with
+the user's data version: the ``/save`` handlers bump that version on each
+write, which drops the user's cached results, and a result computed from an
+older version is never stored. Entries also expire after STATS_CACHE_TTL
+seconds, which bounds staleness for writes handled by other worker processes.
+
+Users are kept in LRU order and evicted with all their results and their
+version, so memory stays bounded by STATS_CACHE_SIZE. An evicted (or never
+seen) user reports the latest version issued at the last eviction, which is
+newer than any version an in-flight computation could have read for them.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "1000"))
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "60"))
+
+
+class _UserStats:
+    __slots__ = ("version", "results")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+
+_stats_cache: "OrderedDict[str, _UserStats]" = OrderedDict()
+_stats_cache_lock = threading.Lock()
+_stats_cache_size = 0
+_last_version = 0
+_evicted_version = 0
+_stats_cache_hits = 0
+_stats_cache_misses = 0
+_stats_cache_invalidations = 0
+
+
+def _evict_locked():
+    global _stats_cache_size, _evicted_version
+    while _stats_cache and (_stats_cache_size > STATS_CACHE_SIZE or len(_stats_cache) > STATS_CACHE_SIZE):
+        _, user = _stats_cache.popitem(last=False)
+        _stats_cache_size -= len(user.results)
+        _evicted_version = _last_version
+
+
+def get_user_data_version(user_id: str) -> int:
+    """Current data version of a user."""
+    with _stats_cache_lock:
+        user = _stats_cache.get(user_id)
+        return user.version if user is not None else _evicted_version
+
+
+def bump_user_data_version(user_id: str) -> int:
+    """
+    Mark a user's data as changed, invalidating their cached stats.
+
+    Returns:
+        The new data version
+    """
+    global _stats_cache_invalidations, _stats_cache_size, _last_version
+    with _stats_cache_lock:
+        _last_version += 1
+        user = _stats_cache.get(user_id)
+        if user is None:
+            user = _stats_cache[user_id] = _UserStats(_last_version)
+        else:
+            _stats_cache_invalidations += len(user.results)
+            _stats_cache_size -= len(user.results)
+            user.results.clear()
+            user.version = _last_version
+        _stats_cache.move_to_end(user_id)
+        _evict_locked()
+        return _last_version
+
+
+def get_cached_stats(user_id: str, params: Hashable = None) -> Optional[Any]:
+    """
+    Return the cached stats of a user for ``params``, or None on a miss.
+
+    Args:
+        user_id: User ID
+        params: Hashable description of the request (window, granularity, ...)
+    """
+    global _stats_cache_hits, _stats_cache_misses, _stats_cache_size
+    with _stats_cache_lock:
+        user = _stats_cache.get(user_id)
+        entry = user.results.get(params) if user is not None else None
+        if entry is not None and entry[0] > time.monotonic():
+            _stats_cache.move_to_end(user_id)
+            _stats_cache_hits += 1
+            return entry[1]
+        if entry is not None:
+            del user.results[params]
+            _stats_cache_size -= 1
+        _stats_cache_misses += 1
+    return None
+
+
+def set_cached_stats(user_id: str, value: Any, params: Hashable = None, version: Optional[int] = None):
+    """
+    Cache a computed stats result.
+
+    Args:
+        user_id: User ID
+        value: Result to cache
+        params: Same ``params`` as passed to get_cached_stats
+        version: Data version the result was computed from; results computed
+            before a concurrent write are dropped instead of cached
+    """
+    global _stats_cache_size
+    with _stats_cache_lock:
+        user = _stats_cache.get(user_id)
+        current = user.version if user is not None else _evicted_version
+        if version is not None and version != current:
+            return
+        if user is None:
+            user = _stats_cache[user_id] = _UserStats(current)
+        if params not in user.results:
+            _stats_cache_size += 1
+        user.results[params] = (time.monotonic() + STATS_CACHE_TTL, value)
+        _stats_cache.move_to_end(user_id)
+        _evict_locked()
+
+
+def get_stats_cache_info() -> Dict[str, Any]:
+    """Return hit/miss/invalidation counters and current size of the stats cache."""
+    return {
+        "hits": _stats_cache_hits,
+        "misses": _stats_cache_misses,
+        "invalidations": _stats_cache_invalidations,
+        "size": _stats_cache_size,
+        "users": len(_stats_cache),
+        "max_size": STATS_CACHE_SIZE,
+        "ttl_seconds": STATS_CACHE_TTL
+    }
@@ -0,0 +1,84 @@
+"""
+Application-scoped async Supabase client.
+
+One AsyncClient is created when the app starts (see the lifespan hook in
+main.py) and shared by every router. Reusing it keeps the underlying HTTP
+connections alive between requests instead of opening new ones per module or
+per call, and its awaitable ``.execute()`` never blocks the event loop.
+
+Handlers receive it with ``supabase: AsyncClient = Depends(get_supabase)``;
+code outside a request (middleware, services) calls ``get_supabase()``.
+
+Session-creating auth calls (sign in/up, refresh, OTP) must never run on the
+shared client: on SIGNED_IN/TOKEN_REFRESHED it swaps its Authorization header
+for the user's access token, so every later query of every router would run
+as that user instead of the service role. The /auth routes use
+``Depends(get_supabase_auth)`` instead, which gives each request its own
+session-less auth client over a shared connection pool.
+"""
+import os
+from typing import Optional
+import dotenv
+import httpx
+from supabase import acreate_client, AsyncClient
+from supabase_auth import AsyncGoTrueClient
+
+dotenv.load_dotenv()
+
+_client: Optional[AsyncClient] = None
+_auth_http_client: Optional[httpx.AsyncClient] = None
+
+
+async def init_supabase() -> AsyncClient:
+    """Create the shared client (idempotent)."""
+    global _client, _auth_http_client
+    if _client is None:
+        _client = await acreate_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+    if _auth_http_client is None:
+        _auth_http_client = httpx.AsyncClient(follow_redirects=True, http2=True)
+    return _client
+
+
+async def close_supabase():
+    """Release the shared client's HTTP connections."""
+    global _client, _auth_http_client
+    client, _client = _client, None
+    auth_http_client, _auth_http_client = _auth_http_client, None
+    if auth_http_client is not None:
+        try:
+            await auth_http_client.aclose()
+        except Exception as e:
+            print(f"Error closing Supabase auth connections: {str(e)}")
+    if client is None:
+        return
+    try:
+        await client.postgrest.aclose()
+    except Exception as e:
+        print(f"Error closing Supabase client: {str(e)}")
+
+
+def get_supabase() -> AsyncClient:
+    """FastAPI dependency returning the shared client."""
+    if _client is None:
+        raise RuntimeError("Supabase client is not initialized; init_supabase() runs in the app lifespan")
+    return _client
+
+
+def get_supabase_auth() -> AsyncGoTrueClient:
+    """
+    FastAPI dependency returning an auth client for this request only.
+
+    It keeps no session between requests (no persistence, no auto-refresh)
+    and is not attached to the shared client, so signing a user in cannot
+    change the credentials of the data queries.
+    """
+    if _auth_http_client is None:
+        raise RuntimeError("Supabase client is not initialized; init_supabase() runs in the app lifespan")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    return AsyncGoTrueClient(
+        url=f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        http_client=_auth_http_client
+    )
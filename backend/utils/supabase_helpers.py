@@ -1,29 +1,60 @@
-from fastapi import Header, HTTPException
-from supabase import create_client, Client
-import dotenv
-import os
+import jwt
+from fastapi import Depends, Header, HTTPException
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.auth.token_verification import (
+    AUTH_LOCAL_VERIFICATION,
+    LocalVerificationUnavailable,
+    verify_access_token,
+    evict_access_token
+)
 
-dotenv.load_dotenv()
-
-# Read Supabase URL and API Key from .env file
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-
-def get_user_from_session_token(authorization: str = Header(None)):
-    """Extract user ID from Supabase JWT token."""
+def _bearer_token(authorization: str) -> str:
     if not authorization or not authorization.startswith("Bearer "):
         print("Missing or invalid Authorization Header")
         raise HTTPException(status_code=403, detail="Missing or invalid Authorization Header")
+    return authorization.split(" ")[1]
 
-    token = authorization.split(" ")[1]
+async def _get_user_id_remote(supabase: AsyncClient, token: str) -> str:
+    """Validate the token with the auth server (sees revoked sessions)."""
     try:
-        user_info = supabase.auth.get_user(token)
-        if not user_info or not user_info.user:
-            raise HTTPException(status_code=403, detail="Invalid token")
-        return user_info.user.id
+        user_info = await supabase.auth.get_user(token)
     except Exception as e:
         print("Error validating token:", str(e))
         raise HTTPException(status_code=500, detail=f"Error validating token: {str(e)}")
+    if not user_info or not user_info.user:
+        evict_access_token(token)
+        raise HTTPException(status_code=403, detail="Invalid token")
+    return user_info.user.id
+
+async def get_user_from_session_token(
+    authorization: str = Header(None),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    """Extract user ID from Supabase JWT token, verified locally when possible."""
+    token = _bearer_token(authorization)
+    if not AUTH_LOCAL_VERIFICATION:
+        return await _get_user_id_remote(supabase, token)
+    try:
+        claims = await verify_access_token(token)
+        return claims["sub"]
+    except jwt.PyJWTError as e:
+        print("Invalid token:", str(e))
+        raise HTTPException(status_code=403, detail="Invalid token")
+    except LocalVerificationUnavailable:
+        return await _get_user_id_remote(supabase, token)
+    except Exception as e:
+        # JWKS unreachable: the auth server is the source of truth anyway
+        print("Local token verification failed:", str(e))
+        return await _get_user_id_remote(supabase, token)
+
+async def get_user_from_session_token_remote(
+    authorization: str = Header(None),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    """Extract user ID from Supabase JWT token, always asking the auth server.
+
+    For revocation-sensitive routes: a signed-out or deleted user's token is
+    rejected immediately instead of when it expires.
+    """
+    return await _get_user_id_remote(supabase, _bearer_token(authorization))
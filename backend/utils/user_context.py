@@ -0,0 +1,72 @@
+"""
+Request-scoped view of the caller's users_metadata row.
+
+Access checks, folder/template listings and pin handling all need the same
+few columns of ``users_metadata``. ``get_user_context`` loads them once per
+request and every helper takes the resulting UserContext instead of
+re-querying the table. The context is also kept on ``request.state`` so
+middleware running after the handler can reuse it. Across requests the rows
+are cached by utils/user_context_cache.py.
+"""
+import time
+from typing import List, Optional
+from fastapi import Depends, Request
+from pydantic import BaseModel, Field
+from supabase import AsyncClient
+from utils.supabase_client import get_supabase
+from utils.supabase_helpers import get_user_from_session_token
+from utils.user_context_cache import get_user_context_cache
+
+USER_CONTEXT_COLUMNS = "company_id, organization_ids, pinned_folder_ids, pinned_template_ids"
+
+
+class UserContext(BaseModel):
+    user_id: str
+    company_id: Optional[str] = None
+    organization_ids: List[str] = Field(default_factory=list)
+    pinned_folder_ids: List[int] = Field(default_factory=list)
+    pinned_template_ids: List[int] = Field(default_factory=list)
+
+
+async def load_user_context(supabase: AsyncClient, user_id: str) -> UserContext:
+    """Read the caller's metadata row (an absent row gives an empty context)."""
+    cache = get_user_context_cache()
+    try:
+        cached = await cache.get(user_id)
+        if cached is not None:
+            return UserContext(**cached)
+    except Exception as e:
+        print(f"Error reading user context cache for user {user_id}: {str(e)}")
+
+    loaded_at = time.time()
+    response = await supabase.table("users_metadata") \
+        .select(USER_CONTEXT_COLUMNS) \
+        .eq("user_id", user_id) \
+        .limit(1) \
+        .execute()
+    row = response.data[0] if response.data else {}
+    context = UserContext(
+        user_id=user_id,
+        company_id=row.get("company_id"),
+        organization_ids=row.get("organization_ids") or [],
+        pinned_folder_ids=row.get("pinned_folder_ids") or [],
+        pinned_template_ids=row.get("pinned_template_ids") or []
+    )
+    try:
+        await cache.set(user_id, context.model_dump(), loaded_at=loaded_at)
+    except Exception as e:
+        print(f"Error writing user context cache for user {user_id}: {str(e)}")
+    return context
+
+
+async def get_user_context(
+    request: Request,
+    user_id: str = Depends(get_user_from_session_token),
+    supabase: AsyncClient = Depends(get_supabase)
+) -> UserContext:
+    """FastAPI dependency returning the caller's UserContext, loaded once per request."""
+    context = getattr(request.state, "user_context", None)
+    if context is None or context.user_id != user_id:
+        context = await load_user_context(supabase, user_id)
+        request.state.user_context = context
+    return context
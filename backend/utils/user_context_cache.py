@@ -0,0 +1,124 @@
+"""
+Cross-request cache of UserContext rows.
+
+Company, organization membership and pinned ids change rarely but are read
+on almost every prompts request. ``load_user_context`` serves them from this
+cache for up to USER_CONTEXT_CACHE_TTL seconds; every handler that writes
+``users_metadata`` calls ``invalidate_user_context`` afterwards. Writers never
+build the new row from the cached context: pinned ids are changed in the
+database (see utils/pinned_items.py).
+
+The default backend is an in-process LRU, so with several uvicorn workers an
+invalidation only reaches the worker that handled the write (the others
+catch up within the TTL). Setting USER_CONTEXT_CACHE_URL to a Redis URL
+shares one cache, and therefore its invalidations, between all workers; any
+other backend can be installed with ``set_user_context_cache``.
+
+Both backends remember when a user was last invalidated and refuse to cache
+a row read before that (``loaded_at`` is a wall-clock timestamp, so it can be
+compared across workers).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+USER_CONTEXT_CACHE_SIZE = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "10000"))
+USER_CONTEXT_CACHE_TTL = float(os.getenv("USER_CONTEXT_CACHE_TTL", "300"))
+USER_CONTEXT_CACHE_URL = os.getenv("USER_CONTEXT_CACHE_URL")
+
+
+class MemoryUserContextCache:
+    """Per-process LRU with TTL."""
+
+    def __init__(self, max_size: int = USER_CONTEXT_CACHE_SIZE, ttl: float = USER_CONTEXT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._invalidated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    async def set(self, user_id: str, value: Dict[str, Any], loaded_at: Optional[float] = None):
+        with self._lock:
+            # A row read before a concurrent invalidation is already stale
+            if loaded_at is not None and loaded_at < self._invalidated_at.get(user_id, 0.0):
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def delete(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated_at[user_id] = time.time()
+            while len(self._invalidated_at) > self.max_size:
+                self._invalidated_at.pop(next(iter(self._invalidated_at)))
+
+
+class RedisUserContextCache:
+    """Cache shared by all workers through Redis (requires the ``redis`` package)."""
+
+    def __init__(self, url: str, ttl: float = USER_CONTEXT_CACHE_TTL, prefix: str = "user_context:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("USER_CONTEXT_CACHE_URL is set but the redis package is not installed") from e
+        self._redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self.prefix + user_id)
+        return json.loads(raw) if raw else None
+
+    async def set(self, user_id: str, value: Dict[str, Any], loaded_at: Optional[float] = None):
+        if loaded_at is not None:
+            invalidated_at = await self._redis.get(self.prefix + "invalidated:" + user_id)
+            if invalidated_at and loaded_at < float(invalidated_at):
+                return
+        await self._redis.set(self.prefix + user_id, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    async def delete(self, user_id: str):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + "invalidated:" + user_id, time.time(), ex=max(1, int(self.ttl)))
+            pipe.delete(self.prefix + user_id)
+            await pipe.execute()
+
+
+_cache = None
+
+
+def get_user_context_cache():
+    """Return the configured cache backend, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = RedisUserContextCache(USER_CONTEXT_CACHE_URL) if USER_CONTEXT_CACHE_URL else MemoryUserContextCache()
+    return _cache
+
+
+def set_user_context_cache(backend):
+    """Install a cache backend (any object with async get/set/delete)."""
+    global _cache
+    _cache = backend
+
+
+async def invalidate_user_context(user_id: str):
+    """Drop a user's cached context; call after every users_metadata write."""
+    try:
+        await get_user_context_cache().delete(user_id)
+    except Exception as e:
+        print(f"Error invalidating user context cache for user {user_id}: {str(e)}")